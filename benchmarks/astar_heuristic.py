@@ -0,0 +1,46 @@
+'''
+Compares A* node expansions with the informed and uninformed heuristics
+on the bundled tunes, using the CLI's default costs:
+
+    python benchmarks/astar_heuristic.py
+'''
+from pathlib import Path
+from time import perf_counter
+
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column,
+    penalize_pull_at_start_of_measure, penalize_outer_fingers)
+from concertina_helper.solvers.a_star import AStarSolver
+from concertina_helper.solvers.lattice import Lattice
+
+
+def main() -> None:
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    penalty_functions = [
+        penalize_bellows_change(1),
+        penalize_finger_in_same_column(1),
+        penalize_pull_at_start_of_measure(1),
+        penalize_outer_fingers(1)
+    ]
+    print(f'{"tune":<24}{"notes":>8}{"heuristic":>12}{"expanded":>10}{"seconds":>10}')
+    for path in sorted((Path(__file__).parent.parent / 'tests').glob('*.abc')):
+        n_l = NotesOnLayout(notes_from_tune(Tune(path.read_text())), layout)
+        f_sets = [f_set for _, f_set in n_l.get_all_fingerings()]
+        for informed in [False, True]:
+            # A fresh lattice, so cached transition costs are not shared.
+            lattice = Lattice.from_fingerings(f_sets, penalty_functions)
+            start = perf_counter()
+            solution = AStarSolver(informed=informed).solve(lattice)
+            elapsed = perf_counter() - start
+            heuristic = 'bounds' if informed else 'position'
+            print(f'{path.name:<24}{len(f_sets):>8}{heuristic:>12}'
+                  f'{solution.nodes_expanded:>10}{elapsed:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
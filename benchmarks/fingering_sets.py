@@ -0,0 +1,38 @@
+'''
+Times building the sets of candidate fingerings for a long tune,
+which hashes and compares every fingering, and then solving it with A*:
+
+    python benchmarks/fingering_sets.py [REPEATS]
+'''
+import sys
+from pathlib import Path
+from timeit import timeit
+
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+
+
+def main(repeats: int) -> None:
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    path = Path(__file__).parent.parent / 'tests' / 'amelia-chords.abc'
+    notes = list(notes_from_tune(Tune(path.read_text()))) * repeats
+    n_l = NotesOnLayout(notes, layout)
+    print(f'{len(notes)} notes')
+
+    seconds = timeit(n_l.get_all_fingerings, number=1)
+    print(f'{"get_all_fingerings":<28}{seconds:>8.3f}s')
+
+    all_fingerings = n_l.get_all_fingerings()
+    seconds = timeit(
+        lambda: {f for _, f_set in all_fingerings for f in f_set}, number=1)
+    print(f'{"set of all fingerings":<28}{seconds:>8.3f}s')
+
+    seconds = timeit(lambda: n_l.get_best_fingerings([]), number=1)
+    print(f'{"get_best_fingerings":<28}{seconds:>8.3f}s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
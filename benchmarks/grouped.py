@@ -0,0 +1,71 @@
+'''
+Compares the min-plus solver with and without grouping candidates
+by the features the penalties depend on, on built-in layouts,
+with few duplicated buttons, where grouping should not slow the default down,
+and on synthetic layouts with more and more duplicated buttons,
+so each pitch has more candidates:
+
+    python benchmarks/grouped.py [NOTES]
+'''
+import sys
+from time import perf_counter
+
+from concertina_helper.layouts.bisonoric import BisonoricLayout
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.penalties import (
+    PenaltyFunction, penalize_bellows_change, penalize_finger_in_same_column,
+    penalize_outer_fingers)
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.min_plus import MinPlusSolver
+from concertina_helper.synthetic import synthetic_bisonoric_layout, random_tune
+
+
+PENALTY_SETS = {
+    'bellows': [penalize_bellows_change(2)],
+    'all': [
+        penalize_bellows_change(2), penalize_finger_in_same_column(3),
+        penalize_outer_fingers(1)],
+}
+
+
+def seconds_to_solve(
+        n_l: NotesOnLayout, penalties: list[PenaltyFunction], grouped: bool) -> float:
+    lattice = Lattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()], penalties)
+    start = perf_counter()
+    MinPlusSolver(grouped=grouped).solve(lattice)
+    return perf_counter() - start
+
+
+def layouts() -> dict[str, BisonoricLayout]:
+    return {
+        '20_cg': load_bisonoric_layout_by_name('20_cg'),
+        '30_wheatstone_cg': load_bisonoric_layout_by_name('30_wheatstone_cg'),
+        **{
+            f'{duplicates} duplicates': synthetic_bisonoric_layout(4, 6, duplicates)
+            for duplicates in [0, 32, 128, 512]
+        },
+    }
+
+
+def main(note_count: int) -> None:
+    print(f'{note_count} notes')
+    print('penalties\tlayout\tcandidates\tgroups\tfull s\tgrouped s')
+    for name, penalties in PENALTY_SETS.items():
+        for layout_name, layout in layouts().items():
+            n_l = NotesOnLayout(random_tune(layout, note_count), layout)
+            lattice = Lattice.from_fingerings(
+                [f_set for _, f_set in n_l.get_all_fingerings()], penalties)
+            candidates = sum(len(layer) for layer in lattice.layers) / note_count
+            groups = sum(
+                len(lattice.feature_groups(position)[1])  # type: ignore
+                for position in range(note_count)) / note_count
+            full = seconds_to_solve(n_l, penalties, False)
+            grouped = seconds_to_solve(n_l, penalties, True)
+            print(f'{name}\t{layout_name}\t{candidates:.1f}\t{groups:.1f}'
+                  f'\t{full:.3f}\t{grouped:.3f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,48 @@
+'''
+Compares the peak memory and time of solving a very long random tune
+with the min-plus solver, which keeps four-byte backpointers for every layer,
+and the low-memory solver, with and without checkpoints.
+The lattice is built from compiled layout tables first, so only the memory
+used by the solver itself is measured:
+
+    python benchmarks/low_memory.py [NOTES]
+'''
+import sys
+import tracemalloc
+from time import perf_counter
+
+from concertina_helper.layout_tables import compile_layout_tables
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.solvers.base_classes import Solver
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.low_memory import LowMemorySolver
+from concertina_helper.solvers.min_plus import MinPlusSolver
+from concertina_helper.synthetic import synthetic_bisonoric_layout, random_tune
+
+
+def measure(label: str, solver: Solver, lattice: Lattice) -> None:
+    tracemalloc.start()
+    start = perf_counter()
+    solution = solver.solve(lattice)
+    seconds = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<24}{seconds:>8.2f}s{peak / 2 ** 20:>10.2f} MiB'
+          f'  cost={solution.cost}')
+
+
+def main(note_count: int) -> None:
+    layout = synthetic_bisonoric_layout(duplicates=10)
+    tables = compile_layout_tables(layout, [
+        penalize_bellows_change(2), penalize_finger_in_same_column(3),
+        penalize_outer_fingers(1)])
+    lattice = tables.lattice(random_tune(layout, note_count))
+    print(f'{note_count} notes')
+    measure('minplus', MinPlusSolver(), lattice)
+    measure('lowmem, flat', LowMemorySolver(checkpointed=False), lattice)
+    measure('lowmem, checkpointed', LowMemorySolver(), lattice)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,62 @@
+'''
+Compares solving a long tune from scratch for each set of weights
+with evaluating the features once, and re-solving for each set of weights:
+
+    python benchmarks/parametric_resolve.py [NOTES]
+'''
+import sys
+from pathlib import Path
+from random import Random
+from time import perf_counter
+
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.penalties import get_penalty_factories
+from concertina_helper.solvers.parametric import ParametricLattice, raw_features
+
+
+def main(note_count: int) -> None:
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    path = Path(__file__).parent.parent / 'tests' / 'amelia-no-chords.abc'
+    notes = list(notes_from_tune(Tune(path.read_text())))
+    notes = (notes * (note_count // len(notes) + 1))[:note_count]
+    n_l = NotesOnLayout(notes, layout)
+    rng = Random(0)
+    weight_vectors = [
+        {name: rng.uniform(0, 10) for name in get_penalty_factories()}
+        for _ in range(5)
+    ]
+    print(f'{note_count} notes')
+
+    start = perf_counter()
+    for weights in weight_vectors:
+        n_l.get_best_fingerings([
+            factory(weights[name])
+            for name, factory in get_penalty_factories().items()
+        ], 'minplus')
+    print(f'{"full solve, per weights":<40}{(perf_counter() - start) / 5:>8.3f}s')
+
+    start = perf_counter()
+    p_l = ParametricLattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()],
+        raw_features(get_penalty_factories()))
+    print(f'{"feature evaluation, once":<40}{perf_counter() - start:>8.3f}s')
+
+    start = perf_counter()
+    for weights in weight_vectors:
+        p_l.weighted(weights)
+    print(f'{"weighting, per weights":<40}{(perf_counter() - start) / 5:>8.3f}s')
+
+    for solver_name in ['minplus', 'numpy']:
+        start = perf_counter()
+        for weights in weight_vectors:
+            p_l.solve(weights, solver_name)
+        resolving = (perf_counter() - start) / 5
+        print(f'{f"re-solve with {solver_name}, per weights":<40}{resolving:>8.3f}s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,50 @@
+'''
+Times filtering many random tunes against every built-in layout,
+at several transpositions, with bitsets, and for comparison,
+by looking for a tune's notes that have no fingerings:
+
+    python benchmarks/playability_filter.py [TUNES]
+'''
+import sys
+from array import array
+from random import Random
+from timeit import timeit
+
+from concertina_helper.layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_name)
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.playability import filter_playable
+
+
+def main(tune_count: int) -> None:
+    rng = Random(0)
+    tunes = [
+        (str(i), NoteSequence(
+            array('h', (rng.randint(55, 84) for _ in range(200))),
+            array('i', (n // 8 + 1 for n in range(200)))))
+        for i in range(tune_count)
+    ]
+    layouts = {
+        name: load_bisonoric_layout_by_name(name) for name in list_layout_names()}
+    transpositions = range(-2, 3)
+    print(f'{tune_count} tunes, {len(layouts)} layouts, '
+          f'{len(transpositions)} transpositions')
+
+    seconds = timeit(
+        lambda: list(filter_playable(tunes, layouts, transpositions)), number=1)
+    print(f'{"bitsets":<28}{seconds:>8.3f}s')
+
+    transposed = [
+        layout.transpose(t) for layout in layouts.values() for t in transpositions]
+    sample = tunes[:max(1, tune_count // 100)]
+    seconds = timeit(
+        lambda: [
+            all(layout.get_fingerings(note.pitch) for note in notes)
+            for _, notes in sample
+            for layout in transposed
+        ], number=1)
+    print(f'{"get_fingerings, 1% of tunes":<28}{seconds:>8.3f}s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,54 @@
+'''
+Times printing the best fingerings for a long tune in LONG format,
+formatting and printing each note separately, as the CLI used to,
+and with the cached grids and chunked writes it uses now.
+Output goes to /dev/null:
+
+    python benchmarks/render_output.py [REPEATS]
+'''
+import os
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+from timeit import timeit
+
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.output_utils import format_annotated, write_blocks
+
+
+def main(repeats: int) -> None:
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    path = Path(__file__).parent.parent / 'tests' / 'amelia-no-chords.abc'
+    notes = list(notes_from_tune(Tune(path.read_text()))) * repeats
+    best = NotesOnLayout(notes, layout).get_best_fingerings([], 'minplus')
+    print(f'{len(best)} notes')
+
+    def down(pitch):
+        return str(pitch).ljust(4)
+
+    def up(pitch):
+        return '--- '
+
+    def direction(direction):
+        return direction.name
+
+    def print_each():
+        for f in best:
+            print(f.format(down, up, direction))
+
+    def write_cached():
+        write_blocks(format_annotated(f, down, up, direction) for f in best)
+
+    with open(os.devnull, 'w') as devnull:
+        for name, f in [('format and print', print_each), ('cached', write_cached)]:
+            with redirect_stdout(devnull):
+                seconds = timeit(f, number=1)
+            print(f'{name:<28}{seconds:>8.3f}s', file=sys.stdout)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,50 @@
+'''
+Charts solve time and peak memory against layout size, the number of
+duplicated buttons, and tune length, on synthetic layouts and random tunes.
+Prints tab-separated rows, which can be pasted into a spreadsheet:
+
+    python benchmarks/scaling.py [SOLVER]
+'''
+import sys
+import tracemalloc
+from time import perf_counter
+
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.synthetic import synthetic_bisonoric_layout, random_tune
+
+
+PENALTIES = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1)]
+
+
+def measure(
+        solver_name: str, rows: int, buttons_per_row: int,
+        duplicates: int, length: int) -> None:
+    layout = synthetic_bisonoric_layout(rows, buttons_per_row, duplicates)
+    tune = random_tune(layout, length)
+    tracemalloc.start()
+    start = perf_counter()
+    NotesOnLayout(tune, layout).get_best_fingerings(PENALTIES, solver_name)
+    seconds = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    buttons = 2 * rows * buttons_per_row
+    print(f'{buttons}\t{duplicates}\t{length}\t{seconds:.3f}\t{peak / 2 ** 20:.1f}')
+
+
+def main(solver_name: str) -> None:
+    print(f'solver: {solver_name}')
+    print('buttons\tduplicates\tnotes\tseconds\tpeak MiB')
+    for rows, buttons_per_row in [(2, 5), (3, 5), (4, 5), (4, 6)]:
+        measure(solver_name, rows, buttons_per_row, 0, 500)
+    for duplicates in [0, 8, 16, 32]:
+        measure(solver_name, 4, 6, duplicates, 500)
+    for length in [250, 500, 1000, 2000]:
+        measure(solver_name, 4, 6, 0, length)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'dp')
@@ -0,0 +1,56 @@
+'''
+Times the segmented solver on a long input, made by repeating a bundled tune,
+with increasing numbers of worker processes:
+
+    python benchmarks/segmented_solve.py [NOTES]
+'''
+import sys
+from os import cpu_count
+from pathlib import Path
+from time import perf_counter
+
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column,
+    penalize_pull_at_start_of_measure, penalize_outer_fingers)
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.min_plus import MinPlusSolver
+from concertina_helper.solvers.segmented import SegmentedSolver
+
+
+def main(note_count: int) -> None:
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    penalty_functions = [
+        penalize_bellows_change(1),
+        penalize_finger_in_same_column(1),
+        penalize_pull_at_start_of_measure(1),
+        penalize_outer_fingers(1)
+    ]
+    path = Path(__file__).parent.parent / 'tests' / 'amelia-no-chords.abc'
+    notes = list(notes_from_tune(Tune(path.read_text())))
+    notes = (notes * (note_count // len(notes) + 1))[:note_count]
+    f_sets = [f_set for _, f_set in NotesOnLayout(notes, layout).get_all_fingerings()]
+
+    def time_solver(label: str, solver: MinPlusSolver | SegmentedSolver) -> None:
+        lattice = Lattice.from_fingerings(f_sets, penalty_functions)
+        start = perf_counter()
+        solution = solver.solve(lattice)
+        print(f'{label:<24}{perf_counter() - start:>10.2f}s  cost={solution.cost}')
+
+    print(f'{note_count} notes')
+    time_solver('minplus', MinPlusSolver())
+    workers = 1
+    while workers <= (cpu_count() or 1):
+        time_solver(
+            f'segmented, {workers} workers',
+            SegmentedSolver(
+                segment_length=note_count // (workers * 4) + 2, max_workers=workers))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,81 @@
+'''
+Times what each worker process does before it can solve a tune:
+Loading the layout and evaluating the penalties for every transition,
+compared with attaching to tables published once in shared memory.
+Then times solving many random tunes in a process pool both ways:
+
+    python benchmarks/shared_tables.py [TUNES]
+'''
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from timeit import timeit
+
+from concertina_helper.layout_tables import (
+    LayoutTables, compile_layout_tables, publish_layout_tables, attach_layout_tables)
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.solvers.dynamic_programming import DynamicProgrammingSolver
+from concertina_helper.solvers.lattice import Lattice
+
+
+LAYOUT_NAME = '30_wheatstone_cg'
+PENALTIES = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1)]
+
+_tables: LayoutTables | None = None
+
+
+def random_pitches(rng: Random, length: int) -> list[str]:
+    scale = ['G4', 'A4', 'B4', 'C5', 'D5', 'E5', 'F#5', 'G5']
+    return [rng.choice(scale) for _ in range(length)]
+
+
+def solve_from_yaml(pitches: list[str]) -> float:
+    layout = load_bisonoric_layout_by_name(LAYOUT_NAME)
+    n_l = NotesOnLayout(notes_from_pitches(pitches), layout)
+    lattice = Lattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()], PENALTIES)
+    return DynamicProgrammingSolver().solve(lattice).cost
+
+
+def attach(name: str) -> None:
+    global _tables
+    _tables = attach_layout_tables(name)
+
+
+def solve_from_tables(pitches: list[str]) -> float:
+    assert _tables is not None
+    lattice = _tables.lattice(notes_from_pitches(pitches))
+    return DynamicProgrammingSolver().solve(lattice).cost
+
+
+def main(tune_count: int) -> None:
+    rng = Random(0)
+    tunes = [random_pitches(rng, 200) for _ in range(tune_count)]
+    tables = compile_layout_tables(
+        load_bisonoric_layout_by_name(LAYOUT_NAME), PENALTIES)
+
+    with publish_layout_tables(tables) as shared:
+        seconds = timeit(lambda: attach_layout_tables(shared.name).close(), number=20)
+        print(f'{"attach tables":<28}{seconds / 20:>8.4f}s')
+        seconds = timeit(
+            lambda: load_bisonoric_layout_by_name(LAYOUT_NAME), number=20)
+        print(f'{"load layout":<28}{seconds / 20:>8.4f}s')
+
+        with ProcessPoolExecutor() as pool:
+            seconds = timeit(
+                lambda: list(pool.map(solve_from_yaml, tunes)), number=1)
+        print(f'{tune_count} tunes, {"from YAML":<18}{seconds:>8.3f}s')
+        with ProcessPoolExecutor(initializer=attach, initargs=(shared.name,)) as pool:
+            seconds = timeit(
+                lambda: list(pool.map(solve_from_tables, tunes)), number=1)
+        print(f'{tune_count} tunes, {"from tables":<18}{seconds:>8.3f}s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,82 @@
+'''
+Compares the throughput of solving many random tunes on one layout
+in a thread pool, sharing one copy of the compiled tables,
+with a process pool, where each worker is sent the layout and penalties,
+compiles its own tables, and sends back pickled fingerings.
+Threads only run in parallel on a free-threaded build of Python:
+
+    python benchmarks/thread_pool.py [TUNES] [WORKERS]
+'''
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from concertina_helper.batch import BatchSolver
+from concertina_helper.layout_tables import LayoutTables, compile_layout_tables
+from concertina_helper.layouts.bisonoric import BisonoricLayout
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.penalties import (
+    PenaltyFunction, penalize_bellows_change, penalize_finger_in_same_column,
+    penalize_outer_fingers)
+from concertina_helper.synthetic import synthetic_bisonoric_layout, random_tune
+
+
+SOLVER_NAME = 'minplus'
+PENALTIES = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1)]
+
+_batch: BatchSolver | None = None
+
+
+def compile_in_worker(
+        layout: BisonoricLayout, penalties: list[PenaltyFunction]) -> None:
+    global _batch
+    _batch = BatchSolver(compile_layout_tables(layout, penalties), SOLVER_NAME, 1)
+
+
+def solve_in_worker(tune: NoteSequence) -> list:
+    assert _batch is not None
+    return _batch.solve_one(tune)
+
+
+def report(label: str, seconds: float, tune_count: int) -> None:
+    print(f'{label:<24}{seconds:>8.2f}s{tune_count / seconds:>10.1f} tunes/s')
+
+
+def threads(tables: LayoutTables, tunes: list[NoteSequence], workers: int) -> None:
+    start = perf_counter()
+    with BatchSolver(tables, SOLVER_NAME, workers) as batch:
+        for _ in batch.solve(tunes):
+            pass
+    report(f'threads ({workers})', perf_counter() - start, len(tunes))
+
+
+def processes(
+        layout: BisonoricLayout, tunes: list[NoteSequence], workers: int) -> None:
+    start = perf_counter()
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=compile_in_worker,
+            initargs=(layout, PENALTIES)) as pool:
+        for _ in pool.map(solve_in_worker, tunes, chunksize=8):
+            pass
+    report(f'processes ({workers})', perf_counter() - start, len(tunes))
+
+
+def main(tune_count: int, workers: int) -> None:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'Python {sys.version.split()[0]}, GIL {"on" if is_gil_enabled else "off"}')
+    layout = synthetic_bisonoric_layout(duplicates=2)
+    tables = compile_layout_tables(layout, PENALTIES)
+    tunes = [random_tune(layout, 500, seed=seed) for seed in range(tune_count)]
+    print(f'{tune_count} tunes of 500 notes')
+    threads(tables, tunes, 1)
+    threads(tables, tunes, workers)
+    processes(layout, tunes, workers)
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
@@ -44,19 +44,30 @@ PULL:
 . . ➋ ➍ ➏   ➐ . . . .
 
 **concertina_helper** models a tune as a graph,
-with each possible fingering for a given note a node in that graph. It then uses an
+with each possible fingering for a given note a node in that graph.
+By default it uses an
 [implementation of the A* algorithm](https://github.com/jrialland/python-astar/)
-(wrapped in `concertina_helper.finger_finder`)
-to find the best path through this graph.
+to find the best path through this graph, but other backends are available
+in `concertina_helper.solvers`, and can be selected by name
+in `concertina_helper.finger_finder.find_best_fingerings`.
 
 Utilities to load ABC tunes and plain lists of pitches
 are in `concertina_helper.note_generators`.
 
 Classes representing uni- and bisonoric layouts, fingerings on those layouts,
 and utilities to create layouts, are in `concertina_helper.layouts`.
+`concertina_helper.notes_on_layout.NotesOnLayout` works the same with unisonoric
+layouts, like English or duet concertinas, though penalties about the bellows
+only apply to bisonoric layouts.
 
 Functions that encapsulate heuristics about what makes a "good" fingering are in
 `concertina_helper.penalties`, or you can provide your own penalty functions.
+Penalties that depend on more than two consecutive notes are in
+`concertina_helper.stateful_penalties`.
+To pin some notes to a bellows direction or buttons, and let the solver
+fill in the rest, see `concertina_helper.constraints`.
+To report the progress of long solves, or cancel them from another thread
+or from asyncio, see `concertina_helper.solvers.progress`.
 """
 
 __version__ = "0.0.3"
@@ -0,0 +1,77 @@
+'''
+Solves many tunes on one layout concurrently, in a pool of threads,
+over a single copy of the compiled tables: Nothing is pickled,
+and nothing is copied into each worker, as it is with a process pool.
+Layouts, fingerings, compiled tables, and solvers are immutable,
+and each tune gets its own `concertina_helper.solvers.lattice.Lattice`,
+so the threads share no mutable state. On a free-threaded build of Python,
+the tunes are solved in parallel; With the GIL, they take turns.
+
+>>> from concertina_helper.layout_tables import compile_layout_tables
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> tables = compile_layout_tables(layout, [penalize_bellows_change(1)])
+>>> tunes = [notes_from_pitches(['G4', 'A4']), notes_from_pitches(['C4'])]
+>>> with BatchSolver(tables, max_workers=2) as batch:
+...     for best in batch.solve(tunes):
+...         print([f.fingering.direction.name for f in best])
+['PUSH', 'PUSH']
+['PUSH']
+'''
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from types import TracebackType
+
+from .layout_tables import LayoutTables
+from .layouts.bisonoric import AnnotatedBisonoricFingering
+from .solvers.registry import DEFAULT_SOLVER_NAME, get_solver_by_name
+from .type_defs import Annotation
+
+
+class BatchSolver:
+    '''
+    Solves tunes with the compiled `tables`, in up to `max_workers` threads.
+    The penalties must only depend on the fingerings: See
+    `concertina_helper.layout_tables`. One solver is shared by every thread,
+    because solvers keep no state between solves.
+    Use as a context manager, so the threads are stopped.
+    '''
+    def __init__(
+            self, tables: LayoutTables,
+            solver_name: str = DEFAULT_SOLVER_NAME,
+            max_workers: int | None = None):
+        self.tables = tables
+        self.solver = get_solver_by_name(solver_name)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self) -> BatchSolver:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None) -> None:
+        self.executor.shutdown()
+
+    def solve_one(
+            self, notes: Iterable[Annotation]) -> list[AnnotatedBisonoricFingering]:
+        '''
+        Returns the best fingerings for one tune, in the calling thread.
+        Raises `ValueError`, listing every note that can not be played.
+        '''
+        lattice = self.tables.lattice(notes)
+        return lattice.fingerings(self.solver.solve(lattice).indexes)
+
+    def solve(
+            self, tunes: Iterable[Iterable[Annotation]]
+    ) -> Iterator[list[AnnotatedBisonoricFingering]]:
+        '''
+        Returns the best fingerings for each tune, in order,
+        as they are solved. If a tune can not be played,
+        its `ValueError` is raised when its result is reached.
+        '''
+        return self.executor.map(self.solve_one, tunes)
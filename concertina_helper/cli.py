@@ -1,16 +1,16 @@
 import argparse
 from pathlib import Path
+import sys
 from signal import signal, SIGPIPE, SIG_DFL
 from enum import Enum
-from collections.abc import Callable, Iterable
-
-from pyabc2 import Tune
+from collections.abc import Callable, Iterable, Iterator, Sequence
 
+from .constraints import Constraint, load_constraints_by_path
 from .layouts.layout_loader import (
     list_layout_names, load_bisonoric_layout_by_path, load_bisonoric_layout_by_name)
 from .layouts.bisonoric import BisonoricLayout
 from .notes_on_layout import NotesOnLayout
-from .note_generators import notes_from_tune, notes_from_pitches
+from .note_generators import notes_from_path
 from .penalties import (
     PenaltyFunction,
     penalize_bellows_change,
@@ -18,7 +18,18 @@ from .penalties import (
     penalize_pull_at_start_of_measure,
     penalize_outer_fingers)
 from .type_defs import Direction, PitchToStr, Annotation
-from .output_utils import condense
+from .server import FingeringServer
+from .output_utils import (
+    condense_by_measure, format_annotated, write_blocks, ProgressBar)
+from .solvers.progress import ProgressCallback
+from .solvers.registry import list_solver_names, DEFAULT_SOLVER_NAME
+
+
+PROGRESS_BAR_MIN_NOTES = 2000
+'''
+For tunes with at least this many notes, a progress bar is shown on stderr,
+if it is a terminal.
+'''
 
 
 class _OutputFormat(Enum):
@@ -55,7 +66,8 @@ class _OutputFormat(Enum):
         lambda direction: direction.name
     )
     COMPACT = (
-        'multiple fingerings represented in single grid'
+        'multiple fingerings represented in single grid, '
+        'with as many measures in each grid as will fit'
     )
 
 
@@ -79,18 +91,30 @@ and a concertina type,
 prints possible fingerings.
 ''')
     parser.add_argument(
-        'input', type=Path,
+        'input', type=Path, nargs='?',
         help='Input file: Parsed either as a list of pitches, one per line, '
-        'or as ABC, if the first lines starts with "X:".')
+        'or as ABC, if the first lines starts with "X:", '
+        'or as binary notes, if it starts with the header written by '
+        'concertina_helper.note_generators.write_binary_notes.')
     parser.add_argument(
         '--output_format', choices=[f.name for f in _OutputFormat],
         default=_OutputFormat.LONG.name,
         help='Output format. ' + _format_enum(_OutputFormat))
+    parser.add_argument(
+        '--constraints_path', type=Path, metavar='PATH',
+        help='Path of text file pinning notes to a bellows direction or buttons; '
+        'See concertina_helper.constraints for the format')
+    parser.add_argument(
+        '--serve_stdio', action='store_true',
+        help='Instead of reading one input file, answer JSON-RPC requests '
+        'on stdin, one per line, keeping layouts and results between requests; '
+        'See concertina_helper.server for the methods')
 
     layout_group = parser.add_argument_group(
         'Layout options',
         'Supply your own layout, or use a predefined one, optionally transposed\n')
-    layout_source_group = layout_group.add_mutually_exclusive_group(required=True)
+    # Required, unless serving: Checked below.
+    layout_source_group = layout_group.add_mutually_exclusive_group()
     layout_source_group.add_argument(
         '--layout_path', type=Path, metavar='PATH',
         help='Path of YAML file with concertina layout')
@@ -115,14 +139,32 @@ prints possible fingerings.
         '--show_all', action='store_true',
         help='Ignore cost options and just show all possible fingerings')
 
+    search_group = parser.add_argument_group(
+        'Search options',
+        'Choose how the best fingerings are found; '
+        'All backends give equally good results, except anytime, '
+        'which stops after a second with the best found so far, '
+        'and warns if it might not be the best\n')
+    search_group.add_argument(
+        '--solver', choices=list_solver_names(), metavar='NAME',
+        default=DEFAULT_SOLVER_NAME,
+        help='Backend used to search for the best fingerings; '
+        'Backends with optional dependencies are only available if installed')
+
     args = parser.parse_args()
 
-    input_text = args.input.read_text()
-    notes = (
-        notes_from_tune(Tune(input_text))
-        if input_text.startswith('X:') else
-        notes_from_pitches(input_text.split('\n'))
-    )
+    if args.serve_stdio:
+        FingeringServer().serve(sys.stdin, sys.stdout)
+        return
+    if args.input is None:
+        parser.error('the following arguments are required: input')
+    if not (args.layout_path or args.layout_name):
+        parser.error('one of the arguments --layout_path --layout_name is required')
+
+    notes = list(notes_from_path(args.input))
+    constraints = (
+        load_constraints_by_path(args.constraints_path, notes)
+        if args.constraints_path else [])
 
     layout = (
         load_bisonoric_layout_by_path(args.layout_path)
@@ -137,13 +179,19 @@ prints possible fingerings.
         penalize_outer_fingers(args.outer_fingers_cost)
     ]
     output_format = _OutputFormat[args.output_format]
+    progress = (
+        ProgressBar(sys.stderr)
+        if len(notes) >= PROGRESS_BAR_MIN_NOTES and sys.stderr.isatty() else None)
 
     print_fingerings(
         notes, layout,
         button_down_f=output_format.button_down_f,
         button_up_f=output_format.button_up_f,
         direction_f=output_format.direction_f,
-        penalty_functions=penalty_functions)
+        penalty_functions=penalty_functions,
+        solver_name=args.solver,
+        constraints=constraints,
+        progress=progress)
 
 
 def print_fingerings(
@@ -152,7 +200,10 @@ def print_fingerings(
     button_down_f: PitchToStr | None = lambda _: '@',
     button_up_f: PitchToStr | None = lambda _: '.',
     direction_f: Callable[[Direction], str] | None = lambda direction: direction.name,
-    penalty_functions: Iterable[PenaltyFunction] = []
+    penalty_functions: Iterable[PenaltyFunction] = [],
+    solver_name: str = DEFAULT_SOLVER_NAME,
+    constraints: Sequence[Constraint] = (),
+    progress: ProgressCallback | None = None
 ) -> None:
     '''
     The core of the CLI functionality.
@@ -162,24 +213,32 @@ def print_fingerings(
       Functions that determine output style.
     - `penalty_functions`: Heuristic functions that define what makes a good fingering.
       If empty, all fingerings will be printed.
+    - `solver_name`: The backend used to search for the best fingerings.
+    - `constraints`: Limits on the fingerings of some notes.
+    - `progress`: Called with the progress of the search:
+      See `concertina_helper.solvers.progress`.
     '''
-    n_l = NotesOnLayout(notes, layout)
+    n_l = NotesOnLayout(notes, layout, constraints)
 
     if penalty_functions:
-        best = n_l.get_best_fingerings(penalty_functions)
+        best = n_l.get_best_fingerings(
+            penalty_functions, solver_name, progress=progress)
         if direction_f is None:
-            # TODO: split on measures?
-            print(condense(best))
+            write_blocks(condense_by_measure(best))
         else:
             assert (
                 button_down_f is not None
                 and button_up_f is not None
                 and direction_f is not None), 'Either set all or none'
-            for annotated_fingering in best:
-                print(annotated_fingering.format(
-                    button_down_f=button_down_f,
-                    button_up_f=button_up_f,
-                    direction_f=direction_f))
+            write_blocks(
+                format_annotated(
+                    annotated_fingering, button_down_f, button_up_f, direction_f)
+                for annotated_fingering in best)
+        if not best.proven_optimal:
+            print(
+                'These fingerings are not proven to be the best: '
+                f'Their cost may be up to {best.gap:g} more than the best.',
+                file=sys.stderr)
     else:
         if direction_f is None:
             raise ValueError('Display functions required to show all fingerings')
@@ -187,13 +246,20 @@ def print_fingerings(
             button_down_f is not None
             and button_up_f is not None
             and direction_f is not None), 'Either set all or none'
-        for annotation, annotated_fingering_set in n_l.get_all_fingerings():
-            if not annotated_fingering_set:
-                a = annotation
-                print(f'No fingerings for {a.pitch} in measure {a.measure}')
-                continue
-            for annotated_fingering in annotated_fingering_set:
-                print(annotated_fingering.format(
-                    button_down_f=button_down_f,
-                    button_up_f=button_up_f,
-                    direction_f=direction_f))
+        write_blocks(_format_all(
+            n_l, button_down_f, button_up_f, direction_f))
+
+
+def _format_all(
+        n_l: NotesOnLayout,
+        button_down_f: PitchToStr,
+        button_up_f: PitchToStr,
+        direction_f: Callable[[Direction], str]) -> Iterator[str]:
+    for annotation, annotated_fingering_set in n_l.get_all_fingerings():
+        if not annotated_fingering_set:
+            a = annotation
+            yield f'No fingerings for {a.pitch} in measure {a.measure}'
+            continue
+        for annotated_fingering in annotated_fingering_set:
+            yield format_annotated(
+                annotated_fingering, button_down_f, button_up_f, direction_f)
@@ -0,0 +1,171 @@
+'''
+Pins some notes of a tune to a bellows direction, a side, a row, or a button,
+and leaves the rest to the solver. Candidates which do not match are removed
+before the search, and where a note is pinned to a single fingering,
+the tune is split into parts which are solved independently:
+See `concertina_helper.finger_finder.find_best_fingerings`.
+
+Constraints can be read from a text file, with one constraint per line:
+the notes, either note numbers or measure numbers after `m`, counting from 1,
+optionally with a range, and then a direction, or a button, or both.
+Buttons are written as for `concertina_helper.tuning`, `L` or `R`,
+then optionally the row, and then optionally the column after a `.`,
+counting from 1 at the top left of each side.
+Blank lines, and comments starting with `#` after whitespace, are ignored:
+```
+# The first phrase on the pull
+1-4 PULL
+# The second measure on the middle row of the left
+m2 L2
+# Note 9 on one button
+9 PUSH L1.4
+```
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> notes = list(notes_from_pitches(['G4', 'A4', 'B4']))
+>>> constraints = parse_constraints(['1-3 PUSH'], notes)
+>>> n_l = NotesOnLayout(notes, layout, constraints)
+>>> best = n_l.get_best_fingerings([penalize_bellows_change(1)])
+>>> [f.fingering.direction.name for f in best]
+['PUSH', 'PUSH', 'PUSH']
+'''
+from __future__ import annotations
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+import re
+
+from .layouts.base_classes import AnnotatedFingering, F
+from .type_defs import Annotation, Direction
+
+
+@dataclass(frozen=True)
+class Constraint:
+    '''
+    Limits the fingerings for the notes from position `start`
+    up to, but not including, `stop`, counting from 0:
+    If `direction` is given, only fingerings in that direction are allowed,
+    and if `side`, `row`, or `column` are given, only fingerings which press
+    a button on that side, `'L'` or `'R'`, in that row and column,
+    counting from 0 at the top left of each side.
+
+    >>> Constraint(0, 1, side='X')
+    Traceback (most recent call last):
+    ...
+    ValueError: side must be "L" or "R"
+    '''
+    start: int
+    stop: int
+    direction: Direction | None = None
+    side: str | None = None
+    row: int | None = None
+    column: int | None = None
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.start < self.stop:
+            raise ValueError('start must be at least 0, and less than stop')
+        if self.side not in (None, 'L', 'R'):
+            raise ValueError('side must be "L" or "R"')
+
+    def allows(self, f: AnnotatedFingering) -> bool:
+        '''
+        Returns `True` if the fingering matches the constraint.
+        Unisonoric fingerings have no direction,
+        so they never match a constraint with a direction.
+        '''
+        fingering = f.fingering
+        if (
+            self.direction is not None
+            and getattr(fingering, 'direction', None) != self.direction
+        ):
+            return False
+        if self.side is None and self.row is None and self.column is None:
+            return True
+        masks = {'L': fingering.left_mask, 'R': fingering.right_mask}
+        return any(
+            button
+            for side, mask in masks.items() if self.side in (None, side)
+            for row, mask_row in enumerate(mask) if self.row in (None, row)
+            for column, button in enumerate(mask_row) if self.column in (None, column)
+        )
+
+
+def apply_constraints(
+        all_fingerings: Iterable[set[AnnotatedFingering[F]]],
+        constraints: Iterable[Constraint]) -> list[set[AnnotatedFingering[F]]]:
+    '''
+    Given a set of possible fingerings for each note,
+    returns the sets with only the fingerings that match every constraint.
+    Raises `ValueError` if a constraint is past the end of the tune,
+    or if no fingerings for a note match.
+    '''
+    f_sets = list(all_fingerings)
+    for constraint in constraints:
+        if constraint.stop > len(f_sets):
+            raise ValueError(
+                f'Constraint is past the end of the tune: {constraint}')
+        for position in range(constraint.start, constraint.stop):
+            matching = {
+                f for f in f_sets[position] if constraint.allows(f)}
+            if not matching and f_sets[position]:
+                a = next(iter(f_sets[position])).annotation
+                raise ValueError(
+                    f'No fingerings for {a.pitch} in measure {a.measure} '
+                    f'match the constraints')
+            f_sets[position] = matching
+    return f_sets
+
+
+def parse_constraints(
+        lines: Iterable[str], notes: Sequence[Annotation]) -> list[Constraint]:
+    '''
+    Parses constraints in the format described above.
+    The `notes` are needed to find the positions of measures.
+
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> notes = list(notes_from_pitches(['G4', 'A4', 'B4']))
+    >>> parse_constraints(['2-3 PULL R1.2  # comment', 'm1 L'], notes)
+    [Constraint(start=1, stop=3, direction=Direction.PULL, side='R', row=0, column=1), \
+Constraint(start=0, stop=3, direction=None, side='L', row=None, column=None)]
+    '''
+    constraints = []
+    for line_number, line in enumerate(lines, start=1):
+        line = re.sub(r'(^|\s)#.*', '', line).strip()
+        if not line:
+            continue
+        match = re.fullmatch(
+            r'(m?)(\d+)(?:-(\d+))?'
+            r'(?:\s+(PUSH|PULL))?'
+            r'(?:\s+([LR])(\d+)?(?:\.(\d+))?)?', line)
+        if not match or not (match[4] or match[5]):
+            raise ValueError(f'Invalid constraint on line {line_number}')
+        is_measure, first, last, direction, side, row, column = match.groups()
+        last = last or first
+        if is_measure:
+            positions = [
+                i for i, note in enumerate(notes)
+                if int(first) <= note.measure <= int(last)]
+            if not positions:
+                raise ValueError(f'No notes in measures on line {line_number}')
+            start, stop = positions[0], positions[-1] + 1
+        else:
+            start, stop = int(first) - 1, int(last)
+        constraints.append(Constraint(
+            start, stop,
+            direction=None if direction is None else Direction[direction],
+            side=side,
+            row=None if row is None else int(row) - 1,
+            column=None if column is None else int(column) - 1))
+    return constraints
+
+
+def load_constraints_by_path(
+        path: Path, notes: Sequence[Annotation]) -> list[Constraint]:
+    '''
+    Reads constraints from a file: See `parse_constraints`.
+    '''
+    return parse_constraints(path.read_text().splitlines(), notes)
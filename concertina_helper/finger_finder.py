@@ -1,74 +1,187 @@
-from typing import Iterable
-from dataclasses import dataclass
+from __future__ import annotations
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from functools import partial
+from typing import TypeVar
+import asyncio
 
-from astar import AStar  # type: ignore
-
-from .layouts.bisonoric import AnnotatedBisonoricFingering
+from .constraints import Constraint, apply_constraints
+from .layouts.base_classes import AnnotatedFingering, F, Fingering
 from .penalties import PenaltyFunction
+from .stateful_penalties import StatefulPenalty
+from .solvers.base_classes import Solution
+from .solvers.lattice import Lattice
+from .solvers.progress import (
+    CancellationToken, ProgressCallback, SolveMonitor, make_monitor)
+from .solvers.registry import get_solver_by_name, DEFAULT_SOLVER_NAME
+from .solvers.stateful import StatefulSolver
+
+
+# Lists are invariant, so this can not be the covariant F.
+_F = TypeVar('_F', bound=Fingering)
+
+
+class BestFingerings(list[AnnotatedFingering[_F]]):
+    '''
+    The best fingerings for a tune, in a list. If the backend stopped early,
+    as `anytime` may, `proven_optimal` is `False`, and `gap` is the most
+    by which their cost could exceed the optimum:
+    See `concertina_helper.solvers.base_classes.Solution`.
+    '''
+    def __init__(
+            self, fingerings: Iterable[AnnotatedFingering[_F]] = (),
+            proven_optimal: bool = True, gap: float = 0.0):
+        super().__init__(fingerings)
+        self.proven_optimal = proven_optimal
+        self.gap = gap
 
 
 def find_best_fingerings(
-    all_fingerings: Iterable[set[AnnotatedBisonoricFingering]],
-    penalty_functions: Iterable[PenaltyFunction]
-) -> Iterable[AnnotatedBisonoricFingering]:
+    all_fingerings: Iterable[set[AnnotatedFingering[F]]],
+    penalty_functions: Iterable[PenaltyFunction[F] | StatefulPenalty],
+    solver_name: str = DEFAULT_SOLVER_NAME,
+    constraints: Iterable[Constraint] = (),
+    executor: Executor | None = None,
+    progress: ProgressCallback | None = None,
+    cancel: CancellationToken | None = None
+) -> BestFingerings[F]:
     '''
     Given a list of sets of possible fingerings,
-    returns a list representing the best fingerings.
+    returns a `BestFingerings`, a list representing the best fingerings,
+    which also says whether they are proven optimal.
+    The fingerings may be for a uni- or bisonoric layout,
+    but stateful penalties are only for bisonoric layouts.
     See `concertina_helper.notes_on_layout.NotesOnLayout.get_best_fingerings`
     for a convenience method that wraps this.
+
+    `solver_name` selects the backend that searches for the best path:
+    See `concertina_helper.solvers.registry.list_solver_names`.
+    If any of the penalties are
+    `concertina_helper.stateful_penalties.StatefulPenalty`,
+    `concertina_helper.solvers.stateful.StatefulSolver` is used instead.
+
+    If there are `constraints`, fingerings which do not match them are removed
+    first: See `concertina_helper.constraints`. Then, unless there are stateful
+    penalties, the tune is split at each note left with a single fingering,
+    because the best path must pass through it, and the parts are solved
+    separately, in the `executor` if one is given, which for a
+    `concurrent.futures.ProcessPoolExecutor` requires picklable penalties.
+
+    If given, `progress` is called with the progress of the search,
+    and `cancel` is checked in the main loop of the solver,
+    which raises `concertina_helper.solvers.progress.SolveCancelled`
+    once it is cancelled: See `concertina_helper.solvers.progress`.
+    Parts solved in the `executor` are counted, and cancellation checked,
+    as each part is done.
     '''
-    finder = _FingerFinder(all_fingerings, penalty_functions)
-    return finder.find()
+    pairwise = []
+    stateful = []
+    for penalty in penalty_functions:
+        if isinstance(penalty, StatefulPenalty):
+            stateful.append(penalty)
+        else:
+            pairwise.append(penalty)
+    constraints = list(constraints)
+    if constraints:
+        all_fingerings = apply_constraints(all_fingerings, constraints)
+    lattice = Lattice.from_fingerings(all_fingerings, pairwise)
+    monitor = make_monitor(len(lattice.layers), progress, cancel)
+    if stateful:
+        best = _to_best(lattice, StatefulSolver(stateful).solve(lattice, monitor))
+    elif not constraints:
+        best = _solve(solver_name, lattice, monitor)
+    else:
+        best = _solve_parts(solver_name, lattice, executor, monitor)
+    if monitor is not None:
+        monitor.finish()
+    return best
 
 
-@dataclass(frozen=True)
-class _Node:
-    position: int
-    annotated_fingering: AnnotatedBisonoricFingering | None
+def _solve_parts(
+        solver_name: str, lattice: Lattice[F], executor: Executor | None,
+        monitor: SolveMonitor | None) -> BestFingerings[F]:
+    '''
+    Splits the lattice at each layer with a single candidate,
+    and solves the parts separately.
+    The whole is only proven optimal if every part is, and the gaps add up.
+    '''
+    pinned = [
+        position for position, layer in enumerate(lattice.layers)
+        if len(layer) == 1
+    ]
+    boundaries = sorted({0, *pinned, max(len(lattice.layers) - 1, 0)})
+    parts = [
+        lattice.slice(start, stop + 1)
+        for start, stop in zip(boundaries, boundaries[1:])
+    ] or [lattice]
+    if executor is None:
+        solved = [_solve(solver_name, part, monitor) for part in parts]
+    else:
+        solved = []
+        # The monitor can not be sent to the workers.
+        for start, part, fingerings in zip(
+                boundaries, parts,
+                executor.map(_solve, [solver_name] * len(parts), parts)):
+            if monitor is not None:
+                monitor.reach(start + len(part.layers))
+            solved.append(fingerings)
+    # Each part starts with the layer the previous part ended with.
+    best = solved[0]
+    for fingerings in solved[1:]:
+        best.extend(fingerings[1:])
+        best.proven_optimal = best.proven_optimal and fingerings.proven_optimal
+        best.gap += fingerings.gap
+    return best
 
 
-class _FingerFinder(AStar):
-    def __init__(
-            self,
-            fingerings: Iterable[set[AnnotatedBisonoricFingering]],
-            penalty_functions: Iterable[PenaltyFunction]):
-        self.penalty_functions = penalty_functions
-        self.index: dict[int, set[_Node]] = {
-            i: {_Node(i, f) for f in f_set}
-            for i, f_set in enumerate(fingerings)
-        }
-
-    def find(self) -> Iterable[AnnotatedBisonoricFingering]:
-        start = _Node(-1, None)
-        max_index = max(self.index.keys())
-        goal = list(self.index[max_index])[0]
-        # is_goal_reached() only checks position,
-        # so I think we can use any final node.
-        # ... but then why is the goal parameter needed on astar(start, goal)?
-
-        return [
-            node.annotated_fingering for node in self.astar(start, goal)
-            if node.annotated_fingering is not None
-        ]
-
-    def heuristic_cost_estimate(self, current: _Node, goal: _Node) -> float:
-        return goal.position - current.position
-
-    def distance_between(self, n1: _Node, n2: _Node) -> float:
-        # TODO: Make the weightings here configurable.
-        distance = float(abs(n1.position - n2.position))
-        assert distance == 1.0  # Should only be used with immediate neighbors
-
-        if n1.annotated_fingering is not None and n2.annotated_fingering is not None:
-            # If either is an end node, thers is no additional transition cost.
-            f1 = n1.annotated_fingering
-            f2 = n2.annotated_fingering
-            for function in self.penalty_functions:
-                distance += function(f1, f2)
-        return distance
-
-    def neighbors(self, node: _Node) -> Iterable[_Node]:
-        return self.index[node.position + 1]
-
-    def is_goal_reached(self, current: _Node, goal: _Node) -> bool:
-        return current.position == goal.position
+def _to_best(lattice: Lattice[F], solution: Solution) -> BestFingerings[F]:
+    return BestFingerings(
+        lattice.fingerings(solution.indexes), solution.proven_optimal, solution.gap)
+
+
+def _solve(
+        solver_name: str, lattice: Lattice[F],
+        monitor: SolveMonitor | None = None) -> BestFingerings[F]:
+    return _to_best(lattice, get_solver_by_name(solver_name).solve(lattice, monitor))
+
+
+async def find_best_fingerings_async(
+    all_fingerings: Iterable[set[AnnotatedFingering[F]]],
+    penalty_functions: Iterable[PenaltyFunction[F] | StatefulPenalty],
+    solver_name: str = DEFAULT_SOLVER_NAME,
+    constraints: Iterable[Constraint] = (),
+    executor: Executor | None = None,
+    progress: ProgressCallback | None = None,
+    cancel: CancellationToken | None = None
+) -> BestFingerings[F]:
+    '''
+    Runs `find_best_fingerings` in the `executor`, by default the event loop's
+    default executor, so it can be awaited without blocking the loop.
+    Parts of the tune are solved in that one call.
+    If the awaiting task is cancelled, so is the solve, so the thread is freed.
+    `progress` is called from the executor's thread: Use
+    `asyncio.loop.call_soon_threadsafe` to get back to the loop.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import penalize_bellows_change
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4']), layout)
+    >>> f_sets = [f_set for _, f_set in n_l.get_all_fingerings()]
+    >>> best = asyncio.run(
+    ...     find_best_fingerings_async(f_sets, [penalize_bellows_change(1)]))
+    >>> [f.fingering.direction.name for f in best]
+    ['PUSH', 'PUSH']
+    '''
+    cancel = cancel or CancellationToken()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, partial(
+        find_best_fingerings, list(all_fingerings), list(penalty_functions),
+        solver_name, list(constraints), None, progress, cancel))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
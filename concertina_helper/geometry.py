@@ -0,0 +1,227 @@
+'''
+Penalties based on where the buttons physically are: How far a hand travels
+between notes, how many rows it jumps, and how far it stretches for a chord.
+
+Each layout has a `ButtonGeometry`, with the coordinates of every button,
+measured in button spacings. It can be declared in the layout YAML,
+or inferred from the rows and columns, with `load_geometry_by_path`.
+Distances between every pair of buttons on a side are computed once,
+so each penalty is a table lookup per button:
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> geometry = ButtonGeometry.infer(layout.shape)
+>>> n_l = NotesOnLayout(notes_from_pitches(['C4', 'E4', 'G4']), layout)
+>>> best = n_l.get_best_fingerings([penalize_finger_travel(1, geometry)])
+>>> print(best[-1].fingering)
+PUSH:
+--- --- --- --- ---    --- --- --- --- ---
+--- --- --- --- G4     --- --- --- --- ---
+--- --- --- --- ---    --- --- --- --- ---
+'''
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from math import dist
+from pathlib import Path
+import re
+
+from yaml import safe_load
+
+from .layouts.base_classes import AnnotatedFingering
+from .layouts.bisonoric import BisonoricFingering
+from .layouts.unisonoric import UnisonoricFingering
+from .penalties import PenaltyFunction
+from .type_defs import Mask, Shape
+
+
+Coordinates = tuple[tuple[tuple[float, float], ...], ...]
+'''
+The `(x, y)` position of each button on one side, row by row.
+'''
+
+_Fingering = AnnotatedFingering[BisonoricFingering | UnisonoricFingering]
+
+
+@dataclass(frozen=True)
+class ButtonGeometry:
+    '''
+    The coordinates of the buttons on the left and right.
+    `distances` and `rows` are computed from them:
+    For each side, `distances[side][a * n + b]` is the distance
+    between buttons `a` and `b`, numbered row by row, like the bits of a
+    `concertina_helper.type_defs.Mask`, and `rows[side][a]` is the row of `a`.
+
+    >>> geometry = ButtonGeometry.infer(([2, 2], [1]))
+    >>> geometry.left
+    (((0.0, 0.0), (1.0, 0.0)), ((0.0, 1.0), (1.0, 1.0)))
+    >>> list(geometry.distances[0])[:4]
+    [0.0, 1.0, 1.0, 1.4142135623730951]
+    '''
+    left: Coordinates
+    right: Coordinates
+    distances: tuple[array, array] = field(init=False, repr=False, compare=False)
+    rows: tuple[array, array] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        distances = []
+        rows = []
+        for side in (self.left, self.right):
+            points = [point for row in side for point in row]
+            distances.append(array('d', (dist(a, b) for a in points for b in points)))
+            rows.append(array('i', (i for i, row in enumerate(side) for _ in row)))
+        object.__setattr__(self, 'distances', tuple(distances))
+        object.__setattr__(self, 'rows', tuple(rows))
+
+    @property
+    def shape(self) -> Shape:
+        return ([len(row) for row in self.left], [len(row) for row in self.right])
+
+    @staticmethod
+    def infer(shape: Shape) -> ButtonGeometry:
+        '''
+        Places the buttons on a grid, one unit apart,
+        with the column as `x` and the row as `y`.
+        '''
+        left, right = shape
+        return _infer(tuple(left), tuple(right))
+
+
+@lru_cache(maxsize=None)
+def _infer(left: tuple[int, ...], right: tuple[int, ...]) -> ButtonGeometry:
+    def grid(side: tuple[int, ...]) -> Coordinates:
+        return tuple(
+            tuple((float(x), float(y)) for x in range(length))
+            for y, length in enumerate(side))
+    return ButtonGeometry(grid(left), grid(right))
+
+
+def parse_geometry(geometry_spec: dict) -> ButtonGeometry:
+    '''
+    Each side is a list of rows, and each row a string of `x,y` pairs:
+
+    >>> parse_geometry({'left': ['0,0 1,0.5'], 'right': ['0,0']}).left
+    (((0.0, 0.0), (1.0, 0.5)),)
+    '''
+    def parse_side(rows: Iterable[str]) -> Coordinates:
+        sides = []
+        for row in rows:
+            points = []
+            for pair in re.split(r'\s+', row.strip()):
+                x, y = pair.split(',')
+                points.append((float(x), float(y)))
+            sides.append(tuple(points))
+        return tuple(sides)
+    return ButtonGeometry(
+        parse_side(geometry_spec['left']), parse_side(geometry_spec['right']))
+
+
+def load_geometry_by_path(layout_path: Path) -> ButtonGeometry:
+    '''
+    Reads the optional `geometry` section of a uni- or bisonoric layout file,
+    with `left` and `right` inside, as in `parse_geometry`.
+    If there is none, the geometry is inferred from the shape of the layout.
+    Raises `ValueError` if the geometry does not match the layout.
+    '''
+    spec = safe_load(layout_path.read_text())
+    layout_spec = spec['push'] if 'push' in spec else spec
+    shape = tuple(
+        [len(re.split(r'\s+', row.strip())) for row in layout_spec[side]]
+        for side in ('left', 'right'))
+    if 'geometry' not in spec:
+        return ButtonGeometry.infer((shape[0], shape[1]))
+    geometry = parse_geometry(spec['geometry'])
+    if geometry.shape != shape:
+        raise ValueError(
+            f'Geometry shape does not match layout: {geometry.shape} != {shape}')
+    return geometry
+
+
+def _sides(f: _Fingering) -> tuple[Mask, Mask]:
+    return (f.fingering.left_mask, f.fingering.right_mask)
+
+
+def _geometry_for(geometry: ButtonGeometry | None, f: _Fingering) -> ButtonGeometry:
+    if geometry is not None:
+        return geometry
+    left, right = _sides(f)
+    return _infer(
+        tuple(len(row) for row in left), tuple(len(row) for row in right))
+
+
+def _moves(
+        geometry: ButtonGeometry | None,
+        f1: _Fingering, f2: _Fingering) -> Iterator[tuple[int, int, int, int]]:
+    '''
+    For each button pressed for `f2` on a side where a button was pressed
+    for `f1`, yields the side, the nearest button from `f1`,
+    the button from `f2`, and the number of buttons on the side.
+    '''
+    g = _geometry_for(geometry, f2)
+    for side, (m1, m2) in enumerate(zip(_sides(f1), _sides(f2))):
+        if not (m1.bits and m2.bits):
+            continue
+        n = len(g.rows[side])
+        table = g.distances[side]
+        for b in m2.buttons():
+            a = min(m1.buttons(), key=lambda a: table[a * n + b])
+            yield side, a, b, n
+
+
+def penalize_finger_travel(
+        cost: float, geometry: ButtonGeometry | None = None) -> PenaltyFunction:
+    '''
+    Penalize the distance each hand moves between notes,
+    in button spacings, from the nearest button it last pressed.
+    '''
+    return partial(_calculate_finger_travel, cost, geometry)
+
+
+def _calculate_finger_travel(
+        cost: float, geometry: ButtonGeometry | None,
+        f1: _Fingering, f2: _Fingering) -> float:
+    g = _geometry_for(geometry, f2)
+    return cost * sum(
+        g.distances[side][a * n + b] for side, a, b, n in _moves(g, f1, f2))
+
+
+def penalize_row_jump(
+        cost: float, geometry: ButtonGeometry | None = None) -> PenaltyFunction:
+    '''
+    Penalize each row a hand crosses between notes.
+    '''
+    return partial(_calculate_row_jump, cost, geometry)
+
+
+def _calculate_row_jump(
+        cost: float, geometry: ButtonGeometry | None,
+        f1: _Fingering, f2: _Fingering) -> float:
+    g = _geometry_for(geometry, f2)
+    return cost * sum(
+        abs(g.rows[side][a] - g.rows[side][b]) for side, a, b, _ in _moves(g, f1, f2))
+
+
+def penalize_chord_stretch(
+        cost: float, geometry: ButtonGeometry | None = None) -> PenaltyFunction:
+    '''
+    Penalize chords by the widest distance between buttons held by one hand.
+    '''
+    return partial(_calculate_chord_stretch, cost, geometry)
+
+
+def _calculate_chord_stretch(
+        cost: float, geometry: ButtonGeometry | None,
+        f1: _Fingering, f2: _Fingering) -> float:
+    g = _geometry_for(geometry, f2)
+    total = 0.0
+    for side, mask in enumerate(_sides(f2)):
+        if mask.bits & (mask.bits - 1):
+            n = len(g.rows[side])
+            buttons = list(mask.buttons())
+            total += max(
+                g.distances[side][a * n + b] for a in buttons for b in buttons)
+    return cost * total
@@ -0,0 +1,341 @@
+'''
+Compiles a layout and a set of penalties into flat tables of numbers,
+which can be published once into shared memory, and attached read-only
+by worker processes, instead of each worker loading the layout
+and evaluating the penalties again.
+
+Every button, on push and on pull, is a fingering with an integer id.
+The tables hold the MIDI number of each fingering, the ids of the fingerings
+for each MIDI number, and the cost of moving between each pair of fingerings:
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> tables = compile_layout_tables(layout, [penalize_bellows_change(10)])
+>>> len(tables.fingerings)
+60
+>>> with publish_layout_tables(tables) as shared:
+...     attached = attach_layout_tables(shared.name)
+...     lattice = attached.lattice(notes_from_pitches(['G4', 'B4']))
+...     print(list(lattice.transition_costs(1)))
+...     attached.close()
+[1.0, 11.0, 1.0, 11.0, 11.0, 1.0]
+
+The costs are computed with placeholder annotations, so the penalties
+must only depend on the fingerings, like those in `concertina_helper.penalties`.
+'''
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+import json
+from multiprocessing.shared_memory import SharedMemory
+import struct
+import sys
+from types import TracebackType
+
+from .layouts.bisonoric import (
+    BisonoricLayout, BisonoricFingering, AnnotatedBisonoricFingering)
+from .layouts.layout_loader import _names_to_pitches
+from .layouts.unisonoric import UnisonoricFingering, UnisonoricLayout
+from .note_sequence import NoteSequence
+from .penalties import PenaltyFunction
+from .solvers.lattice import Lattice, STEP_COST, _sort_key
+from .type_defs import Annotation, Direction, Mask
+
+
+_MAGIC = b'CHT\x01'
+_HEADER = struct.Struct('<I')
+_MIDI_RANGE = 128
+'''
+The MIDI numbers covered by `LayoutTables.offsets`, unless the layout goes higher.
+'''
+_COLUMNS = (('semitones', 'h'), ('offsets', 'I'), ('ids', 'H'), ('costs', 'd'))
+'''
+The name and typecode of each table, in the order they are stored.
+'''
+
+
+def _single_button_masks(rows: Iterable[int]) -> list[Mask]:
+    rows = list(rows)
+    masks = []
+    for i, length in enumerate(rows):
+        for j in range(length):
+            masks.append(Mask(tuple(
+                tuple(i == k and j == n for n in range(row_length))
+                for k, row_length in enumerate(rows)
+            )))
+    return masks
+
+
+def _make_fingerings(layout: BisonoricLayout) -> tuple[BisonoricFingering, ...]:
+    '''
+    Returns one fingering for each button, numbered by id:
+    Push before pull, left before right, row by row.
+    '''
+    left_rows, right_rows = layout.shape
+    left_up = Mask(tuple((False,) * length for length in left_rows))
+    right_up = Mask(tuple((False,) * length for length in right_rows))
+    fingerings = []
+    for direction, unisonoric in [
+            (Direction.PUSH, layout.push_layout),
+            (Direction.PULL, layout.pull_layout)]:
+        for mask in _single_button_masks(left_rows):
+            fingerings.append(BisonoricFingering(
+                direction, UnisonoricFingering(unisonoric, mask, right_up)))
+        for mask in _single_button_masks(right_rows):
+            fingerings.append(BisonoricFingering(
+                direction, UnisonoricFingering(unisonoric, left_up, mask)))
+    return tuple(fingerings)
+
+
+@dataclass(frozen=True, eq=False)
+class LayoutTables:
+    '''
+    `semitones[i]` is the MIDI number of fingering `i`;
+    `ids[offsets[m]:offsets[m + 1]]` are the fingerings for MIDI number `m`,
+    for every `m` from 0 up to the highest note of the layout, or at least 127,
+    in the same order as the candidates of a
+    `concertina_helper.solvers.lattice.Lattice`;
+    and `costs[a * len(fingerings) + b]` is the cost of the edge from `a` to `b`,
+    including `concertina_helper.solvers.lattice.STEP_COST`.
+    The tables are read-only memoryviews, of shared memory if attached,
+    and the layout and fingerings are frozen, so one copy of the tables
+    can be used by many threads at once:
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> tables = compile_layout_tables(
+    ...     load_bisonoric_layout_by_name('30_wheatstone_cg'), [])
+    >>> tables.costs[0] = 0
+    Traceback (most recent call last):
+    ...
+    TypeError: cannot modify read-only memory
+    '''
+    layout: BisonoricLayout
+    semitones: Sequence[int]
+    offsets: Sequence[int]
+    ids: Sequence[int]
+    costs: Sequence[float]
+    fingerings: tuple[BisonoricFingering, ...] = field(init=False, repr=False)
+    _shared_memory: SharedMemory | None = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        for name, typecode in _COLUMNS:
+            column = getattr(self, name)
+            if not (isinstance(column, memoryview) and column.readonly):
+                object.__setattr__(
+                    self, name, memoryview(array(typecode, column)).toreadonly())
+        object.__setattr__(self, 'fingerings', _make_fingerings(self.layout))
+        count = len(self.fingerings)
+        if len(self.semitones) != count or len(self.costs) != count * count:
+            raise ValueError('Tables do not match the shape of the layout')
+
+    def candidate_ids(self, midi_number: int) -> tuple[int, ...]:
+        '''
+        Returns the ids of the fingerings for a MIDI number.
+        '''
+        if not 0 <= midi_number < len(self.offsets) - 1:
+            return ()
+        return tuple(self.ids[self.offsets[midi_number]:self.offsets[midi_number + 1]])
+
+    def lattice(self, notes: Iterable[Annotation]) -> Lattice:
+        '''
+        Returns a lattice for the notes, with every transition table
+        gathered from the cost matrix, so no penalty is evaluated.
+        The candidates are the same, in the same order, as
+        `concertina_helper.solvers.lattice.Lattice.from_fingerings` would give.
+        Raises `ValueError`, listing every note that can not be played.
+        '''
+        sequence = NoteSequence.from_annotations(notes)
+        candidates: dict[int, tuple[int, ...]] = {}
+        for midi_number in set(sequence.semitones):
+            candidates[midi_number] = self.candidate_ids(midi_number)
+        unplayable = [
+            note for note, midi_number in zip(sequence, sequence.semitones)
+            if not candidates[midi_number]
+        ]
+        if unplayable:
+            raise ValueError('No fingerings for ' + ', '.join(
+                f'{note.pitch} in measure {note.measure}' for note in unplayable))
+
+        count = len(self.fingerings)
+        tables: dict[tuple[int, int], array] = {}
+        transition_costs: dict[int, array] = {}
+        layers = []
+        previous = -1
+        for position, (note, midi_number) in enumerate(
+                zip(sequence, sequence.semitones)):
+            layers.append(tuple(
+                AnnotatedBisonoricFingering(
+                    fingering=self.fingerings[i], annotation=note)
+                for i in candidates[midi_number]))
+            if position:
+                pair = (previous, midi_number)
+                if pair not in tables:
+                    tables[pair] = array('d', (
+                        self.costs[a * count + b]
+                        for a in candidates[previous]
+                        for b in candidates[midi_number]))
+                transition_costs[position] = tables[pair]
+            previous = midi_number
+        return Lattice(tuple(layers), (), transition_costs)
+
+    def close(self) -> None:
+        '''
+        Releases the views of shared memory, if attached;
+        The tables can not be used afterwards.
+        '''
+        if self._shared_memory is None:
+            return
+        for name, _ in _COLUMNS:
+            view = getattr(self, name)
+            assert isinstance(view, memoryview)
+            view.release()
+        self._shared_memory.close()
+
+
+def compile_layout_tables(
+        layout: BisonoricLayout,
+        penalty_functions: Iterable[PenaltyFunction]) -> LayoutTables:
+    '''
+    Numbers the fingerings of the layout, and evaluates the penalties
+    once for every pair of fingerings.
+    '''
+    penalty_functions = tuple(penalty_functions)
+    fingerings = _make_fingerings(layout)
+    annotated = [
+        AnnotatedBisonoricFingering(
+            fingering=f, annotation=Annotation(pitch=f.get_pitches().pop(), measure=1))
+        for f in fingerings
+    ]
+    semitones = array('h', (f.annotation.pitch.midi_number for f in annotated))
+    # A layout transposed far enough up has buttons beyond MIDI's 127.
+    midi_range = max(_MIDI_RANGE, max(semitones, default=-1) + 1)
+    by_midi_number: list[list[int]] = [[] for _ in range(midi_range)]
+    for i, midi_number in enumerate(semitones):
+        by_midi_number[midi_number].append(i)
+    offsets = array('I', [0])
+    ids = array('H')
+    for group in by_midi_number:
+        ids.extend(sorted(group, key=lambda i: _sort_key(annotated[i])))
+        offsets.append(len(ids))
+    costs = array('d', (
+        STEP_COST + sum(function(f1, f2) for function in penalty_functions)
+        for f1 in annotated
+        for f2 in annotated
+    ))
+    return LayoutTables(layout, semitones, offsets, ids, costs)
+
+
+def _layout_names(layout: BisonoricLayout) -> dict[str, list[list[str]]]:
+    return {
+        f'{direction}_{side}': [
+            [pitch.name for pitch in row]
+            for row in getattr(getattr(layout, f'{direction}_layout'), side)]
+        for direction in ('push', 'pull')
+        for side in ('left', 'right')
+    }
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+class SharedLayoutTables:
+    '''
+    Owns a block of shared memory holding compiled tables.
+    Workers attach to it by `name`; The owner should `unlink` it,
+    or use it as a context manager, once the workers are done.
+    '''
+    def __init__(self, tables: LayoutTables):
+        metadata = json.dumps({
+            'layout': _layout_names(tables.layout),
+            'lengths': [len(getattr(tables, name)) for name, _ in _COLUMNS],
+        }).encode()
+        offset = _align(len(_MAGIC) + _HEADER.size + len(metadata))
+        parts = []
+        for name, typecode in _COLUMNS:
+            column = array(typecode, getattr(tables, name))
+            if sys.byteorder == 'big':  # pragma: no cover
+                column.byteswap()
+            parts.append((offset, column.tobytes()))
+            offset = _align(offset + len(parts[-1][1]))
+        self.shared_memory = SharedMemory(create=True, size=offset)
+        buffer = self.shared_memory.buf
+        assert buffer is not None
+        header = _MAGIC + _HEADER.pack(len(metadata)) + metadata
+        buffer[:len(header)] = header
+        for start, data in parts:
+            buffer[start:start + len(data)] = data
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    def unlink(self) -> None:
+        '''
+        Frees the shared memory. Workers which are still attached
+        keep their views until they close them.
+        '''
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+    def __enter__(self) -> SharedLayoutTables:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None) -> None:
+        self.unlink()
+
+
+def publish_layout_tables(tables: LayoutTables) -> SharedLayoutTables:
+    '''
+    Copies the tables into a new block of shared memory.
+    '''
+    return SharedLayoutTables(tables)
+
+
+def attach_layout_tables(name: str) -> LayoutTables:
+    '''
+    Attaches to tables published by `publish_layout_tables`, without copying:
+    The tables are read-only views of the shared memory.
+    The layout is rebuilt from its pitch names, and the fingerings from the layout,
+    but no YAML is parsed, and no penalty is evaluated.
+    Call `LayoutTables.close` when done.
+    '''
+    shared_memory = SharedMemory(name=name)
+    buffer = shared_memory.buf
+    assert buffer is not None
+    if bytes(buffer[:len(_MAGIC)]) != _MAGIC:
+        shared_memory.close()
+        raise ValueError(f'Shared memory does not start with {_MAGIC!r}')
+    (metadata_length,) = _HEADER.unpack_from(buffer, len(_MAGIC))
+    start = len(_MAGIC) + _HEADER.size
+    metadata = json.loads(bytes(buffer[start:start + metadata_length]))
+    offset = _align(start + metadata_length)
+    views = []
+    for (_, typecode), length in zip(_COLUMNS, metadata['lengths']):
+        size = length * array(typecode).itemsize
+        view: memoryview = buffer[offset:offset + size].cast(
+            typecode).toreadonly()  # type: ignore
+        if sys.byteorder == 'big':  # pragma: no cover
+            swapped = array(typecode, view)
+            swapped.byteswap()
+            view = memoryview(swapped).toreadonly()
+        views.append(view)
+        offset = _align(offset + size)
+    names = metadata['layout']
+    layout = BisonoricLayout(
+        push_layout=UnisonoricLayout(
+            _names_to_pitches(names['push_left']),
+            _names_to_pitches(names['push_right'])),
+        pull_layout=UnisonoricLayout(
+            _names_to_pitches(names['pull_left']),
+            _names_to_pitches(names['pull_right'])))
+    semitones, offsets, ids, costs = views
+    return LayoutTables(layout, semitones, offsets, ids, costs, shared_memory)
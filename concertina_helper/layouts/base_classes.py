@@ -1,9 +1,10 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from collections.abc import Callable
+from dataclasses import dataclass
 from typing import TypeVar, Generic
 
-from ..type_defs import Shape, Pitch, PitchToStr
+from ..type_defs import Annotation, Direction, Shape, Pitch, PitchToStr
 
 
 T = TypeVar('T')
@@ -25,6 +26,37 @@ class Fingering(ABC):
         '''
 
 
+F = TypeVar('F', bound=Fingering, covariant=True)
+
+
+@dataclass(frozen=True, kw_only=True)
+class AnnotatedFingering(Generic[F]):
+    '''
+    Adds contextual information to the fingering
+    that is useful in finding the best fingering for a tune.
+    This works the same for uni- and bisonoric fingerings.
+    '''
+    fingering: F
+    annotation: Annotation
+
+    def __str__(self) -> str:
+        a = self.annotation
+        return f'Measure {a.measure} - {a.pitch}\n{self.fingering}'
+
+    def format(  # pragma: no branch
+            self,
+            button_down_f: PitchToStr = lambda pitch: '@',
+            button_up_f: PitchToStr = lambda pitch: '.',
+            direction_f: Callable[[Direction], str] =
+            lambda direction: direction.name) -> str:
+        a = self.annotation
+        formatted = self.fingering.format(
+            button_down_f=button_down_f,
+            button_up_f=button_up_f,
+            direction_f=direction_f)
+        return f'Measure {a.measure} - {a.pitch}\n{formatted}'
+
+
 class Layout(ABC, Generic[T]):
     @property
     @abstractmethod
@@ -33,6 +65,21 @@ class Layout(ABC, Generic[T]):
         Returns tuple representing the number of buttons in each row, left and right.
         '''
 
+    @property
+    @abstractmethod
+    def fingerprint(self) -> str:
+        '''
+        Returns a digest of the pitches, stable between runs,
+        so it can be used as a cache key.
+        '''
+
+    @property
+    @abstractmethod
+    def playable_bits(self) -> int:
+        '''
+        Returns an integer with a bit set for the MIDI number of each playable pitch.
+        '''
+
     @abstractmethod
     def get_fingerings(self, pitch: Pitch) -> set[T]:
         '''
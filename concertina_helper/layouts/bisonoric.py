@@ -4,8 +4,8 @@ from collections.abc import Callable
 from dataclasses import dataclass
 
 from .unisonoric import UnisonoricFingering, UnisonoricLayout
-from ..type_defs import Shape, PitchToStr, Mask, Pitch, Direction, Annotation
-from .base_classes import Layout, Fingering
+from ..type_defs import Shape, PitchToStr, Mask, Pitch, Direction
+from .base_classes import Layout, Fingering, AnnotatedFingering
 
 
 @dataclass(frozen=True, kw_only=True)
@@ -55,6 +55,21 @@ class BisonoricLayout(Layout['BisonoricFingering']):
                 'Push and pull layout shapes must match: '
                 f'{self.push_layout.shape} != {self.pull_layout.shape}')
 
+    @property
+    def fingerprint(self) -> str:
+        '''
+        Combines the fingerprints of the push and pull layouts:
+        Stable between runs, so it can be used as a cache key.
+        '''
+        return f'{self.push_layout.fingerprint}-{self.pull_layout.fingerprint}'
+
+    @property
+    def playable_bits(self) -> int:
+        '''
+        A bit is set for the MIDI number of each pitch playable on push or pull.
+        '''
+        return self.push_layout.playable_bits | self.pull_layout.playable_bits
+
     @property
     def shape(self) -> Shape:
         return (
@@ -126,28 +141,7 @@ class BisonoricFingering(Fingering):
         return self._fingering.get_pitches()
 
 
-@dataclass(frozen=True, kw_only=True)
-class AnnotatedBisonoricFingering:
-    '''
-    Adds contextual information to the fingering
-    that is useful in finding the best fingering for a tune.
-    '''
-    fingering: BisonoricFingering
-    annotation: Annotation
-
-    def __str__(self) -> str:
-        a = self.annotation
-        return f'Measure {a.measure} - {a.pitch}\n{self.fingering}'
-
-    def format(  # pragma: no branch
-            self,
-            button_down_f: PitchToStr = lambda pitch: '@',
-            button_up_f: PitchToStr = lambda pitch: '.',
-            direction_f: Callable[[Direction], str] =
-            lambda direction: direction.name) -> str:
-        a = self.annotation
-        formatted = self.fingering.format(
-            button_down_f=button_down_f,
-            button_up_f=button_up_f,
-            direction_f=direction_f)
-        return f'Measure {a.measure} - {a.pitch}\n{formatted}'
+AnnotatedBisonoricFingering = AnnotatedFingering[BisonoricFingering]
+'''
+A bisonoric fingering, with the note it plays.
+'''
@@ -75,6 +75,24 @@ def load_bisonoric_layout_by_path(layout_path: Path) -> BisonoricLayout:
     return parse_bisonoric_layout(layout_spec)
 
 
+def load_unisonoric_layout_by_path(layout_path: Path) -> UnisonoricLayout:
+    '''
+    Expects the file at `layout_path` to be YAML, like one half
+    of a bisonoric layout, with `left` and `right` at the top level:
+    ```
+    left:
+        - C4 E4 G4 B4
+        - Eb4 F#4 Bb4 C#5
+    right:
+        - D4 F4 A4 C5
+        - C#4 F4 Ab4 D#5
+    ```
+    '''
+    layout_yaml = layout_path.read_text()
+    layout_spec = safe_load(layout_yaml)
+    return parse_unisonoric_layout(layout_spec)
+
+
 def load_bisonoric_layout_by_name(layout_name: str) -> BisonoricLayout:
     '''
     The `layout_name` must be one of the names returned by `list_layout_names()`.
@@ -94,10 +112,3 @@ def list_layout_names() -> Iterable[str]:
     ['20_cg', '30_jefferies_cg', '30_wheatstone_cg']
     '''
     return sorted([path.stem for path in Path(__file__).parent.glob('*.yaml')])
-
-
-# TODO: Add a test and uncomment.
-# def load_unisonoric_layout_by_path(layout_path: Path) -> UnisonoricLayout:
-#     layout_yaml = layout_path.read_text()
-#     layout_spec = safe_load(layout_yaml)
-#     return _parse_unisonoric_layout(layout_spec)
@@ -1,16 +1,73 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from hashlib import blake2b
 from typing import Any
 from collections.abc import Callable
 
 from ..type_defs import Shape, Pitch, PitchToStr, PitchMatrix, Mask, Direction
-from .base_classes import Layout, Fingering
+from .base_classes import Layout, Fingering, AnnotatedFingering
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False)
 class UnisonoricLayout(Layout['UnisonoricFingering']):
+    '''
+    Layouts are compared and hashed by a fingerprint of their pitches,
+    computed once, since every fingering holds a reference to its layout.
+    The fingerprint is stable between runs, so it can also be used as a cache key.
+    `playable_bits` has a bit set for the MIDI number of each button,
+    so checking if a pitch can be played is a shift and a mask:
+    See `concertina_helper.playability`.
+
+    >>> from concertina_helper.layouts.layout_loader import _names_to_pitches
+    >>> layout = UnisonoricLayout(
+    ...     _names_to_pitches([['C4', 'E4']]), _names_to_pitches([['G4']]))
+    >>> layout.fingerprint
+    '201545f7eca0d3d4160bf37d748cfb6c'
+    >>> layout == UnisonoricLayout(
+    ...     _names_to_pitches([['C4', 'E4']]), _names_to_pitches([['G4']]))
+    True
+    >>> layout == layout.transpose(1)
+    False
+    '''
     left: PitchMatrix
     right: PitchMatrix
+    _fingerprint: str = field(init=False, repr=False)
+    _playable_bits: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        midi_numbers = [
+            [[pitch.midi_number for pitch in row] for row in matrix]
+            for matrix in (self.left, self.right)
+        ]
+        canonical = ';'.join(
+            '|'.join(' '.join(str(number) for number in row) for row in matrix)
+            for matrix in midi_numbers
+        )
+        object.__setattr__(
+            self, '_fingerprint',
+            blake2b(canonical.encode(), digest_size=16).hexdigest())
+        bits = 0
+        for matrix in midi_numbers:
+            for row in matrix:
+                for number in row:
+                    bits |= 1 << number
+        object.__setattr__(self, '_playable_bits', bits)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    @property
+    def playable_bits(self) -> int:
+        return self._playable_bits
+
+    def __eq__(self, other: Any) -> bool:
+        if type(self) != type(other):
+            return NotImplemented
+        return self is other or self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
 
     @property
     def shape(self) -> Shape:
@@ -62,11 +119,31 @@ class UnisonoricLayout(Layout['UnisonoricFingering']):
             self.right.transpose(semitones))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False)
 class UnisonoricFingering(Fingering):
+    '''
+    Fingerings are compared and hashed by the layout fingerprint
+    and the integer bits of the masks, rather than by their nested tuples.
+    '''
     layout: UnisonoricLayout
     left_mask: Mask
     right_mask: Mask
+    _key: tuple[str, int, int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Python's string hashes differ between processes,
+        # so only the key is stored, and not its hash.
+        object.__setattr__(
+            self, '_key',
+            (self.layout.fingerprint, self.left_mask.bits, self.right_mask.bits))
+
+    def __eq__(self, other: Any) -> bool:
+        if type(self) != type(other):
+            return NotImplemented
+        return self is other or self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
 
     def __str__(self) -> str:
         filler = '--- '
@@ -130,3 +207,9 @@ class UnisonoricFingering(Fingering):
                     if button:
                         pitches.add(pitch)
         return pitches
+
+
+AnnotatedUnisonoricFingering = AnnotatedFingering[UnisonoricFingering]
+'''
+A unisonoric fingering, with the note it plays.
+'''
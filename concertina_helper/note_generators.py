@@ -1,9 +1,13 @@
 from __future__ import annotations
-from collections.abc import Iterable
+from array import array
+from collections.abc import Iterable, Iterator
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
 
 from pyabc2 import Tune
 
-from .type_defs import Annotation, Pitch
+from .note_sequence import NoteSequence
+from .type_defs import Annotation, Pitch, _MIDI_OFFSET
 
 
 def notes_from_tune(tune: Tune) -> Iterable[Annotation]:
@@ -30,6 +34,40 @@ def notes_from_tune(tune: Tune) -> Iterable[Annotation]:
             )
 
 
+def note_sequence_from_tune(tune: Tune) -> NoteSequence:
+    '''
+    Like `notes_from_tune`, but returns a
+    `concertina_helper.note_sequence.NoteSequence`,
+    which also has the duration of each note, and its offset in the measure.
+
+    >>> tune = Tune("""
+    ... X: 1
+    ... L: 1/8
+    ... K: Cmaj
+    ... C2EG|c4||
+    ... """)
+    >>> notes = note_sequence_from_tune(tune)
+    >>> list(notes.semitones), list(notes.measures)
+    ([60, 64, 67, 72], [1, 1, 1, 2])
+    >>> list(notes.durations), list(notes.beats)
+    ([0.25, 0.125, 0.125, 0.5], [0.0, 0.25, 0.375, 0.0])
+    '''
+    semitones = array('h')
+    measures = array('i')
+    durations = array('d')
+    beats = array('d')
+    for i, measure in enumerate(tune.measures):
+        beat = 0.0
+        for note in measure:
+            semitones.append(note.value + _MIDI_OFFSET)
+            measures.append(i + 1)
+            duration = float(note.duration)
+            durations.append(duration)
+            beats.append(beat)
+            beat += duration
+    return NoteSequence(semitones, measures, durations, beats)
+
+
 def notes_from_pitches(pitch_names: Iterable[str]) -> Iterable[Annotation]:
     '''
     Given a sequence of scientific pitch names,
@@ -46,3 +84,157 @@ def notes_from_pitches(pitch_names: Iterable[str]) -> Iterable[Annotation]:
             measure=1,
             pitch=Pitch(name.strip())
         )
+
+
+BINARY_MAGIC = b'CHN\x01'
+'''
+The first bytes of a binary note file. After that, each note is one byte,
+its MIDI number, followed by the number of measures since the previous note
+(or since measure 0, for the first note) as an unsigned LEB128 varint:
+Usually just one more byte.
+'''
+
+
+def is_binary_notes(path: Path) -> bool:
+    '''
+    Returns true if the file at `path` starts with `BINARY_MAGIC`.
+    '''
+    with path.open('rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def _decode_binary(data: bytes | mmap, path: Path) -> Iterator[tuple[int, int]]:
+    '''
+    Yields the MIDI number and measure of each note.
+    '''
+    measure = 0
+    offset = len(BINARY_MAGIC)
+    while offset < len(data):
+        midi_number = data[offset]
+        offset += 1
+        delta = 0
+        shift = 0
+        while True:
+            if offset >= len(data):
+                raise ValueError(f'Truncated note at byte {offset} of {path}')
+            byte = data[offset]
+            offset += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        measure += delta
+        yield midi_number, measure
+
+
+def notes_from_binary(path: Path) -> Iterator[Annotation]:
+    '''
+    Given the path of a file written by `write_binary_notes`,
+    memory-maps it and lazily decodes the annotated pitches,
+    so large files are never read into memory all at once.
+    '''
+    if not is_binary_notes(path):
+        raise ValueError(f'{path} does not start with {BINARY_MAGIC!r}')
+    pitches: dict[int, Pitch] = {}
+    with path.open('rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+        for midi_number, measure in _decode_binary(data, path):
+            if midi_number not in pitches:
+                pitches[midi_number] = Pitch.from_midi_number(midi_number)
+            yield Annotation(measure=measure, pitch=pitches[midi_number])
+
+
+def note_sequence_from_binary(path: Path) -> NoteSequence:
+    '''
+    Like `notes_from_binary`, but decodes straight into a
+    `concertina_helper.note_sequence.NoteSequence`,
+    without creating an annotation for each note,
+    or copying the file into memory.
+    '''
+    if not is_binary_notes(path):
+        raise ValueError(f'{path} does not start with {BINARY_MAGIC!r}')
+    semitones = array('h')
+    measures = array('i')
+    with path.open('rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+        for midi_number, measure in _decode_binary(data, path):
+            semitones.append(midi_number)
+            measures.append(measure)
+    return NoteSequence(semitones, measures)
+
+
+def _encode_note(midi_number: int, delta: int) -> bytes:
+    if not 0 <= midi_number < 128:
+        raise ValueError(f'MIDI number out of range: {midi_number}')
+    if delta < 0:
+        raise ValueError('Measure numbers must not decrease')
+    encoded = bytearray([midi_number])
+    while delta >= 0x80:
+        encoded.append(delta & 0x7F | 0x80)
+        delta >>= 7
+    encoded.append(delta)
+    return bytes(encoded)
+
+
+def write_binary_notes(notes: Iterable[Annotation], path: Path) -> None:
+    '''
+    Writes annotated pitches in the format read by `notes_from_binary`.
+    The notes are consumed one at a time, so they can come from a generator.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as tmp:
+    ...     path = Path(tmp) / 'notes.bin'
+    ...     write_binary_notes(notes_from_pitches(['C4', 'E4', 'G4']), path)
+    ...     print(path.read_bytes())
+    ...     for note in notes_from_binary(path):
+    ...         print(note)
+    b'CHN\\x01<\\x01@\\x00C\\x00'
+    Annotation(pitch=Pitch(name='C4'), measure=1)
+    Annotation(pitch=Pitch(name='E4'), measure=1)
+    Annotation(pitch=Pitch(name='G4'), measure=1)
+    '''
+    with path.open('wb') as f:
+        f.write(BINARY_MAGIC)
+        measure = 0
+        for midi_number, next_measure in _midi_numbers_and_measures(notes):
+            f.write(_encode_note(midi_number, next_measure - measure))
+            measure = next_measure
+
+
+def _midi_numbers_and_measures(
+        notes: Iterable[Annotation]) -> Iterable[tuple[int, int]]:
+    if isinstance(notes, NoteSequence):
+        return zip(notes.semitones, notes.measures)
+    return _convert_annotations(notes)
+
+
+def _convert_annotations(notes: Iterable[Annotation]) -> Iterator[tuple[int, int]]:
+    midi_numbers: dict[Pitch, int] = {}
+    for note in notes:
+        if note.pitch not in midi_numbers:
+            midi_numbers[note.pitch] = note.pitch.midi_number
+        yield midi_numbers[note.pitch], note.measure
+
+
+def convert_pitches_to_binary(pitches_path: Path, binary_path: Path) -> None:
+    '''
+    Converts a text file with one pitch per line, as read by `notes_from_pitches`,
+    to the binary format, reading one line at a time. Blank lines are skipped.
+    '''
+    with pitches_path.open() as lines:
+        write_binary_notes(
+            notes_from_pitches(line for line in lines if line.strip()),
+            binary_path)
+
+
+def notes_from_path(path: Path) -> Iterable[Annotation]:
+    '''
+    Reads a file in any of the supported formats: Binary, if it starts with
+    `BINARY_MAGIC`; ABC, if it starts with "X:"; Otherwise, one pitch per line.
+    '''
+    if is_binary_notes(path):
+        return notes_from_binary(path)
+    text = path.read_text()
+    return (
+        notes_from_tune(Tune(text))
+        if text.startswith('X:') else
+        notes_from_pitches(text.split('\n'))
+    )
@@ -0,0 +1,156 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+import struct
+import sys
+from typing import overload
+
+from .type_defs import Annotation, Pitch
+
+
+_MAGIC = b'CHS\x01'
+_HEADER = struct.Struct('<IB')
+_HAS_DURATIONS = 1
+_HAS_BEATS = 2
+
+
+@dataclass(frozen=True, eq=False)
+class NoteSequence(Sequence[Annotation]):
+    '''
+    The notes of a tune, stored as parallel arrays rather than objects:
+    `semitones` holds MIDI numbers, and `measures` the measure of each note.
+    `durations` and `beats`, if present, are the length of each note,
+    and its offset from the start of the measure, both as fractions of a whole note.
+
+    It is a sequence of `concertina_helper.type_defs.Annotation`,
+    so it can be used wherever an iterable of annotations is expected,
+    but slicing, hashing, and serialization work directly on the arrays:
+
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> notes = NoteSequence.from_annotations(notes_from_pitches(['C4', 'E4', 'G4']))
+    >>> notes
+    NoteSequence(semitones=array('h', [60, 64, 67]), \
+measures=array('i', [1, 1, 1]), durations=None, beats=None)
+    >>> notes[1]
+    Annotation(pitch=Pitch(name='E4'), measure=1)
+    >>> notes[1:]
+    NoteSequence(semitones=array('h', [64, 67]), \
+measures=array('i', [1, 1]), durations=None, beats=None)
+    >>> NoteSequence.from_bytes(notes.to_bytes()) == notes
+    True
+    '''
+    semitones: array
+    measures: array
+    durations: array | None = None
+    beats: array | None = None
+
+    def __post_init__(self) -> None:
+        if self.semitones.typecode != 'h' or self.measures.typecode != 'i':
+            raise ValueError("semitones must be array('h'), and measures array('i')")
+        for name in ('measures', 'durations', 'beats'):
+            column = getattr(self, name)
+            if column is not None and len(column) != len(self.semitones):
+                raise ValueError(f'{name} must be the same length as semitones')
+
+    @staticmethod
+    def from_annotations(notes: Iterable[Annotation]) -> NoteSequence:
+        '''
+        Packs annotations into arrays. Each distinct pitch is only converted once.
+        '''
+        if isinstance(notes, NoteSequence):
+            return notes
+        midi_numbers: dict[Pitch, int] = {}
+        semitones = array('h')
+        measures = array('i')
+        for note in notes:
+            if note.pitch not in midi_numbers:
+                midi_numbers[note.pitch] = note.pitch.midi_number
+            semitones.append(midi_numbers[note.pitch])
+            measures.append(note.measure)
+        return NoteSequence(semitones, measures)
+
+    def __len__(self) -> int:
+        return len(self.semitones)
+
+    @overload
+    def __getitem__(self, i: int) -> Annotation: ...  # pragma: no cover
+
+    @overload
+    def __getitem__(self, i: slice) -> NoteSequence: ...  # pragma: no cover
+
+    def __getitem__(self, i: int | slice) -> Annotation | NoteSequence:
+        if isinstance(i, slice):
+            return NoteSequence(
+                self.semitones[i], self.measures[i],
+                None if self.durations is None else self.durations[i],
+                None if self.beats is None else self.beats[i])
+        return Annotation(
+            pitch=Pitch.from_midi_number(self.semitones[i]),
+            measure=self.measures[i])
+
+    def __iter__(self) -> Iterator[Annotation]:
+        pitches: dict[int, Pitch] = {}
+        for midi_number, measure in zip(self.semitones, self.measures):
+            if midi_number not in pitches:
+                pitches[midi_number] = Pitch.from_midi_number(midi_number)
+            yield Annotation(pitch=pitches[midi_number], measure=measure)
+
+    def _columns(self) -> tuple[array | None, ...]:
+        return (self.semitones, self.measures, self.durations, self.beats)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, NoteSequence):
+            return NotImplemented
+        return self._columns() == other._columns()
+
+    def __hash__(self) -> int:
+        return hash(tuple(
+            None if column is None else column.tobytes()
+            for column in self._columns()))
+
+    def to_bytes(self) -> bytes:
+        '''
+        Serializes the arrays, little-endian, after a short header.
+        '''
+        flags = (
+            (_HAS_DURATIONS if self.durations is not None else 0)
+            | (_HAS_BEATS if self.beats is not None else 0))
+        parts = [_MAGIC, _HEADER.pack(len(self), flags)]
+        for column in self._columns():
+            if column is not None:
+                if sys.byteorder == 'big':  # pragma: no cover
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> NoteSequence:
+        '''
+        The inverse of `to_bytes`.
+        '''
+        if not data.startswith(_MAGIC):
+            raise ValueError(f'Note sequence does not start with {_MAGIC!r}')
+        length, flags = _HEADER.unpack_from(data, len(_MAGIC))
+        offset = len(_MAGIC) + _HEADER.size
+        columns: list[array | None] = []
+        for typecode, present in [
+            ('h', True), ('i', True),
+            ('d', bool(flags & _HAS_DURATIONS)), ('d', bool(flags & _HAS_BEATS)),
+        ]:
+            if not present:
+                columns.append(None)
+                continue
+            column = array(typecode)
+            end = offset + length * column.itemsize
+            if end > len(data):
+                raise ValueError('Truncated note sequence')
+            column.frombytes(data[offset:end])
+            if sys.byteorder == 'big':  # pragma: no cover
+                column.byteswap()
+            columns.append(column)
+            offset = end
+        semitones, measures, durations, beats = columns
+        assert semitones is not None and measures is not None
+        return NoteSequence(semitones, measures, durations, beats)
@@ -1,49 +1,128 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Generic
 
-from .layouts.bisonoric import BisonoricLayout, AnnotatedBisonoricFingering
-from .finger_finder import find_best_fingerings
+from .constraints import Constraint, apply_constraints
+from .layouts.base_classes import AnnotatedFingering, F, Layout
+from .finger_finder import BestFingerings, find_best_fingerings
+from .note_sequence import NoteSequence
+from .solvers.progress import CancellationToken, ProgressCallback
+from .solvers.registry import DEFAULT_SOLVER_NAME
 from .penalties import PenaltyFunction
-from .type_defs import Annotation
+from .playability import find_unplayable_notes
+from .stateful_penalties import StatefulPenalty
+from .type_defs import Annotation, Pitch
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .result_cache import FingeringCache
 
 
 @dataclass
-class NotesOnLayout:
+class NotesOnLayout(Generic[F]):
     '''
-    Represents a sequence of notes on a particular layout
+    Represents a sequence of notes on a particular layout.
+    `notes` may be any iterable of annotations, including a
+    `concertina_helper.note_sequence.NoteSequence`.
+    The layout may be uni- or bisonoric.
+    Only fingerings which match the `constraints` are considered:
+    See `concertina_helper.constraints`.
     '''
     notes: Iterable[Annotation]
-    layout: BisonoricLayout
+    layout: Layout[F]
+    constraints: Sequence[Constraint] = ()
+
+    def _notes_and_fingerings(self) -> Iterator[tuple[Annotation, set[F]]]:
+        '''
+        Yields each note, with the fingerings for its pitch.
+        The fingerings for each distinct pitch are only looked up once,
+        and for a `concertina_helper.note_sequence.NoteSequence`,
+        by MIDI number, straight from its arrays.
+        '''
+        if isinstance(self.notes, NoteSequence):
+            by_midi_number: dict[int, tuple[Pitch, set[F]]] = {}
+            for midi_number, measure in zip(
+                    self.notes.semitones, self.notes.measures):
+                if midi_number not in by_midi_number:
+                    pitch = Pitch.from_midi_number(midi_number)
+                    by_midi_number[midi_number] = (
+                        pitch, self.layout.get_fingerings(pitch))
+                pitch, fingerings = by_midi_number[midi_number]
+                yield Annotation(pitch=pitch, measure=measure), fingerings
+            return
+        fingerings_by_pitch: dict[Pitch, set[F]] = {}
+        for annotation in self.notes:
+            pitch = annotation.pitch
+            if pitch not in fingerings_by_pitch:
+                fingerings_by_pitch[pitch] = self.layout.get_fingerings(pitch)
+            yield annotation, fingerings_by_pitch[pitch]
 
     def get_all_fingerings(self) -> \
-            Iterable[tuple[Annotation, set[AnnotatedBisonoricFingering]]]:
+            Iterable[tuple[Annotation, set[AnnotatedFingering[F]]]]:
         '''
-        For each note in the tune, returns all possible fingerings.
+        For each note in the tune, returns all possible fingerings
+        which match the constraints.
+        The fingerings for each distinct pitch are only looked up once.
         '''
-        return [
+        all_fingerings = [
             (
                 annotation,
                 {
-                    AnnotatedBisonoricFingering(
-                        fingering=f,
-                        annotation=annotation)
-                    for f in self.layout.get_fingerings(annotation.pitch)
+                    AnnotatedFingering(fingering=f, annotation=annotation)
+                    for f in fingerings
                 }
             )
-            for annotation in self.notes
+            for annotation, fingerings in self._notes_and_fingerings()
+        ]
+        if not self.constraints:
+            return all_fingerings
+        f_sets = apply_constraints(
+            (f_set for _, f_set in all_fingerings), self.constraints)
+        return [
+            (annotation, f_set)
+            for (annotation, _), f_set in zip(all_fingerings, f_sets)
         ]
 
-    def get_best_fingerings(self, penalty_functions: Iterable[PenaltyFunction]) \
-            -> Iterable[AnnotatedBisonoricFingering]:
+    def get_best_fingerings(
+            self,
+            penalty_functions: Iterable[PenaltyFunction[F] | StatefulPenalty],
+            solver_name: str = DEFAULT_SOLVER_NAME,
+            cache: FingeringCache | None = None,
+            executor: Executor | None = None,
+            progress: ProgressCallback | None = None,
+            cancel: CancellationToken | None = None) -> BestFingerings[F]:
         '''
         Returns a list of fingerings that minimizes the cost for the entire tune,
-        as measured by the provided `penalty_functions`.
+        as measured by the provided `penalty_functions`,
+        which may include `concertina_helper.stateful_penalties.StatefulPenalty`.
+        `solver_name` selects the search backend;
+        See `concertina_helper.solvers.registry.list_solver_names`.
+        If a `cache` is given, results are looked up there first:
+        See `concertina_helper.result_cache`.
+        If there are constraints, independent parts of the tune
+        are solved in the `executor`, if one is given:
+        See `concertina_helper.finger_finder.find_best_fingerings`,
+        which also describes `progress` and `cancel`,
+        and the returned `concertina_helper.finger_finder.BestFingerings`,
+        which says whether the fingerings are proven optimal.
+        Raises `ValueError`, listing every note that can not be played,
+        before any fingerings are built.
+        A `concertina_helper.note_sequence.NoteSequence` is read from its arrays:
+        Annotations are only made for the fingerings.
         '''
-        f_sets = []
-        for annotation, f_set in self.get_all_fingerings():
-            if not f_set:
-                a = annotation
-                raise ValueError(f'No fingerings for {a.pitch} in measure {a.measure}')
-            f_sets.append(f_set)
-        return find_best_fingerings(f_sets, penalty_functions)
+        if cache is not None:
+            return cache.get_best_fingerings(
+                self, list(penalty_functions), solver_name, executor, progress, cancel)
+        # Other iterables may only be read once.
+        notes = self.notes if isinstance(self.notes, NoteSequence) else list(self.notes)
+        unplayable = find_unplayable_notes(notes, self.layout)
+        if unplayable:
+            raise ValueError('No fingerings for ' + ', '.join(
+                f'{a.pitch} in measure {a.measure}' for a in unplayable))
+        f_sets = [
+            f_set for _, f_set in NotesOnLayout(notes, self.layout).get_all_fingerings()
+        ]
+        return find_best_fingerings(
+            f_sets, penalty_functions, solver_name, self.constraints, executor,
+            progress, cancel)
@@ -1,8 +1,39 @@
 from __future__ import annotations
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from functools import lru_cache
+from typing import TextIO
+import sys
 
-from .layouts.bisonoric import AnnotatedBisonoricFingering
-from .type_defs import Direction
+from .layouts.bisonoric import AnnotatedBisonoricFingering, BisonoricFingering
+from .solvers.progress import Progress
+from .type_defs import Direction, PitchToStr
+
+
+_CHARS = {
+    Direction.PUSH: '➀➁➂➃➄➅➆➇➈➉⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳',
+    Direction.PULL: '➊➋➌➍➎➏➐➑➒➓⓫⓬⓭⓮⓯⓰⓱⓲⓳⓴'
+}
+
+MAX_CONDENSED_LENGTH = len(_CHARS[Direction.PUSH])
+'''
+There are only enough circled number glyphs to condense this many fingerings.
+'''
+
+
+def _button_coordinates(fingering: BisonoricFingering) -> tuple[int, ...]:
+    '''
+    Returns the indexes of the buttons held down, counting row by row,
+    first across the left side and then the right.
+    '''
+    coordinates = []
+    index = 0
+    for mask in (fingering.left_mask, fingering.right_mask):
+        for row in mask:
+            for button in row:
+                if button:
+                    coordinates.append(index)
+                index += 1
+    return tuple(coordinates)
 
 
 def condense(fingerings: Iterable[AnnotatedBisonoricFingering]) -> str:
@@ -10,6 +41,7 @@ def condense(fingerings: Iterable[AnnotatedBisonoricFingering]) -> str:
     Given a sequence of fingerings,
     returns a compact, tab delimitted string representation
     of the entire sequence, up to 20 fingerings.
+    For longer sequences, see `condense_by_measure`.
 
     Buttons to hit while pushing are represented like this:
     > ➀➁➂
@@ -17,38 +49,223 @@ def condense(fingerings: Iterable[AnnotatedBisonoricFingering]) -> str:
     while buttons for the pull are represented:
     > ➊➋➌
     '''
-    chars = {
-        Direction.PUSH: '➀➁➂➃➄➅➆➇➈➉⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳',
-        Direction.PULL: '➊➋➌➍➎➏➐➑➒➓⓫⓬⓭⓮⓯⓰⓱⓲⓳⓴'
-    }
+    return _condense(list(fingerings), {})
+
 
-    f_list = list(fingerings)
-    max_len = len(chars[Direction.PUSH])
-    if len(f_list) > max_len:
+def _condense(
+        f_list: Sequence[AnnotatedBisonoricFingering],
+        coordinates_cache: dict[BisonoricFingering, tuple[int, ...]]) -> str:
+    '''
+    Builds the grid in one pass over the buttons held down by each fingering;
+    Their coordinates are cached, since most tunes reuse a few fingerings.
+    '''
+    if len(f_list) > MAX_CONDENSED_LENGTH:
         raise ValueError(
             f'Length of fingerings ({len(f_list)}) '
-            f'greater than allowed ({max_len})')
-
-    left = [[''] * row_len for row_len in f_list[0].fingering.left_mask.shape]
-    right = [[''] * row_len for row_len in f_list[0].fingering.right_mask.shape]
+            f'greater than allowed ({MAX_CONDENSED_LENGTH})')
 
+    first = f_list[0].fingering
+    left_shape = list(first.left_mask.shape)
+    right_shape = list(first.right_mask.shape)
+    cells: list[list[str]] = [[] for _ in range(sum(left_shape) + sum(right_shape))]
     for index, f in enumerate(f_list):
-        for i, row in enumerate(f.fingering.left_mask):
-            for j, button in enumerate(row):
-                if button:
-                    left[i][j] += chars[f.fingering.direction][index]
-        for i, row in enumerate(f.fingering.right_mask):
-            for j, button in enumerate(row):
-                if button:
-                    right[i][j] += chars[f.fingering.direction][index]
+        fingering = f.fingering
+        if fingering not in coordinates_cache:
+            coordinates_cache[fingering] = _button_coordinates(fingering)
+        char = _CHARS[fingering.direction][index]
+        for coordinate in coordinates_cache[fingering]:
+            cells[coordinate].append(char)
 
+    strings = [''.join(cell) or '.' for cell in cells]
     lines = []
-    for left_row, right_row in zip(left, right):
-        line = []
-        for finger_string in left_row:
-            line.append(finger_string or '.')
-        line.append(' ')
-        for finger_string in right_row:
-            line.append(finger_string or '.')
-        lines.append(' '.join(line))
+    left_start = 0
+    right_start = sum(left_shape)
+    for left_len, right_len in zip(left_shape, right_shape):
+        lines.append(' '.join(
+            strings[left_start:left_start + left_len]
+            + [' ']
+            + strings[right_start:right_start + right_len]))
+        left_start += left_len
+        right_start += right_len
     return '\n'.join(lines)
+
+
+def _chunk_by_measure(
+        fingerings: Iterable[AnnotatedBisonoricFingering],
+        max_length: int) -> Iterator[list[AnnotatedBisonoricFingering]]:
+    '''
+    Groups consecutive whole measures, as long as they fit in `max_length`;
+    A measure which is longer than that on its own is split.
+    '''
+    chunk: list[AnnotatedBisonoricFingering] = []
+    measure: list[AnnotatedBisonoricFingering] = []
+    for f in fingerings:
+        if measure and f.annotation.measure != measure[0].annotation.measure:
+            if len(chunk) + len(measure) > max_length:
+                yield from _flush(chunk, measure, max_length)
+                chunk = []
+            chunk.extend(measure)
+            measure = []
+        measure.append(f)
+    if len(chunk) + len(measure) > max_length:
+        yield from _flush(chunk, measure, max_length)
+        chunk = []
+    chunk.extend(measure)
+    if chunk:
+        yield chunk
+
+
+def _flush(
+        chunk: list[AnnotatedBisonoricFingering],
+        measure: list[AnnotatedBisonoricFingering],
+        max_length: int) -> Iterator[list[AnnotatedBisonoricFingering]]:
+    '''
+    Yields the pending chunk, and then all but the tail of an overlong measure,
+    leaving the tail in `measure` for the next chunk.
+    '''
+    if chunk:
+        yield chunk
+    while len(measure) > max_length:
+        yield measure[:max_length]
+        del measure[:max_length]
+
+
+def _describe_measures(chunk: Sequence[AnnotatedBisonoricFingering]) -> str:
+    first = chunk[0].annotation.measure
+    last = chunk[-1].annotation.measure
+    return f'Measure {first}' if first == last else f'Measures {first}-{last}'
+
+
+def condense_by_measure(
+        fingerings: Iterable[AnnotatedBisonoricFingering],
+        max_length: int = MAX_CONDENSED_LENGTH) -> Iterator[str]:
+    '''
+    Given a sequence of fingerings of any length,
+    lazily yields condensed representations of consecutive measures,
+    with as many whole measures in each as will fit in `max_length` fingerings,
+    each preceded by a line giving the measure numbers.
+    Measures that are too long on their own are split.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.type_defs import Annotation, Pitch
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> notes = [
+    ...     Annotation(pitch=Pitch(name), measure=measure)
+    ...     for measure, name in [(1, 'C4'), (1, 'E4'), (2, 'G4'), (3, 'C5')]
+    ... ]
+    >>> best = NotesOnLayout(notes, layout).get_best_fingerings([], 'minplus')
+    >>> for condensed in condense_by_measure(best, max_length=3):
+    ...     print(condensed)
+    Measures 1-2
+    . . . . .   . . . . .
+    . . ➀ ➁ .   . . . . .
+    . . ➂ . .   . . . . .
+    Measure 3
+    . . . . .   . . . . .
+    . . . . .   ➀ . . . .
+    . . . . .   . . . . .
+    '''
+    if max_length > MAX_CONDENSED_LENGTH:
+        raise ValueError(
+            f'max_length ({max_length}) '
+            f'greater than allowed ({MAX_CONDENSED_LENGTH})')
+    coordinates_cache: dict[BisonoricFingering, tuple[int, ...]] = {}
+    for chunk in _chunk_by_measure(fingerings, max_length):
+        yield f'{_describe_measures(chunk)}\n{_condense(chunk, coordinates_cache)}'
+
+
+@lru_cache(maxsize=4096)
+def _format_fingering(
+        fingering: BisonoricFingering,
+        button_down_f: PitchToStr,
+        button_up_f: PitchToStr,
+        direction_f: Callable[[Direction], str]) -> str:
+    return fingering.format(
+        button_down_f=button_down_f,
+        button_up_f=button_up_f,
+        direction_f=direction_f)
+
+
+def format_annotated(
+        annotated_fingering: AnnotatedBisonoricFingering,
+        button_down_f: PitchToStr,
+        button_up_f: PitchToStr,
+        direction_f: Callable[[Direction], str]) -> str:
+    '''
+    Returns the same as `AnnotatedBisonoricFingering.format`, but a tune only
+    uses a few distinct fingerings, so the grid for each is only built once,
+    for each combination of formatting functions, and then reused.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['C4']), layout)
+    >>> [(_, [f])] = n_l.get_all_fingerings()
+    >>> def down(pitch): return str(pitch).ljust(4)
+    >>> def up(pitch): return '--- '
+    >>> def direction(direction): return direction.name
+    >>> print(format_annotated(f, down, up, direction))
+    Measure 1 - C4
+    PUSH:
+    --- --- --- --- ---    --- --- --- --- ---
+    --- --- C4  --- ---    --- --- --- --- ---
+    --- --- --- --- ---    --- --- --- --- ---
+    >>> format_annotated(f, down, up, direction) == f.format(down, up, direction)
+    True
+    '''
+    a = annotated_fingering.annotation
+    formatted = _format_fingering(
+        annotated_fingering.fingering, button_down_f, button_up_f, direction_f)
+    return f'Measure {a.measure} - {a.pitch}\n{formatted}'
+
+
+def write_blocks(blocks: Iterable[str], chunk_size: int = 256) -> None:
+    '''
+    Writes each block on its own lines, like `print`, to `sys.stdout`,
+    but joins them into chunks, to make fewer calls to `write`.
+    '''
+    write = sys.stdout.write
+    chunk: list[str] = []
+    for block in blocks:
+        chunk.append(block)
+        if len(chunk) >= chunk_size:
+            write('\n'.join(chunk) + '\n')
+            chunk.clear()
+    if chunk:
+        write('\n'.join(chunk) + '\n')
+
+
+class ProgressBar:
+    '''
+    A progress callback for `concertina_helper.solvers.progress`,
+    which redraws a bar on one line of `stream`, usually a terminal,
+    and clears it once every note has been processed.
+
+    >>> from io import StringIO
+    >>> stream = StringIO()
+    >>> bar = ProgressBar(stream, width=10)
+    >>> bar(Progress(positions=5, total_positions=10, nodes_expanded=42, elapsed=1.5))
+    >>> print(stream.getvalue().strip())
+    [#####.....] 5/10 notes, 42 nodes, 1.5s
+    '''
+    def __init__(self, stream: TextIO, width: int = 40):
+        self.stream = stream
+        self.width = width
+        self._length = 0
+
+    def __call__(self, progress: Progress) -> None:
+        if progress.positions >= progress.total_positions:
+            self.stream.write('\r' + ' ' * self._length + '\r')
+        else:
+            filled = int(self.width * progress.fraction)
+            line = (
+                f'[{"#" * filled}{"." * (self.width - filled)}] '
+                f'{progress.positions}/{progress.total_positions} notes, '
+                f'{progress.nodes_expanded} nodes, {progress.elapsed:.1f}s')
+            self.stream.write('\r' + line.ljust(self._length))
+            self._length = len(line)
+        self.stream.flush()
@@ -1,13 +1,69 @@
-from collections.abc import Callable
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import fields, is_dataclass
+from functools import lru_cache, partial
 
 from .type_defs import Direction
 
-from .layouts.bisonoric import (
-    AnnotatedBisonoricFingering, BisonoricFingering)
+from .layouts.base_classes import AnnotatedFingering, F
+from .layouts.bisonoric import AnnotatedBisonoricFingering, BisonoricFingering
+from .layouts.unisonoric import UnisonoricFingering
 
 
-PenaltyFunction = Callable[[
-    AnnotatedBisonoricFingering, AnnotatedBisonoricFingering], float]
+PenaltyFunction = Callable[[AnnotatedFingering[F], AnnotatedFingering[F]], float]
+'''
+Given two consecutive fingerings, returns the cost of moving from the first
+to the second. The factories below return partials of module-level functions,
+rather than closures, so they can be pickled and sent to worker processes,
+and so their names and costs can be read back with `describe_penalty`.
+Penalties about the bellows only apply to bisonoric layouts;
+The others also apply to unisonoric layouts.
+'''
+
+_AnyAnnotatedFingering = AnnotatedFingering[BisonoricFingering | UnisonoricFingering]
+
+PenaltyFactory = Callable[[float], PenaltyFunction]
+'''
+Given a cost, returns a penalty function. The built-in factories are all linear:
+The penalty is the cost times some feature of the transition, which is what
+`concertina_helper.solvers.parametric` relies on.
+'''
+
+FeatureFunction = Callable[[AnnotatedFingering], Hashable]
+'''
+Given a fingering, returns the features of it that a penalty depends on.
+If two fingerings have the same features, the penalty treats them the same,
+whether they are the first or the second of a pair.
+Solvers use this to group candidates: See `declare_penalty_features`.
+'''
+
+_penalty_features: dict[Callable, FeatureFunction] = {}
+
+
+def declare_penalty_features(function: Callable, features: FeatureFunction) -> None:
+    '''
+    Declares that penalties made from `function`, either the function itself,
+    or partials of it, only depend on the `features` of each fingering.
+    When every penalty on a lattice declares its features,
+    `concertina_helper.solvers.min_plus.MinPlusSolver` finds the best predecessor
+    for each group of candidates with the same features, rather than for each
+    candidate, which is much faster when many buttons play the same pitch.
+    A declaration which is wrong will give wrong results.
+    '''
+    _penalty_features[function] = features
+
+
+def get_penalty_features(penalty: Callable) -> FeatureFunction | None:
+    '''
+    Returns the features declared for a penalty, or `None` if there are none.
+
+    >>> get_penalty_features(penalize_bellows_change(1)).__name__
+    '_find_direction'
+    >>> print(get_penalty_features(lambda f1, f2: 0))
+    None
+    '''
+    function = penalty.func if isinstance(penalty, partial) else penalty
+    return _penalty_features.get(function)
+
 
 # TODO: Penalize outer columns?
 # TODO: Penalize top row?
@@ -17,29 +73,35 @@ def penalize_bellows_change(cost: float) -> PenaltyFunction:
     '''
     Penalize fingerings where the bellows changes direction between notes
     '''
-    def calculate(
-            f1: AnnotatedBisonoricFingering,
-            f2: AnnotatedBisonoricFingering) -> float:
-        return cost if f1.fingering.direction != f2.fingering.direction else 0
-    return calculate
+    return partial(_calculate_bellows_change, cost)
+
+
+def _calculate_bellows_change(
+        cost: float,
+        f1: AnnotatedBisonoricFingering,
+        f2: AnnotatedBisonoricFingering) -> float:
+    return cost if f1.fingering.direction != f2.fingering.direction else 0
 
 
 def penalize_finger_in_same_column(cost: float) -> PenaltyFunction:
     '''
     Penalize fingerings where one finger changes rows between notes
     '''
-    def calculate(
-            f1: AnnotatedBisonoricFingering,
-            f2: AnnotatedBisonoricFingering) -> float:
-        '''
-        This assumes fingers should be moving between notes: It will need to change
-        if this is extended to cover sustained bass notes under a melody.
-        '''
-        return (
-            cost if _find_columns_used(f1.fingering) ==
-            _find_columns_used(f2.fingering)
-            else 0)
-    return calculate
+    return partial(_calculate_finger_in_same_column, cost)
+
+
+def _calculate_finger_in_same_column(
+        cost: float,
+        f1: _AnyAnnotatedFingering,
+        f2: _AnyAnnotatedFingering) -> float:
+    '''
+    This assumes fingers should be moving between notes: It will need to change
+    if this is extended to cover sustained bass notes under a melody.
+    '''
+    return (
+        cost if _find_columns_used(f1.fingering) ==
+        _find_columns_used(f2.fingering)
+        else 0)
 
 
 def penalize_outer_fingers(cost: float) -> PenaltyFunction:
@@ -47,25 +109,32 @@ def penalize_outer_fingers(cost: float) -> PenaltyFunction:
     Penalize fingerings that use outer fingers of either hand instead of inner.
     This is useful as a tiebreaker.
     '''
-    def calculate(
-            f1: AnnotatedBisonoricFingering,
-            f2: AnnotatedBisonoricFingering) -> float:
-        return cost * sum(1 / abs(i) for i in _find_columns_used(f2.fingering))
-    return calculate
+    return partial(_calculate_outer_fingers, cost)
+
+
+def _calculate_outer_fingers(
+        cost: float,
+        f1: _AnyAnnotatedFingering,
+        f2: _AnyAnnotatedFingering) -> float:
+    return cost * sum(1 / abs(i) for i in _find_columns_used(f2.fingering))
 
 
 def penalize_pull_at_start_of_measure(cost: float) -> PenaltyFunction:
     '''
     Penalize fingerings where a pull begins a measure;
     Hitting the downbeat with a push can be more musical.'''
-    def calculate(
-            f1: AnnotatedBisonoricFingering,
-            f2: AnnotatedBisonoricFingering) -> float:
-        return cost if f2.fingering.direction == Direction.PULL else 0
-    return calculate
+    return partial(_calculate_pull_at_start_of_measure, cost)
+
 
+def _calculate_pull_at_start_of_measure(
+        cost: float,
+        f1: AnnotatedBisonoricFingering,
+        f2: AnnotatedBisonoricFingering) -> float:
+    return cost if f2.fingering.direction == Direction.PULL else 0
 
-def _find_columns_used(fingering: BisonoricFingering) -> set[int]:
+
+def _find_columns_used(
+        fingering: BisonoricFingering | UnisonoricFingering) -> set[int]:
     '''
     Returns a set of integers representing the buttons used.
     - On the left: 1 2 3 4 5
@@ -86,3 +155,99 @@ def _find_columns_used(fingering: BisonoricFingering) -> set[int]:
             if button:
                 used.add(-(i+1))
     return used
+
+
+def _find_direction(f: _AnyAnnotatedFingering) -> Hashable:
+    # Unisonoric fingerings have no direction.
+    return getattr(f.fingering, 'direction', None)
+
+
+def _find_column_set(f: _AnyAnnotatedFingering) -> Hashable:
+    return _find_frozen_columns(f.fingering)
+
+
+@lru_cache(maxsize=4096)
+def _find_frozen_columns(
+        fingering: BisonoricFingering | UnisonoricFingering) -> frozenset[int]:
+    # The same fingerings come up again and again in a tune.
+    return frozenset(_find_columns_used(fingering))
+
+
+declare_penalty_features(_calculate_bellows_change, _find_direction)
+declare_penalty_features(_calculate_finger_in_same_column, _find_column_set)
+declare_penalty_features(_calculate_outer_fingers, _find_column_set)
+declare_penalty_features(_calculate_pull_at_start_of_measure, _find_direction)
+
+
+def get_penalty_factories() -> dict[str, PenaltyFactory]:
+    '''
+    Returns the built-in penalty factories, keyed by name, without the prefix.
+
+    >>> for name in sorted(get_penalty_factories()):
+    ...     print(name)
+    bellows_change
+    finger_in_same_column
+    outer_fingers
+    pull_at_start_of_measure
+    '''
+    return {
+        name.removeprefix('penalize_'): factory
+        for name, factory in globals().items()
+        if name.startswith('penalize_')
+    }
+
+
+def describe_penalty(penalty: object) -> str | None:
+    '''
+    Returns a canonical description of a penalty, which is the same
+    for equivalent penalties, even in different processes.
+    Only partials and frozen dataclasses of module-level functions
+    and plain values can be described; For anything else, returns `None`.
+
+    >>> describe_penalty(penalize_bellows_change(2))
+    'concertina_helper.penalties._calculate_bellows_change(2.0)'
+    >>> print(describe_penalty(lambda f1, f2: 0))
+    None
+    '''
+    if isinstance(penalty, (int, float)) and not isinstance(penalty, bool):
+        # So that a cost of 1 is described the same as a cost of 1.0.
+        return repr(float(penalty))
+    if isinstance(penalty, (str, bool)) or penalty is None:
+        return repr(penalty)
+    if isinstance(penalty, tuple):
+        parts = _describe_all(penalty)
+        return None if parts is None else f'({", ".join(parts)},)'
+    if isinstance(penalty, partial):
+        keywords = sorted(penalty.keywords.items())
+        parts = _describe_all(
+            [penalty.func, *penalty.args, *(value for _, value in keywords)])
+        if parts is None:
+            return None
+        names = [''] * (len(penalty.args) + 1) + [f'{name}=' for name, _ in keywords]
+        function, *args = [name + part for name, part in zip(names, parts)]
+        return f'{function}({", ".join(args)})'
+    if (
+        is_dataclass(penalty) and not isinstance(penalty, type)
+        and getattr(penalty, '__dataclass_params__').frozen
+    ):
+        # Fields which are not set in the constructor are derived from the others.
+        return describe_penalty(partial(
+            type(penalty),
+            **{
+                field.name: getattr(penalty, field.name)
+                for field in fields(penalty) if field.init
+            }))
+    qualname = getattr(penalty, '__qualname__', '<')
+    if callable(penalty) and '<' not in qualname:
+        return f'{penalty.__module__}.{qualname}'
+    return None
+
+
+def _describe_all(penalties: Iterable[object]) -> list[str] | None:
+    described = []
+    for penalty in penalties:
+        description = describe_penalty(penalty)
+        if description is None:
+            return None
+        described.append(description)
+    return described
@@ -0,0 +1,155 @@
+'''
+Checks whether tunes can be played on a layout, without building any fingerings:
+Each layout has a bitset of playable MIDI numbers, and each tune a bitset
+of the MIDI numbers it needs, so checking a transposition is a shift and a mask.
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> layout = load_bisonoric_layout_by_name('20_cg')
+>>> for note in find_unplayable_notes(notes_from_pitches(['C4', 'C#4', 'D4']), layout):
+...     print(note)
+Annotation(pitch=Pitch(name='C#4'), measure=1)
+'''
+from __future__ import annotations
+import argparse
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from .layouts.base_classes import Layout
+from .layouts.layout_loader import list_layout_names, load_bisonoric_layout_by_name
+from .note_generators import notes_from_path
+from .note_sequence import NoteSequence
+from .type_defs import Annotation, Pitch
+
+
+def transpose_bits(bits: int, semitones: int) -> int:
+    '''
+    Transposes a bitset of MIDI numbers.
+
+    >>> bin(transpose_bits(0b101, 2)), bin(transpose_bits(0b101, -2))
+    ('0b10100', '0b1')
+    '''
+    return bits << semitones if semitones >= 0 else bits >> -semitones
+
+
+def needed_bits(notes: Iterable[Annotation]) -> int:
+    '''
+    Returns a bitset of the MIDI numbers of the notes.
+    '''
+    if isinstance(notes, NoteSequence):
+        bits = 0
+        for midi_number in set(notes.semitones):
+            bits |= 1 << midi_number
+        return bits
+    seen: set[Pitch] = set()
+    bits = 0
+    for note in notes:
+        if note.pitch not in seen:
+            seen.add(note.pitch)
+            bits |= 1 << note.pitch.midi_number
+    return bits
+
+
+def find_unplayable_notes(
+        notes: Iterable[Annotation],
+        layout: Layout,
+        transpose: int = 0) -> list[Annotation]:
+    '''
+    Returns every note which can not be played on the layout,
+    transposed by `transpose` semitones, in order.
+    For a `concertina_helper.note_sequence.NoteSequence`,
+    annotations are only made if some notes can not be played.
+    '''
+    playable = transpose_bits(layout.playable_bits, transpose)
+    if isinstance(notes, NoteSequence) and not needed_bits(notes) & ~playable:
+        return []
+    checked: dict[Pitch, bool] = {}
+    unplayable = []
+    for note in notes:
+        if note.pitch not in checked:
+            checked[note.pitch] = bool(playable >> note.pitch.midi_number & 1)
+        if not checked[note.pitch]:
+            unplayable.append(note)
+    return unplayable
+
+
+@dataclass(frozen=True)
+class PlayableMatch:
+    '''
+    A tune that can be played on a layout, transposed by `transpose` semitones.
+    '''
+    tune_name: str
+    layout_name: str
+    transpose: int
+
+
+def filter_playable(
+        tunes: Iterable[tuple[str, Iterable[Annotation]]],
+        layouts: Mapping[str, Layout],
+        transpositions: Iterable[int] = (0,)) -> Iterator[PlayableMatch]:
+    '''
+    Given named tunes, yields every combination of tune, layout,
+    and layout transposition on which the whole tune can be played.
+    Each tune is read once, and reduced to a bitset.
+
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> layout = load_bisonoric_layout_by_name('20_cg')
+    >>> tunes = [
+    ...     ('c', notes_from_pitches(['C4', 'E4', 'G4'])),
+    ...     ('c#', notes_from_pitches(['C#4', 'F4', 'G#4']))]
+    >>> for match in filter_playable(tunes, {'20_cg': layout}, [0, 1]):
+    ...     print(match)
+    PlayableMatch(tune_name='c', layout_name='20_cg', transpose=0)
+    PlayableMatch(tune_name='c#', layout_name='20_cg', transpose=1)
+    '''
+    transpositions = list(transpositions)
+    shifted = [
+        (layout_name, transpose, transpose_bits(layout.playable_bits, transpose))
+        for layout_name, layout in layouts.items()
+        for transpose in transpositions
+    ]
+    for tune_name, notes in tunes:
+        needed = needed_bits(notes)
+        for layout_name, transpose, playable in shifted:
+            if not needed & ~playable:
+                yield PlayableMatch(tune_name, layout_name, transpose)
+
+
+def _parse_and_filter() -> None:
+    '''
+    Parses command line arguments, and prints the playable combinations.
+    '''
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='''
+Given many tunes, lists the layouts and transpositions
+on which every note of each tune can be played.
+''')
+    parser.add_argument(
+        'inputs', type=Path, nargs='+',
+        help='Input files, in any format accepted by concertina-helper')
+    parser.add_argument(
+        '--layout_names', choices=list_layout_names(), nargs='+', metavar='NAME',
+        default=list_layout_names(),
+        help='Names of concertina layouts to check')
+    parser.add_argument(
+        '--layout_transpose', type=int, nargs='+', metavar='SEMITONES', default=[0],
+        help='Semitones to transpose the layouts; Negative transposes down')
+    parser.add_argument(
+        '--unplayable', action='store_true',
+        help='Instead, for each tune and layout, list the notes which can not be '
+        'played, without transposition')
+    args = parser.parse_args()
+
+    layouts = {name: load_bisonoric_layout_by_name(name) for name in args.layout_names}
+    if args.unplayable:
+        for path in args.inputs:
+            notes = list(notes_from_path(path))
+            for name, layout in layouts.items():
+                for note in find_unplayable_notes(notes, layout):
+                    print(f'{path}\t{name}\t{note.pitch} in measure {note.measure}')
+        return
+    tunes = ((str(path), notes_from_path(path)) for path in args.inputs)
+    for match in filter_playable(tunes, layouts, args.layout_transpose):
+        print(f'{match.tune_name}\t{match.layout_name}\t{match.transpose}')
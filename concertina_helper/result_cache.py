@@ -0,0 +1,248 @@
+'''
+Caches the best fingerings for a tune, so the same tune with the same settings
+is only solved once. The key is a digest of the layout fingerprint,
+the notes, a canonical description of the penalties, the solver name,
+and any constraints. Notes are compared by MIDI number, so tunes which only
+differ in spelling share a result: Only the fingerings are stored,
+and the notes of the tune asking are attached when it is read back.
+Results which are not proven optimal are not stored.
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> cache = FingeringCache()
+>>> for _ in range(3):
+...     n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'B4']), layout)
+...     best = n_l.get_best_fingerings([penalize_bellows_change(1)], cache=cache)
+>>> cache.stats
+CacheStats(hits=2, misses=1, uncacheable=0)
+
+Penalties which can not be described, like lambdas, bypass the cache:
+See `concertina_helper.penalties.describe_penalty`.
+'''
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from concurrent.futures import Executor
+from typing import cast
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+import os
+import pickle
+import tempfile
+import threading
+
+from .constraints import Constraint
+from .finger_finder import BestFingerings
+from .layouts.base_classes import AnnotatedFingering, F, Fingering, Layout
+from .note_sequence import NoteSequence
+from .notes_on_layout import NotesOnLayout
+from .penalties import PenaltyFunction, describe_penalty
+from .solvers.progress import CancellationToken, ProgressCallback
+from .solvers.registry import DEFAULT_SOLVER_NAME
+from .stateful_penalties import StatefulPenalty
+from .type_defs import Annotation
+
+
+Fingerings = list[Fingering]
+
+
+def annotate_fingerings(
+        notes: Iterable[Annotation],
+        fingerings: Iterable[F]) -> list[AnnotatedFingering[F]]:
+    '''
+    Pairs a stored result with the notes of the tune asking for it.
+    '''
+    return [
+        AnnotatedFingering(fingering=fingering, annotation=annotation)
+        for annotation, fingering in zip(notes, fingerings)
+    ]
+
+
+def make_cache_key(
+        layout: Layout,
+        notes: Iterable[Annotation],
+        penalty_functions: Iterable[PenaltyFunction | StatefulPenalty],
+        solver_name: str = DEFAULT_SOLVER_NAME,
+        constraints: Iterable[Constraint] = ()) -> str | None:
+    '''
+    Returns a key which is stable between runs, or `None` if any penalty
+    can not be described. The order of the penalties does not matter,
+    but the solver does, because solvers may break ties differently.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import (
+    ...     penalize_bellows_change, penalize_outer_fingers)
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> notes = list(notes_from_pitches(['G4', 'A4']))
+    >>> key = make_cache_key(
+    ...     layout, notes, [penalize_bellows_change(1), penalize_outer_fingers(2)])
+    >>> key == make_cache_key(
+    ...     layout, notes, [penalize_outer_fingers(2.0), penalize_bellows_change(1)])
+    True
+    >>> key == make_cache_key(
+    ...     layout.transpose(1), notes,
+    ...     [penalize_bellows_change(1), penalize_outer_fingers(2)])
+    False
+    '''
+    descriptions = []
+    for penalty in penalty_functions:
+        description = describe_penalty(penalty)
+        if description is None:
+            return None
+        descriptions.append(description)
+    digest = blake2b(digest_size=16)
+    digest.update(f'{layout.fingerprint}\n{solver_name}\n'.encode())
+    for description in sorted(descriptions):
+        digest.update(f'{description}\n'.encode())
+    digest.update(b'\n')
+    sequence = NoteSequence.from_annotations(notes)
+    # Durations and beats do not affect the fingerings.
+    digest.update(NoteSequence(sequence.semitones, sequence.measures).to_bytes())
+    # Without constraints, keys are the same as before constraints were added.
+    for constraint in sorted(map(repr, constraints)):
+        digest.update(f'\n{constraint}'.encode())
+    return digest.hexdigest()
+
+
+class CacheBackend(ABC):
+    '''
+    Stores results by key. Backends should tolerate concurrent use,
+    but may drop results at any time.
+    '''
+    @abstractmethod
+    def get(self, key: str) -> Fingerings | None:
+        '''
+        Returns the stored result, or `None`.
+        '''
+
+    @abstractmethod
+    def put(self, key: str, fingerings: Fingerings) -> None:
+        '''
+        Stores a result.
+        '''
+
+
+class MemoryCache(CacheBackend):
+    '''
+    Keeps the `max_size` most recently used results in memory.
+    '''
+    def __init__(self, max_size: int = 128):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.max_size = max_size
+        self._results: OrderedDict[str, Fingerings] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Fingerings | None:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key: str, fingerings: Fingerings) -> None:
+        with self._lock:
+            self._results[key] = fingerings
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+
+class DiskCache(CacheBackend):
+    '''
+    Pickles each result to its own file in `directory`,
+    so it can be shared between processes, and survives restarts.
+    Files are written to a temporary name and then renamed,
+    so readers never see a partial file.
+    '''
+    def __init__(self, directory: Path):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.pickle'
+
+    def get(self, key: str) -> Fingerings | None:
+        try:
+            return pickle.loads(self._path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, fingerings: Fingerings) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(fingerings, f)
+        os.replace(temp_path, self._path(key))
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    '''
+    `uncacheable` counts requests with penalties that could not be described.
+    '''
+    hits: int
+    misses: int
+    uncacheable: int
+
+
+class FingeringCache:
+    '''
+    Wraps `concertina_helper.notes_on_layout.NotesOnLayout.get_best_fingerings`
+    with a backend, by default a `MemoryCache`, and counts hits and misses.
+    '''
+    def __init__(self, backend: CacheBackend | None = None):
+        self.backend = MemoryCache() if backend is None else backend
+        self._hits = 0
+        self._misses = 0
+        self._uncacheable = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self._hits, self._misses, self._uncacheable)
+
+    def get_best_fingerings(
+            self,
+            notes_on_layout: NotesOnLayout[F],
+            penalty_functions: Sequence[PenaltyFunction[F] | StatefulPenalty],
+            solver_name: str = DEFAULT_SOLVER_NAME,
+            executor: Executor | None = None,
+            progress: ProgressCallback | None = None,
+            cancel: CancellationToken | None = None) -> BestFingerings[F]:
+        '''
+        Returns the cached result if there is one; Otherwise, solves and stores it,
+        passing `executor`, `progress`, and `cancel` to the solve.
+        '''
+        # The key is made from MIDI numbers, but the solve keeps the notes as spelled;
+        # A NoteSequence is used as it is, and only annotated for the result.
+        notes = notes_on_layout.notes
+        if not isinstance(notes, NoteSequence):
+            notes = list(notes)
+        layout = notes_on_layout.layout
+        constraints = notes_on_layout.constraints
+        key = make_cache_key(
+            layout, notes, penalty_functions, solver_name, constraints)
+        if key is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                with self._lock:
+                    self._hits += 1
+                return BestFingerings(annotate_fingerings(notes, cast(list[F], cached)))
+        result = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+            penalty_functions, solver_name, executor=executor,
+            progress=progress, cancel=cancel)
+        with self._lock:
+            if key is None:
+                self._uncacheable += 1
+            else:
+                self._misses += 1
+        if key is not None and result.proven_optimal:
+            self.backend.put(key, [f.fingering for f in result])
+        return result
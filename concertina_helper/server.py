@@ -0,0 +1,365 @@
+'''
+A long-running mode for editor integrations: `concertina-helper --serve_stdio`
+reads [JSON-RPC 2.0](https://www.jsonrpc.org/specification) requests from stdin,
+one per line, and writes one response per line to stdout.
+Layouts, compiled penalty tables, and results are kept between requests,
+so only the first request for a layout and set of costs pays to load them.
+
+Methods:
+- `fingerings`: Takes either `abc`, the text of a tune, or `pitches`,
+  a list of pitch names; either `layout_name` or `layout_path`;
+  and optionally `layout_transpose`, `costs`, a weight for each penalty,
+  keyed by the names from `concertina_helper.penalties.get_penalty_factories`,
+  by default 1, as on the command line, `solver`, and `constraints`,
+  a list of lines in the format of `concertina_helper.constraints`.
+  Returns `fingerings`, with the measure, pitch, direction,
+  and buttons, as `L` or `R`, row and column, for each note;
+  and `proven_optimal` and `gap`, which only matter for the `anytime` solver:
+  See `concertina_helper.finger_finder.BestFingerings`.
+  Only results which are proven optimal are kept for later requests.
+- `cancel`: Takes the `id` of an earlier request. If it has not finished,
+  its solve is stopped, and it is answered with a "Request cancelled" error,
+  code -32800. Returns whether it was cancelled.
+- `layouts`: Returns the names of the built-in layouts.
+- `shutdown`: Finishes the requests already received, and stops.
+
+Requests are solved in the background, so `cancel` can be read while they run,
+and responses may come back in a different order than the requests.
+
+>>> from io import StringIO
+>>> requests = StringIO(
+...     '{"jsonrpc": "2.0", "id": 1, "method": "fingerings", "params": '
+...     '{"pitches": ["G4"], "layout_name": "30_wheatstone_cg"}}\\n')
+>>> responses = StringIO()
+>>> FingeringServer().serve(requests, responses)
+>>> print(responses.getvalue().strip())
+{"jsonrpc": "2.0", "id": 1, "result": {"proven_optimal": true, \
+"gap": 0.0, "fingerings": \
+[{"measure": 1, "pitch": "G4", "direction": "PUSH", "buttons": ["L3.3"]}]}}
+'''
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TextIO, TypeVar, cast
+import json
+import threading
+
+from pyabc2 import Tune
+
+from .constraints import parse_constraints
+from .finger_finder import BestFingerings
+from .layout_tables import LayoutTables, compile_layout_tables
+from .layouts.bisonoric import (
+    AnnotatedBisonoricFingering, BisonoricFingering, BisonoricLayout)
+from .layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_name, load_bisonoric_layout_by_path)
+from .notes_on_layout import NotesOnLayout
+from .note_generators import notes_from_pitches, notes_from_tune
+from .penalties import PenaltyFunction, describe_penalty, get_penalty_factories
+from .result_cache import MemoryCache, annotate_fingerings, make_cache_key
+from .solvers.progress import CancellationToken, make_monitor
+from .solvers.registry import DEFAULT_SOLVER_NAME, get_solver_by_name
+from .type_defs import Annotation
+
+
+T = TypeVar('T')
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+'''
+The standard JSON-RPC error codes, and the code used by the
+Language Server Protocol for cancelled requests.
+'''
+
+
+class RequestError(Exception):
+    '''
+    Raised while handling a request, to answer it with an error.
+    '''
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _button_names(f: AnnotatedBisonoricFingering) -> list[str]:
+    return [
+        f'{side}{row + 1}.{column + 1}'
+        for side, mask in [('L', f.fingering.left_mask), ('R', f.fingering.right_mask)]
+        for row, mask_row in enumerate(mask)
+        for column, button in enumerate(mask_row)
+        if button
+    ]
+
+
+def _is_valid_id(request_id: Any) -> bool:
+    # Ids are used as dictionary keys, so anything else is refused.
+    return request_id is None or isinstance(request_id, (str, int))
+
+
+class FingeringServer:
+    '''
+    Answers requests as described above. Requests are solved
+    in a pool of `max_workers` threads. Up to `cache_size` layouts,
+    compiled tables, and results are kept, and the least recently used
+    are dropped first.
+    '''
+    def __init__(self, max_workers: int = 1, cache_size: int = 16):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._layouts: OrderedDict[Hashable, BisonoricLayout] = OrderedDict()
+        self._tables: OrderedDict[Hashable, LayoutTables] = OrderedDict()
+        self._results = MemoryCache(max_size=cache_size)
+        self._pending: dict[Hashable, Future] = {}
+        self._tokens: dict[Hashable, CancellationToken] = {}
+        self._cancelled: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._output_lock = threading.Lock()
+
+    def _remember(
+            self, cache: OrderedDict[Hashable, T],
+            key: Hashable, make: Callable[[], T]) -> T:
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = make()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return value
+
+    def _get_layout(self, params: dict) -> BisonoricLayout:
+        transpose = params.get('layout_transpose', 0)
+        if not isinstance(transpose, int):
+            raise RequestError(INVALID_PARAMS, 'layout_transpose must be an integer')
+        if 'layout_name' in params:
+            name = params['layout_name']
+            if name not in list_layout_names():
+                raise RequestError(INVALID_PARAMS, f'Unknown layout: {name}')
+            return self._remember(
+                self._layouts, ('name', name, transpose),
+                lambda: load_bisonoric_layout_by_name(name).transpose(transpose))
+        if 'layout_path' in params:
+            path = Path(params['layout_path'])
+            try:
+                # If the file changes, it is loaded again.
+                mtime = path.stat().st_mtime_ns
+            except OSError as e:
+                raise RequestError(INVALID_PARAMS, str(e))
+            return self._remember(
+                self._layouts, ('path', str(path.resolve()), mtime, transpose),
+                lambda: load_bisonoric_layout_by_path(path).transpose(transpose))
+        raise RequestError(
+            INVALID_PARAMS, 'Either layout_name or layout_path is required')
+
+    @staticmethod
+    def _get_notes(params: dict) -> list[Annotation]:
+        if 'abc' in params:
+            return list(notes_from_tune(Tune(params['abc'])))
+        if 'pitches' in params:
+            return list(notes_from_pitches(params['pitches']))
+        raise RequestError(INVALID_PARAMS, 'Either abc or pitches is required')
+
+    @staticmethod
+    def _get_penalties(params: dict) -> list[PenaltyFunction]:
+        costs = params.get('costs', {})
+        factories = get_penalty_factories()
+        unknown = sorted(set(costs) - set(factories))
+        if unknown:
+            raise RequestError(
+                INVALID_PARAMS, 'Unknown penalties: ' + ', '.join(unknown))
+        return [
+            factory(costs.get(name, 1))
+            for name, factory in sorted(factories.items())
+        ]
+
+    def _get_tables(
+            self, layout: BisonoricLayout,
+            penalties: list[PenaltyFunction]) -> LayoutTables:
+        key = (layout.fingerprint, tuple(describe_penalty(p) for p in penalties))
+        return self._remember(
+            self._tables, key, lambda: compile_layout_tables(layout, penalties))
+
+    def find_fingerings(
+            self, params: dict, cancel: CancellationToken | None = None) -> dict:
+        '''
+        Handles a `fingerings` request. If `cancel` is given,
+        the solve raises `concertina_helper.solvers.progress.SolveCancelled`
+        once it is cancelled.
+        '''
+        notes = self._get_notes(params)
+        layout = self._get_layout(params)
+        penalties = self._get_penalties(params)
+        solver_name = params.get('solver', DEFAULT_SOLVER_NAME)
+        constraints = parse_constraints(params.get('constraints', []), notes)
+        key = make_cache_key(layout, notes, penalties, solver_name, constraints)
+        assert key is not None, 'Built-in penalties can always be described'
+        # Results are stored without their notes, so the same tune
+        # spelled differently is answered with its own spelling.
+        stored = self._results.get(key)
+        best: BestFingerings[BisonoricFingering]
+        if stored is not None:
+            best = BestFingerings(
+                annotate_fingerings(notes, cast(list[BisonoricFingering], stored)))
+        else:
+            if constraints:
+                best = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+                    penalties, solver_name, cancel=cancel)
+            else:
+                lattice = self._get_tables(layout, penalties).lattice(notes)
+                solution = get_solver_by_name(solver_name).solve(
+                    lattice, make_monitor(len(lattice.layers), cancel=cancel))
+                best = BestFingerings(
+                    lattice.fingerings(solution.indexes),
+                    solution.proven_optimal, solution.gap)
+            # Results which may not be the best are not kept,
+            # so a later request can find a better one.
+            if best.proven_optimal:
+                self._results.put(key, [f.fingering for f in best])
+        return {'proven_optimal': best.proven_optimal, 'gap': best.gap, 'fingerings': [
+            {
+                'measure': f.annotation.measure,
+                'pitch': f.annotation.pitch.name,
+                'direction': f.fingering.direction.name,
+                'buttons': _button_names(f),
+            }
+            for f in best
+        ]}
+
+    def _write(self, output: TextIO, response: dict) -> None:
+        with self._output_lock:
+            output.write(json.dumps(response) + '\n')
+            output.flush()
+
+    def _respond(
+            self, output: TextIO, request_id: Any,
+            result: Any = None, error: RequestError | None = None) -> None:
+        response: dict[str, Any] = {'jsonrpc': '2.0', 'id': request_id}
+        if error is None:
+            response['result'] = result
+        else:
+            response['error'] = {'code': error.code, 'message': error.message}
+        self._write(output, response)
+
+    def _finish(self, output: TextIO, request_id: Any, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(request_id, None)
+            self._tokens.pop(request_id, None)
+            cancelled = request_id in self._cancelled
+            self._cancelled.discard(request_id)
+        if cancelled or future.cancelled():
+            self._respond(
+                output, request_id,
+                error=RequestError(REQUEST_CANCELLED, 'Request cancelled'))
+            return
+        try:
+            result = future.result()
+        except RequestError as e:
+            self._respond(output, request_id, error=e)
+        except ValueError as e:
+            self._respond(
+                output, request_id, error=RequestError(INVALID_PARAMS, str(e)))
+        except Exception as e:
+            self._respond(
+                output, request_id, error=RequestError(INTERNAL_ERROR, repr(e)))
+        else:
+            self._respond(output, request_id, result)
+
+    def _cancel(self, params: dict) -> bool:
+        request_id = params.get('id')
+        if not _is_valid_id(request_id):
+            raise RequestError(INVALID_PARAMS, 'id must be a string or an integer')
+        with self._lock:
+            future = self._pending.get(request_id)
+            if future is None or future.done():
+                return False
+            # A request which has started stops at the next check in the solver,
+            # and if it finishes first, its result is replaced anyway.
+            self._cancelled.add(request_id)
+            token = self._tokens[request_id]
+        token.cancel()
+        future.cancel()
+        return True
+
+    def _handle(self, line: str, output: TextIO, executor: Executor) -> bool:
+        '''
+        Handles one line of input, and returns `False` if the server should stop.
+        Any unexpected error is answered, so one bad line can not stop the server.
+        '''
+        try:
+            return self._handle_request(line, output, executor)
+        except Exception as e:
+            self._respond(output, None, error=RequestError(INTERNAL_ERROR, repr(e)))
+            return True
+
+    def _handle_request(self, line: str, output: TextIO, executor: Executor) -> bool:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._respond(output, None, error=RequestError(PARSE_ERROR, str(e)))
+            return True
+        if (
+            not isinstance(request, dict)
+            or not isinstance(request.get('method'), str)
+            or not isinstance(request.get('params', {}), dict)
+            or not _is_valid_id(request.get('id'))
+        ):
+            request_id = request.get('id') if isinstance(request, dict) else None
+            if not _is_valid_id(request_id):
+                request_id = None
+            self._respond(
+                output, request_id,
+                error=RequestError(INVALID_REQUEST, 'Invalid request'))
+            return True
+        method = request['method']
+        params = request.get('params', {})
+        # Requests without an id are notifications, and are not answered.
+        has_id = 'id' in request
+        request_id = request.get('id')
+        if method == 'fingerings':
+            token = CancellationToken()
+            future = executor.submit(self.find_fingerings, params, token)
+            if has_id:
+                with self._lock:
+                    self._pending[request_id] = future
+                    self._tokens[request_id] = token
+                future.add_done_callback(
+                    lambda future: self._finish(output, request_id, future))
+            return True
+        result: Any = None
+        if method == 'cancel':
+            try:
+                result = self._cancel(params)
+            except RequestError as e:
+                if has_id:
+                    self._respond(output, request_id, error=e)
+                return True
+        elif method == 'layouts':
+            result = list(list_layout_names())
+        elif method != 'shutdown':
+            if has_id:
+                self._respond(output, request_id, error=RequestError(
+                    METHOD_NOT_FOUND, f'Unknown method: {method}'))
+            return True
+        if has_id:
+            self._respond(output, request_id, result)
+        return method != 'shutdown'
+
+    def serve(self, input: TextIO, output: TextIO) -> None:
+        '''
+        Reads requests from `input` until it ends, or until `shutdown`,
+        and writes responses to `output`.
+        Returns when every request has been answered.
+        '''
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for line in input:
+                if line.strip() and not self._handle(line, output, executor):
+                    break
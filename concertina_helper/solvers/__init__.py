@@ -0,0 +1,24 @@
+'''
+Interchangeable backends that find the cheapest path through a tune,
+represented as a `concertina_helper.solvers.lattice.Lattice`.
+
+Backends are selected by name with
+`concertina_helper.solvers.registry.get_solver_by_name`:
+- `astar`: The original A* search, wrapping
+  [python-astar](https://github.com/jrialland/python-astar/).
+- `dp`: A layer-by-layer dynamic program which evaluates each edge as needed.
+- `minplus`: The same dynamic program, but over flat `array` cost tables.
+- `lowmem`: The same dynamic program, keeping only compact checkpoints,
+  for very long tunes.
+- `anytime`: Returns the best path found within a time or node budget,
+  saying whether it is proven optimal.
+- `segmented`: Splits long tunes into segments, solved in parallel processes.
+- `numpy`: The min-plus kernel vectorized with numpy;
+  Only available if numpy is installed.
+
+`concertina_helper.solvers.stateful.StatefulSolver` is not selected by name:
+It is used when there are penalties over more than two notes.
+
+Every backend except `anytime` returns a path with the same minimum cost,
+but if several paths tie, different backends may choose differently.
+'''
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from astar import AStar  # type: ignore
+
+from .base_classes import Solver, Solution
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+
+
+@dataclass(frozen=True)
+class _Node:
+    position: int
+    index: int
+
+
+class _FingerFinder(AStar):
+    def __init__(
+            self, lattice: Lattice, informed: bool = True,
+            monitor: SolveMonitor | None = None):
+        self.lattice = lattice
+        self.monitor = monitor
+        # On long tunes, the bounds take as long as the search, so are monitored too.
+        self.bounds = lattice.remaining_cost_bounds(monitor) if informed else None
+        self.expansions = 0
+        self.index: dict[int, list[_Node]] = {
+            i: [_Node(i, j) for j in range(len(layer))]
+            for i, layer in enumerate(lattice.layers)
+        }
+
+    def find(self) -> list[int]:
+        start = _Node(-1, 0)
+        max_index = max(self.index.keys())
+        goal = self.index[max_index][0]
+        # is_goal_reached() only checks position,
+        # so I think we can use any final node.
+        # ... but then why is the goal parameter needed on astar(start, goal)?
+
+        return [
+            node.index for node in self.astar(start, goal)
+            if node.position >= 0
+        ]
+
+    def heuristic_cost_estimate(self, current: _Node, goal: _Node) -> float:
+        if self.bounds is None:
+            # Every step costs at least STEP_COST, so this is admissible,
+            # but it ignores penalties, so the search is close to exhaustive.
+            return (goal.position - current.position) * STEP_COST
+        if current.position < 0:
+            return STEP_COST + self.bounds[0]
+        return self.bounds[current.position]
+
+    def distance_between(self, n1: _Node, n2: _Node) -> float:
+        # Should only be used with immediate neighbors
+        assert n2.position - n1.position == 1
+        if n1.position < 0:
+            # From the start node, there is no additional transition cost.
+            return STEP_COST
+        return self.lattice.edge_cost(n2.position, n1.index, n2.index)
+
+    def neighbors(self, node: _Node) -> Iterable[_Node]:
+        self.expansions += 1
+        if self.monitor is not None:
+            # Nodes are not expanded in order, so count the furthest reached.
+            self.monitor.reach(node.position + 2, 1)
+        return self.index[node.position + 1]
+
+    def is_goal_reached(self, current: _Node, goal: _Node) -> bool:
+        return current.position == goal.position
+
+
+class AStarSolver(Solver):
+    '''
+    Uses A* search. If `informed`, the heuristic is
+    `concertina_helper.solvers.lattice.Lattice.remaining_cost_bounds`,
+    which counts the cheapest possible penalties for the rest of the tune;
+    Otherwise, it only counts the remaining notes.
+    '''
+    def __init__(self, informed: bool = True):
+        self.informed = informed
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        finder = _FingerFinder(lattice, self.informed, monitor)
+        indexes = finder.find()
+        return Solution(
+            tuple(indexes), lattice.path_cost(indexes),
+            nodes_expanded=finder.expansions)
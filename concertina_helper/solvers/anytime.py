@@ -0,0 +1,182 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Callable
+import time
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _argmin
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+class _Budget:
+    def __init__(
+            self, time_budget: float | None, node_budget: int | None,
+            clock: Callable[[], float]):
+        self.deadline = None if time_budget is None else clock() + time_budget
+        self.node_budget = node_budget
+        self.clock = clock
+        self.expansions = 0
+
+    def spend(self, nodes: int) -> None:
+        '''
+        Counts `nodes` more expansions, and raises `_BudgetExhausted`
+        if either the time or the node budget has run out.
+        '''
+        self.expansions += nodes
+        if self.node_budget is not None and self.expansions > self.node_budget:
+            raise _BudgetExhausted()
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise _BudgetExhausted()
+
+
+def _greedy_search(
+        lattice: Lattice, monitor: SolveMonitor | None) -> tuple[list[int], float]:
+    '''
+    Starts from the first candidate, and always takes the cheapest edge.
+    '''
+    indexes = [0]
+    cost = STEP_COST
+    for position in range(1, len(lattice.layers)):
+        if monitor is not None:
+            monitor.advance(1, 1)
+        a = indexes[-1]
+        edge_costs = [
+            lattice.edge_cost(position, a, b)
+            for b in range(len(lattice.layers[position]))
+        ]
+        b = _argmin(edge_costs)
+        indexes.append(b)
+        cost += edge_costs[b]
+    return indexes, cost
+
+
+def _costs_to_go(
+        lattice: Lattice, budget: _Budget, monitor: SolveMonitor | None,
+        costs_to_go: list[array], successors: list[array]) -> None:
+    '''
+    The dynamic program run backward: Appends to `costs_to_go`
+    the exact cost from each candidate of each layer to the end of the lattice,
+    and to `successors`, the next candidate on the cheapest way there,
+    from the last layer back, and checking the budget before each layer,
+    so if it runs out, the lists cover the layers from some position on.
+    Ties go to the lowest candidate.
+    '''
+    costs_to_go.append(array('d', [0.0]) * len(lattice.layers[-1]))
+    for position in range(len(lattice.layers) - 1, 0, -1):
+        budget.spend(len(lattice.layers[position - 1]))
+        costs = lattice.transition_costs(position)
+        next_costs = costs_to_go[-1]
+        width = len(next_costs)
+        layer_costs = array('d')
+        layer_successors = array('I')
+        for offset in range(0, len(costs), width):
+            best_b = 0
+            best = costs[offset] + next_costs[0]
+            for b in range(1, width):
+                total = costs[offset + b] + next_costs[b]
+                if total < best:
+                    best_b, best = b, total
+            layer_costs.append(best)
+            layer_successors.append(best_b)
+        costs_to_go.append(layer_costs)
+        successors.append(layer_successors)
+        if monitor is not None:
+            monitor.advance(nodes=len(lattice.layers[position - 1]))
+
+
+class AnytimeSolver(Solver):
+    '''
+    Returns the best path it can find within a budget of time, in seconds,
+    or of nodes expanded, or both: A budget of `None` is unlimited.
+    Budgets are checked before each layer, so they may be slightly exceeded.
+
+    A greedy pass, which always runs to completion, gives a first answer.
+    Then, while the budget allows, the dynamic program runs backward
+    from the end of the tune, finding the exact cost to the end
+    from each candidate. If it gets to the start, its path is optimal.
+    Otherwise, the greedy path is kept up to the earliest layer it reached,
+    and continued by the cheapest way from there, if that is better,
+    and the costs to the end give a lower bound:
+    The `Solution` says whether the path is proven optimal,
+    and if it is not, the gap between its cost and the lower bound.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import (
+    ...     penalize_bellows_change, penalize_finger_in_same_column)
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['A4', 'B4', 'C5']), layout)
+    >>> lattice = Lattice.from_fingerings(
+    ...     [f_set for _, f_set in n_l.get_all_fingerings()],
+    ...     [penalize_bellows_change(10), penalize_finger_in_same_column(3)])
+
+    With no budget to spare, the greedy pass is all there is:
+
+    >>> solution = AnytimeSolver(node_budget=0).solve(lattice)
+    >>> solution.cost, solution.proven_optimal, solution.gap
+    (6.0, False, 3.0)
+
+    Given time, it finds the optimum, and knows it:
+
+    >>> solution = AnytimeSolver().solve(lattice)
+    >>> solution.cost, solution.proven_optimal, solution.gap
+    (3.0, True, 0.0)
+    '''
+    def __init__(
+            self,
+            time_budget: float | None = 1.0,
+            node_budget: int | None = None,
+            clock: Callable[[], float] = time.monotonic):
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.clock = clock
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        budget = _Budget(self.time_budget, self.node_budget, self.clock)
+        indexes, cost = _greedy_search(lattice, monitor)
+        budget.expansions += len(lattice.layers) - 1
+        if max(len(layer) for layer in lattice.layers) == 1:
+            return Solution(tuple(indexes), cost, nodes_expanded=budget.expansions)
+        costs_to_go: list[array] = []
+        successors: list[array] = []
+        try:
+            _costs_to_go(lattice, budget, monitor, costs_to_go, successors)
+        except _BudgetExhausted:
+            pass
+        costs_to_go.reverse()
+        successors.reverse()
+        # Costs to the end are known from this layer on.
+        position = len(lattice.layers) - len(costs_to_go)
+        if position == 0:
+            prefix: list[int] = []
+            prefix_cost = STEP_COST
+            steps = list(costs_to_go[0])
+        else:
+            prefix = indexes[:position]
+            prefix_cost = lattice.path_cost(prefix)
+            steps = [
+                lattice.edge_cost(position, prefix[-1], b) + to_go
+                for b, to_go in enumerate(costs_to_go[0])
+            ]
+        b = _argmin(steps)
+        if prefix_cost + steps[b] < cost:
+            indexes = prefix + [b]
+            for layer_successors in successors:
+                indexes.append(layer_successors[indexes[-1]])
+            cost = prefix_cost + steps[b]
+        # Every edge before that costs at least STEP_COST.
+        lower_bound = STEP_COST * (position + 1) + min(costs_to_go[0])
+        proven_optimal = cost <= lower_bound
+        return Solution(
+            tuple(indexes), cost, nodes_expanded=budget.expansions,
+            proven_optimal=proven_optimal,
+            gap=0.0 if proven_optimal else cost - lower_bound)
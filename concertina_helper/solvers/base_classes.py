@@ -0,0 +1,33 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from .lattice import Lattice
+from .progress import SolveMonitor
+
+
+@dataclass(frozen=True)
+class Solution:
+    '''
+    A path through a lattice: one candidate index per layer, and the total cost.
+    `nodes_expanded` counts the nodes whose outgoing edges were examined,
+    which is every node for the dynamic programming backends.
+    Backends that may stop early set `proven_optimal` to `False`
+    when they can not show that no cheaper path exists,
+    and `gap` to the most by which `cost` could exceed the optimum.
+    '''
+    indexes: tuple[int, ...]
+    cost: float
+    nodes_expanded: int = 0
+    proven_optimal: bool = True
+    gap: float = 0.0
+
+
+class Solver(ABC):
+    @abstractmethod
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        '''
+        Returns a minimum-cost path through the lattice.
+        If a `monitor` is given, it is advanced from the main loop:
+        See `concertina_helper.solvers.progress`.
+        '''
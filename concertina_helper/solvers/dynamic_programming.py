@@ -0,0 +1,66 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+
+from .base_classes import Solver, Solution
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+
+
+def _trace_back(backpointers: Sequence[Sequence[int]], last_index: int) -> list[int]:
+    '''
+    Given, for each layer after the first, the index of the best predecessor
+    of each candidate, returns the path that ends at `last_index`.
+    '''
+    indexes = [last_index]
+    for layer_backpointers in reversed(backpointers):
+        indexes.append(layer_backpointers[indexes[-1]])
+    indexes.reverse()
+    return indexes
+
+
+def _count_expanded(lattice: Lattice) -> int:
+    '''
+    Dynamic programming examines the outgoing edges of every node,
+    counting the start, except those in the last layer.
+    '''
+    return 1 + sum(len(layer) for layer in lattice.layers[:-1])
+
+
+def _argmin(scores: Sequence[float]) -> int:
+    '''
+    Returns the index of the smallest score; Ties go to the lowest index.
+    '''
+    return min(range(len(scores)), key=scores.__getitem__)
+
+
+class DynamicProgrammingSolver(Solver):
+    '''
+    Computes the cheapest path to every candidate, one layer at a time,
+    and evaluates each edge only when it is needed.
+    '''
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        scores: list[float] = [STEP_COST] * len(lattice.layers[0])
+        backpointers = []
+        for position in range(1, len(lattice.layers)):
+            if monitor is not None:
+                monitor.advance(1, len(lattice.layers[position - 1]))
+            new_scores = []
+            layer_backpointers = array('I')
+            for b in range(len(lattice.layers[position])):
+                best_a = 0
+                best_score = scores[0] + lattice.edge_cost(position, 0, b)
+                for a in range(1, len(scores)):
+                    score = scores[a] + lattice.edge_cost(position, a, b)
+                    if score < best_score:
+                        best_a, best_score = a, score
+                new_scores.append(best_score)
+                layer_backpointers.append(best_a)
+            scores = new_scores
+            backpointers.append(layer_backpointers)
+        last_index = _argmin(scores)
+        return Solution(
+            tuple(_trace_back(backpointers, last_index)), scores[last_index],
+            nodes_expanded=_count_expanded(lattice))
@@ -0,0 +1,223 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from typing import Generic
+
+from ..layouts.base_classes import AnnotatedFingering, F
+from ..penalties import PenaltyFunction, get_penalty_features
+from .progress import SolveMonitor
+
+
+STEP_COST = 1.0
+'''
+Every note costs this much, in addition to any penalties,
+so the cost of a path is never less than its length.
+'''
+
+MIN_GROUPED_PAIRS = 16
+'''
+Transitions with fewer pairs of candidates than this are never grouped:
+See `Lattice.group_transition_costs`.
+'''
+
+
+def _sort_key(f: AnnotatedFingering) -> tuple:
+    # Unisonoric fingerings have no direction, so they all sort as one.
+    direction = getattr(f.fingering, 'direction', None)
+    return (
+        0 if direction is None else direction.value,
+        f.fingering.left_mask.bool_matrix,
+        f.fingering.right_mask.bool_matrix)
+
+
+@dataclass(frozen=True)
+class Lattice(Generic[F]):
+    '''
+    Represents a tune as a layered graph:
+    Layer `i` holds the candidate fingerings for note `i`,
+    and every candidate is connected to every candidate in the next layer.
+    Solvers only deal with integer indexes into the layers,
+    and the costs of the edges between them,
+    so the same solvers work for uni- and bisonoric layouts.
+    Transition tables are filled in as solvers need them, so a lattice
+    belongs to one solve at a time, but the fingerings and penalty functions
+    it holds are immutable, and can be shared by lattices in many threads.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import penalize_bellows_change
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'B4']), layout)
+    >>> lattice = Lattice.from_fingerings(
+    ...     [f_set for _, f_set in n_l.get_all_fingerings()],
+    ...     [penalize_bellows_change(10)])
+    >>> [len(layer) for layer in lattice.layers]
+    [3, 2]
+    >>> [f.fingering.direction.name for f in lattice.layers[0]]
+    ['PUSH', 'PUSH', 'PULL']
+    >>> list(lattice.transition_costs(1))
+    [1.0, 11.0, 1.0, 11.0, 11.0, 1.0]
+    >>> lattice.path_cost([0, 1])
+    12.0
+    '''
+    layers: tuple[tuple[AnnotatedFingering[F], ...], ...]
+    penalty_functions: tuple[PenaltyFunction[F], ...] = ()
+    _transition_costs: dict[int, array] = field(
+        default_factory=dict, compare=False, repr=False)
+
+    @staticmethod
+    def from_fingerings(
+        all_fingerings: Iterable[Iterable[AnnotatedFingering[F]]],
+        penalty_functions: Iterable[PenaltyFunction[F]]
+    ) -> Lattice[F]:
+        '''
+        Given a sequence of sets of possible fingerings, returns a lattice.
+        Candidates are sorted, so the indexes are stable between runs.
+        '''
+        layers = tuple(
+            tuple(sorted(f_set, key=_sort_key))
+            for f_set in all_fingerings
+        )
+        for i, layer in enumerate(layers):
+            if not layer:
+                raise ValueError(f'No fingerings at position {i}')
+        return Lattice(layers, tuple(penalty_functions))
+
+    def edge_cost(self, position: int, from_index: int, to_index: int) -> float:
+        '''
+        Returns the cost of moving from candidate `from_index` in layer `position - 1`
+        to candidate `to_index` in layer `position`.
+        '''
+        table = self._transition_costs.get(position)
+        if table is not None:
+            return table[from_index * len(self.layers[position]) + to_index]
+        f1 = self.layers[position - 1][from_index]
+        f2 = self.layers[position][to_index]
+        return STEP_COST + sum(function(f1, f2) for function in self.penalty_functions)
+
+    def transition_costs(self, position: int, store: bool = True) -> array:
+        '''
+        Returns the costs of all edges into layer `position` from layer `position - 1`,
+        flattened row-major: The cost from candidate `a` to candidate `b` is at
+        `a * len(lattice.layers[position]) + b`.
+        The table is computed once, and then reused, unless `store` is false:
+        Then a table that is not already stored is computed, but not kept,
+        for solvers that would rather recompute it than hold every table.
+        '''
+        table = self._transition_costs.get(position)
+        if table is None:
+            table = array('d', (
+                self.edge_cost(position, a, b)
+                for a in range(len(self.layers[position - 1]))
+                for b in range(len(self.layers[position]))
+            ))
+            if store:
+                self._transition_costs[position] = table
+        return table
+
+    def feature_groups(self, position: int) -> tuple[array, array] | None:
+        '''
+        If every penalty declares the features it depends on, with
+        `concertina_helper.penalties.declare_penalty_features`,
+        returns the group of each candidate in layer `position`,
+        where candidates in the same group have the same features,
+        and the first candidate in each group. Groups are numbered in order.
+        Edges from or to candidates in the same group have the same costs.
+        Otherwise, returns `None`. Groups are not stored:
+        They take much less time to compute than the transition tables.
+        '''
+        features = []
+        for function in self.penalty_functions:
+            feature = get_penalty_features(function)
+            if feature is None:
+                return None
+            features.append(feature)
+        features = list(dict.fromkeys(features))
+        numbers: dict[tuple, int] = {}
+        candidate_groups = array('I')
+        firsts = array('I')
+        for i, f in enumerate(self.layers[position]):
+            key = tuple(feature(f) for feature in features)
+            if key not in numbers:
+                numbers[key] = len(numbers)
+                firsts.append(i)
+            candidate_groups.append(numbers[key])
+        return candidate_groups, firsts
+
+    def group_transition_costs(
+            self, position: int) -> tuple[array, array, array] | None:
+        '''
+        If the candidates in layers `position - 1` and `position` can be grouped,
+        as in `feature_groups`, returns the group of each candidate in each layer,
+        and the costs of edges between the groups, flattened row-major,
+        like `transition_costs`. Otherwise, or if there are fewer than
+        `MIN_GROUPED_PAIRS` pairs of candidates, or not at most half as many
+        pairs of groups, returns `None`: With less to save,
+        finding the groups takes longer than filling in the full table.
+        '''
+        pairs = len(self.layers[position - 1]) * len(self.layers[position])
+        if pairs < MIN_GROUPED_PAIRS:
+            return None
+        from_groups = self.feature_groups(position - 1)
+        to_groups = self.feature_groups(position)
+        if from_groups is None or to_groups is None:
+            return None
+        if 2 * len(from_groups[1]) * len(to_groups[1]) > pairs:
+            return None
+        costs = array('d', (
+            self.edge_cost(position, a, b)
+            for a in from_groups[1] for b in to_groups[1]
+        ))
+        return from_groups[0], to_groups[0], costs
+
+    def remaining_cost_bounds(self, monitor: SolveMonitor | None = None) -> array:
+        '''
+        Returns, for each layer, a lower bound on the cost of getting
+        from any of its candidates to the end of the lattice:
+        The sum of the cheapest edge into each later layer.
+        Because the bound only depends on position, it is consistent,
+        and can be used as an A* heuristic.
+        This requires every transition table, so they are all computed,
+        and if a `monitor` is given, it is advanced after each one.
+        '''
+        bounds = array('d', [0.0]) * len(self.layers)
+        for position in range(len(self.layers) - 1, 0, -1):
+            bounds[position - 1] = \
+                bounds[position] + min(self.transition_costs(position))
+            if monitor is not None:
+                monitor.advance(nodes=len(self.layers[position - 1]))
+        return bounds
+
+    def slice(self, start: int, stop: int) -> Lattice[F]:
+        '''
+        Returns a lattice with only the layers from `start` up to `stop`,
+        and the same penalty functions. Transition tables that have already
+        been computed are shared.
+        '''
+        return Lattice(
+            self.layers[start:stop], self.penalty_functions,
+            {
+                position - start: table
+                for position, table in self._transition_costs.items()
+                if start < position < stop
+            })
+
+    def path_cost(self, indexes: Sequence[int]) -> float:
+        '''
+        Returns the total cost of a path, given a candidate index for each layer.
+        '''
+        if not indexes:
+            return 0.0
+        return STEP_COST + sum(
+            self.edge_cost(position, indexes[position - 1], indexes[position])
+            for position in range(1, len(indexes))
+        )
+
+    def fingerings(self, indexes: Iterable[int]) -> list[AnnotatedFingering[F]]:
+        '''
+        Given a candidate index for each layer, returns the fingerings.
+        '''
+        return [layer[i] for layer, i in zip(self.layers, indexes)]
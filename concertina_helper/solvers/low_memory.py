@@ -0,0 +1,133 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+from math import isqrt
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _argmin, _count_expanded
+from .lattice import Lattice, STEP_COST
+from .min_plus import lattice_step
+from .progress import SolveMonitor
+
+
+def _typecode(lattice: Lattice) -> str:
+    '''
+    Returns the smallest typecode that can hold an index into any layer:
+    Usually one byte.
+    '''
+    width = max(len(layer) for layer in lattice.layers)
+    return 'B' if width <= 0x100 else 'H' if width <= 0x10000 else 'I'
+
+
+class LowMemorySolver(Solver):
+    '''
+    Runs the same dynamic program as
+    `concertina_helper.solvers.min_plus.MinPlusSolver`,
+    but transition tables are not kept, and backpointers for every layer
+    are stored in a single flat array, usually of one byte per candidate,
+    rather than an array of four bytes per candidate for each layer.
+
+    If `checkpointed`, backpointers are only kept for one segment at a time:
+    The forward pass keeps the scores at every `interval` layers,
+    by default the square root of the number of layers. The traceback then
+    recomputes each segment, from the last to the first, from its checkpoint.
+    This does about twice the work, but the memory used grows with
+    the square root of the length of the tune.
+    Because the recomputed scores are the same, so is the path.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import penalize_bellows_change
+    >>> from concertina_helper.solvers.min_plus import MinPlusSolver
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'B4', 'C5'] * 5), layout)
+    >>> lattice = Lattice.from_fingerings(
+    ...     [f_set for _, f_set in n_l.get_all_fingerings()],
+    ...     [penalize_bellows_change(1)])
+    >>> LowMemorySolver().solve(lattice) == MinPlusSolver().solve(lattice)
+    True
+    '''
+    def __init__(self, checkpointed: bool = True, interval: int | None = None):
+        if interval is not None and interval < 1:
+            raise ValueError('interval must be at least 1')
+        self.checkpointed = checkpointed
+        self.interval = interval
+
+    def _forward(
+            self, lattice: Lattice, start: int, stop: int, scores: Sequence[float],
+            backpointers: array | None,
+            monitor: SolveMonitor | None = None) -> array:
+        '''
+        Advances `scores` for layer `start` to the scores for layer `stop - 1`,
+        appending the backpointers for each layer, if given an array,
+        and advancing the monitor, if given one.
+        '''
+        scores = array('d', scores)
+        for position in range(start + 1, stop):
+            if monitor is not None:
+                monitor.advance(1, len(lattice.layers[position - 1]))
+            scores, layer_backpointers = lattice_step(
+                lattice, scores, position, store=False)
+            if backpointers is not None:
+                backpointers.fromlist(layer_backpointers.tolist())
+        return scores
+
+    @staticmethod
+    def _trace_back(
+            lattice: Lattice, start: int, stop: int,
+            backpointers: array, last_index: int) -> list[int]:
+        '''
+        Returns the path from layer `start` to layer `stop - 1`,
+        ending at `last_index`, in reverse.
+        '''
+        indexes = [last_index]
+        offset = len(backpointers)
+        for position in range(stop - 1, start, -1):
+            offset -= len(lattice.layers[position])
+            indexes.append(backpointers[offset + indexes[-1]])
+        return indexes
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        length = len(lattice.layers)
+        typecode = _typecode(lattice)
+        first_scores = array('d', [STEP_COST]) * len(lattice.layers[0])
+        if not self.checkpointed:
+            backpointers = array(typecode)
+            scores = self._forward(
+                lattice, 0, length, first_scores, backpointers, monitor)
+            last_index = _argmin(scores)
+            indexes = self._trace_back(lattice, 0, length, backpointers, last_index)
+            return Solution(
+                tuple(reversed(indexes)), scores[last_index],
+                nodes_expanded=_count_expanded(lattice))
+
+        interval = self.interval or max(1, isqrt(length))
+        starts = list(range(0, length, interval))
+        checkpoints = [first_scores]
+        for start in starts[1:]:
+            checkpoints.append(self._forward(
+                lattice, start - interval, start + 1, checkpoints[-1], None, monitor))
+        scores = self._forward(
+            lattice, starts[-1], length, checkpoints[-1], None, monitor)
+        last_index = _argmin(scores)
+        cost = scores[last_index]
+
+        # Each segment's path ends where the next segment's path begins.
+        indexes = [last_index]
+        stop = length
+        for start, checkpoint in zip(reversed(starts), reversed(checkpoints)):
+            # Recomputing is not counted as progress, but can be cancelled.
+            if monitor is not None:
+                monitor.advance()
+            backpointers = array(typecode)
+            self._forward(lattice, start, stop, checkpoint, backpointers)
+            indexes[-1:] = self._trace_back(
+                lattice, start, stop, backpointers, indexes[-1])
+            stop = start + 1
+        indexes.reverse()
+        return Solution(
+            tuple(indexes), cost, nodes_expanded=_count_expanded(lattice))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _trace_back, _argmin, _count_expanded
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+
+
+def min_plus_step(
+        scores: Sequence[float],
+        costs: Sequence[float]) -> tuple[array, array]:
+    '''
+    One layer of the dynamic program, as a min-plus vector-matrix product:
+    `costs` is a row-major matrix with a row for each of the `scores`.
+    Returns the new scores, and for each, the row that produced it.
+    Ties go to the lowest row.
+
+    >>> new_scores, backpointers = min_plus_step([0, 10], [5, 1, 0, 0])
+    >>> list(new_scores), list(backpointers)
+    ([5.0, 1.0], [0, 0])
+    '''
+    width = len(costs) // len(scores)
+    new_scores = array('d', costs[:width])
+    backpointers = array('I', [0]) * width
+    first = scores[0]
+    for b in range(width):
+        new_scores[b] += first
+    for a in range(1, len(scores)):
+        score = scores[a]
+        offset = a * width
+        for b in range(width):
+            total = score + costs[offset + b]
+            if total < new_scores[b]:
+                new_scores[b] = total
+                backpointers[b] = a
+    return new_scores, backpointers
+
+
+def grouped_min_plus_step(
+        scores: Sequence[float], from_groups: Sequence[int],
+        to_groups: Sequence[int], group_costs: Sequence[float]) -> tuple[array, array]:
+    '''
+    The same as `min_plus_step`, when the cost of an edge only depends
+    on the groups of the candidates at either end:
+    `group_costs` is a row-major matrix with a row for each group of `scores`,
+    and a column for each group of the new scores,
+    and groups are numbered in the order they first appear.
+    Only the best score in each group can be the best predecessor,
+    so with `K` candidates in `G` groups, this takes `O(K·G)` rather than `O(K²)`.
+    Ties still go to the lowest row.
+
+    >>> new_scores, backpointers = grouped_min_plus_step(
+    ...     [3, 0, 2], [0, 0, 1], [0, 0], [5, 1])
+    >>> list(new_scores), list(backpointers)
+    ([3.0, 3.0], [2, 2])
+    '''
+    bests: list[int] = []
+    for a, group in enumerate(from_groups):
+        if group == len(bests):
+            bests.append(a)
+        elif scores[a] < scores[bests[group]]:
+            bests[group] = a
+    width = len(group_costs) // len(bests)
+    group_scores = array('d')
+    group_backpointers = array('I')
+    for b in range(width):
+        best_a = bests[0]
+        best_score = scores[best_a] + group_costs[b]
+        for group in range(1, len(bests)):
+            a = bests[group]
+            total = scores[a] + group_costs[group * width + b]
+            if total < best_score or total == best_score and a < best_a:
+                best_a, best_score = a, total
+        group_scores.append(best_score)
+        group_backpointers.append(best_a)
+    return (
+        array('d', (group_scores[group] for group in to_groups)),
+        array('I', (group_backpointers[group] for group in to_groups)))
+
+
+def lattice_step(
+        lattice: Lattice, scores: Sequence[float], position: int,
+        store: bool = True, grouped: bool = True) -> tuple[array, array]:
+    '''
+    Advances `scores` from layer `position - 1` to layer `position`.
+    If `grouped`, and the transition table has not already been computed,
+    but the penalties declare their features, as for
+    `concertina_helper.solvers.lattice.Lattice.feature_groups`,
+    and there are enough fewer groups than candidates to be worth it,
+    as for `concertina_helper.solvers.lattice.Lattice.group_transition_costs`,
+    uses `grouped_min_plus_step`, without computing the full table.
+    Otherwise, uses `min_plus_step`, passing `store` to
+    `concertina_helper.solvers.lattice.Lattice.transition_costs`.
+    '''
+    if grouped and position not in lattice._transition_costs:
+        group_costs = lattice.group_transition_costs(position)
+        if group_costs is not None:
+            return grouped_min_plus_step(scores, *group_costs)
+    return min_plus_step(scores, lattice.transition_costs(position, store=store))
+
+
+class MinPlusSolver(Solver):
+    '''
+    Runs the same dynamic program as
+    `concertina_helper.solvers.dynamic_programming.DynamicProgrammingSolver`,
+    but over the flat cost tables from `Lattice.transition_costs`.
+    If `grouped`, candidates are grouped when the penalties allow it,
+    as in `lattice_step`: The path is the same either way.
+    '''
+    def __init__(self, grouped: bool = True):
+        self.grouped = grouped
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        scores = array('d', [STEP_COST] * len(lattice.layers[0]))
+        backpointers = []
+        for position in range(1, len(lattice.layers)):
+            if monitor is not None:
+                monitor.advance(1, len(lattice.layers[position - 1]))
+            scores, layer_backpointers = lattice_step(
+                lattice, scores, position, grouped=self.grouped)
+            backpointers.append(layer_backpointers)
+        last_index = _argmin(scores)
+        return Solution(
+            tuple(_trace_back(backpointers, last_index)), scores[last_index],
+            nodes_expanded=_count_expanded(lattice))
@@ -0,0 +1,37 @@
+'''
+This module requires numpy, which is an optional dependency:
+Check `concertina_helper.solvers.registry.list_solver_names` before using it.
+'''
+from __future__ import annotations
+
+import numpy as np
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _trace_back, _count_expanded
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+
+
+class NumpyMinPlusSolver(Solver):
+    '''
+    Runs the min-plus dynamic program with each layer as a single numpy operation.
+    '''
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        scores = np.full(len(lattice.layers[0]), STEP_COST)
+        backpointers = []
+        for position in range(1, len(lattice.layers)):
+            if monitor is not None:
+                monitor.advance(1, len(lattice.layers[position - 1]))
+            costs = np.frombuffer(
+                lattice.transition_costs(position), dtype=np.float64
+            ).reshape(len(scores), -1)
+            totals = scores[:, np.newaxis] + costs
+            layer_backpointers = totals.argmin(axis=0)
+            scores = totals[layer_backpointers, np.arange(totals.shape[1])]
+            backpointers.append(layer_backpointers.tolist())
+        last_index = int(scores.argmin())
+        return Solution(
+            tuple(_trace_back(backpointers, last_index)), float(scores[last_index]),
+            nodes_expanded=_count_expanded(lattice))
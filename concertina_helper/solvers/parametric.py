@@ -0,0 +1,129 @@
+'''
+Tools for re-solving a tune quickly when only the penalty weights change:
+Each raw feature is evaluated once per edge, and stored,
+and then for any weights, the transition tables are a weighted sum of the features.
+If numpy is installed, the sum is vectorized.
+'''
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+from ..layouts.bisonoric import AnnotatedBisonoricFingering
+from ..penalties import PenaltyFunction, PenaltyFactory
+from .base_classes import Solution
+from .lattice import Lattice, STEP_COST
+from .registry import get_solver_by_name, DEFAULT_SOLVER_NAME
+
+try:
+    import numpy as np
+    _has_numpy = True
+except ImportError:  # pragma: no cover
+    _has_numpy = False
+
+
+def raw_features(factories: Mapping[str, PenaltyFactory]) -> dict[str, PenaltyFunction]:
+    '''
+    Given linear penalty factories, returns their penalties at unit cost,
+    which are the raw features the weights multiply.
+
+    >>> from concertina_helper.penalties import get_penalty_factories
+    >>> sorted(raw_features(get_penalty_factories()))[0]
+    'bellows_change'
+    '''
+    return {name: factory(1.0) for name, factory in factories.items()}
+
+
+@dataclass(frozen=True)
+class ParametricLattice:
+    '''
+    Like `concertina_helper.solvers.lattice.Lattice`, but instead of penalties,
+    it holds the value of each named feature for every edge:
+    `features[k]` holds the values of feature `k` for all edges of all layers,
+    with the edges into layer `position` starting at `offsets[position]`.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import get_penalty_factories
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'B4', 'D5']), layout)
+    >>> p_l = ParametricLattice.from_fingerings(
+    ...     [f_set for _, f_set in n_l.get_all_fingerings()],
+    ...     raw_features(get_penalty_factories()))
+    >>> p_l.solve({'bellows_change': 10, 'outer_fingers': 3}).cost
+    7.5
+    >>> p_l.solve({'finger_in_same_column': 10, 'outer_fingers': 3}).cost
+    6.0
+    '''
+    layers: tuple[tuple[AnnotatedBisonoricFingering, ...], ...]
+    feature_names: tuple[str, ...]
+    features: tuple[array, ...]
+    offsets: array
+
+    @staticmethod
+    def from_fingerings(
+        all_fingerings: Iterable[Iterable[AnnotatedBisonoricFingering]],
+        feature_functions: Mapping[str, PenaltyFunction]
+    ) -> ParametricLattice:
+        '''
+        Evaluates every feature function once for every edge.
+        '''
+        lattice = Lattice.from_fingerings(all_fingerings, [])
+        layers = lattice.layers
+        offsets = array('q', [0, 0])
+        for position in range(1, len(layers)):
+            offsets.append(
+                offsets[-1] + len(layers[position - 1]) * len(layers[position]))
+        features = tuple(
+            array('d', (
+                function(f1, f2)
+                for position in range(1, len(layers))
+                for f1 in layers[position - 1]
+                for f2 in layers[position]
+            ))
+            for function in feature_functions.values()
+        )
+        return ParametricLattice(
+            layers, tuple(feature_functions), features, offsets[:len(layers) + 1])
+
+    def weighted(self, weights: Mapping[str, float]) -> Lattice:
+        '''
+        Returns a lattice whose transition tables are the weighted sum of the features,
+        plus the step cost. Features missing from `weights` have no weight.
+        '''
+        unknown = set(weights) - set(self.feature_names)
+        if unknown:
+            raise ValueError(f'unknown features: {sorted(unknown)}')
+        edge_count = self.offsets[-1]
+        terms = [
+            (weights[name], feature)
+            for name, feature in zip(self.feature_names, self.features)
+            if weights.get(name)
+        ]
+        if _has_numpy:
+            total = np.full(edge_count, STEP_COST)
+            for weight, feature in terms:
+                total += weight * np.frombuffer(feature, dtype=np.float64)
+            combined = array('d', total.tobytes())
+        else:  # pragma: no cover
+            combined = array('d', [STEP_COST]) * edge_count
+            for weight, feature in terms:
+                for i, value in enumerate(feature):
+                    combined[i] += weight * value
+        tables = {
+            position: combined[self.offsets[position]:self.offsets[position + 1]]
+            for position in range(1, len(self.layers))
+        }
+        return Lattice(self.layers, (), tables)
+
+    def solve(
+            self,
+            weights: Mapping[str, float],
+            solver_name: str = DEFAULT_SOLVER_NAME) -> Solution:
+        '''
+        Solves the lattice for the given feature weights.
+        Use `weighted(weights).fingerings(solution.indexes)` for the fingerings.
+        '''
+        return get_solver_by_name(solver_name).solve(self.weighted(weights))
@@ -0,0 +1,159 @@
+'''
+Progress reports and cooperative cancellation for long solves.
+Every backend takes an optional `SolveMonitor`, and calls `SolveMonitor.advance`
+from its main loop: That reports progress to a callback, at most once an
+`interval`, and raises `SolveCancelled` once a `CancellationToken` is cancelled,
+from any thread.
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'B4']), layout)
+>>> reports = []
+>>> best = n_l.get_best_fingerings(
+...     [penalize_bellows_change(1)], 'minplus', progress=reports.append)
+>>> reports[-1].positions, reports[-1].total_positions
+(3, 3)
+
+>>> token = CancellationToken()
+>>> token.cancel()
+>>> n_l.get_best_fingerings([penalize_bellows_change(1)], cancel=token)
+Traceback (most recent call last):
+...
+concertina_helper.solvers.progress.SolveCancelled: Solve cancelled
+'''
+from __future__ import annotations
+from collections.abc import Callable
+from dataclasses import dataclass
+import threading
+import time
+
+
+@dataclass(frozen=True)
+class Progress:
+    '''
+    How far a solve has got: `positions` of the `total_positions` notes
+    have been processed, `nodes_expanded` nodes have had their outgoing edges
+    examined, and `elapsed` seconds have passed since it started.
+    Backends which go over the tune more than once, or out of order,
+    count the furthest position reached.
+    '''
+    positions: int
+    total_positions: int
+    nodes_expanded: int
+    elapsed: float
+
+    @property
+    def fraction(self) -> float:
+        return self.positions / self.total_positions if self.total_positions else 1.0
+
+
+ProgressCallback = Callable[[Progress], None]
+'''
+Called with the progress of a solve, from the thread which is solving.
+'''
+
+
+class SolveCancelled(Exception):
+    '''
+    Raised from a solve after its `CancellationToken` is cancelled.
+    '''
+
+
+class CancellationToken:
+    '''
+    Shared between a solve and the code that may want to stop it:
+    Once `cancel` is called, from any thread, the solve raises `SolveCancelled`
+    the next time it checks.
+    '''
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        '''
+        Raises `SolveCancelled` if the token has been cancelled.
+        '''
+        if self._event.is_set():
+            raise SolveCancelled('Solve cancelled')
+
+
+class SolveMonitor:
+    '''
+    Counts the positions and nodes of a solve of `total_positions` notes,
+    calls `progress`, if given, at most once every `interval` seconds,
+    and checks `cancel`, if given, every time it is advanced.
+    '''
+    def __init__(
+            self, total_positions: int,
+            progress: ProgressCallback | None = None,
+            cancel: CancellationToken | None = None,
+            interval: float = 0.1,
+            clock: Callable[[], float] = time.monotonic):
+        self.total_positions = total_positions
+        self.progress = progress
+        self.cancel = cancel
+        self.interval = interval
+        self.clock = clock
+        self.positions = 0
+        self.nodes_expanded = 0
+        self.start = clock()
+        self._last_report = self.start
+
+    def _report(self, now: float) -> None:
+        assert self.progress is not None
+        self._last_report = now
+        self.progress(Progress(
+            self.positions, self.total_positions, self.nodes_expanded,
+            now - self.start))
+
+    def advance(self, positions: int = 0, nodes: int = 0) -> None:
+        '''
+        Counts `positions` more notes processed, and `nodes` more expanded.
+        Raises `SolveCancelled` if the token has been cancelled.
+        '''
+        if self.cancel is not None:
+            self.cancel.check()
+        self.positions = min(self.positions + positions, self.total_positions)
+        self.nodes_expanded += nodes
+        if self.progress is not None:
+            now = self.clock()
+            if now - self._last_report >= self.interval:
+                self._report(now)
+
+    def reach(self, position: int, nodes: int = 0) -> None:
+        '''
+        Like `advance`, for backends which do not go in order:
+        Counts up to `position` notes processed, if that is further.
+        '''
+        self.advance(max(0, position - self.positions), nodes)
+
+    def finish(self) -> None:
+        '''
+        Counts every note as processed, and always reports progress.
+        '''
+        if self.cancel is not None:
+            self.cancel.check()
+        self.positions = self.total_positions
+        if self.progress is not None:
+            self._report(self.clock())
+
+
+def make_monitor(
+        total_positions: int,
+        progress: ProgressCallback | None = None,
+        cancel: CancellationToken | None = None) -> SolveMonitor | None:
+    '''
+    Returns a monitor, unless there is nothing to report to, or to check.
+    '''
+    if progress is None and cancel is None:
+        return None
+    return SolveMonitor(total_positions, progress, cancel)
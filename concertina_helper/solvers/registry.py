@@ -0,0 +1,59 @@
+from __future__ import annotations
+from collections.abc import Callable, Iterable
+
+from .base_classes import Solver
+from .a_star import AStarSolver
+from .anytime import AnytimeSolver
+from .dynamic_programming import DynamicProgrammingSolver
+from .low_memory import LowMemorySolver
+from .min_plus import MinPlusSolver
+from .segmented import SegmentedSolver
+
+
+DEFAULT_SOLVER_NAME = 'astar'
+
+_solver_factories: dict[str, Callable[[], Solver]] = {
+    'anytime': AnytimeSolver,
+    'astar': AStarSolver,
+    'dp': DynamicProgrammingSolver,
+    'lowmem': LowMemorySolver,
+    'minplus': MinPlusSolver,
+    'segmented': SegmentedSolver,
+}
+
+try:
+    import numpy  # noqa: F401
+except ImportError:  # pragma: no cover
+    pass
+else:
+    from .numpy_min_plus import NumpyMinPlusSolver
+    _solver_factories['numpy'] = NumpyMinPlusSolver
+
+
+def register_solver(name: str, factory: Callable[[], Solver]) -> None:
+    '''
+    Makes a new backend available by name.
+    '''
+    if name in _solver_factories:
+        raise ValueError(f'solver already registered: {name}')
+    _solver_factories[name] = factory
+
+
+def list_solver_names() -> Iterable[str]:
+    '''
+    Lists the backends that can be used in this environment.
+    Optional backends are only listed if their dependencies are installed.
+
+    >>> {'astar', 'dp', 'minplus'} <= set(list_solver_names())
+    True
+    '''
+    return sorted(_solver_factories)
+
+
+def get_solver_by_name(name: str) -> Solver:
+    '''
+    The `name` must be one of the names returned by `list_solver_names()`.
+    '''
+    if name not in _solver_factories:
+        raise ValueError(f'unknown solver: {name}')
+    return _solver_factories[name]()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from math import inf
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _trace_back, _argmin, _count_expanded
+from .lattice import Lattice, STEP_COST
+from .min_plus import min_plus_step, MinPlusSolver
+from .progress import SolveMonitor
+
+
+@dataclass(frozen=True)
+class _SegmentTable:
+    '''
+    For a segment of a lattice, the cheapest way from each candidate `a`
+    in its first layer to each candidate `b` in its last layer:
+    `costs[a][b]` is the cost of the edges, and `backpointers[a]`,
+    for each later layer, the previous candidate on the cheapest way
+    from `a` to each of its candidates.
+    '''
+    costs: list[array]
+    backpointers: list[list[array]]
+
+    def path(self, a: int, b: int) -> list[int]:
+        '''
+        Returns the indexes on the cheapest way from `a` to `b`, including both ends.
+        '''
+        return _trace_back(self.backpointers[a], b)
+
+
+def _solve_segment(lattice: Lattice, is_first: bool) -> _SegmentTable:
+    '''
+    Runs the min-plus dynamic program in a single pass over the layers,
+    with a row of scores for each candidate in the first layer,
+    so each transition table is only computed and read once.
+    The first segment of a tune has a single row instead,
+    starting from every candidate at once.
+    '''
+    width = len(lattice.layers[0])
+    if is_first:
+        rows = [array('d', [STEP_COST]) * width]
+    else:
+        rows = [array('d', [inf]) * width for _ in range(width)]
+        for a, scores in enumerate(rows):
+            scores[a] = 0
+    backpointers: list[list[array]] = [[] for _ in rows]
+    for position in range(1, len(lattice.layers)):
+        costs = lattice.transition_costs(position)
+        for a, scores in enumerate(rows):
+            rows[a], layer_backpointers = min_plus_step(scores, costs)
+            backpointers[a].append(layer_backpointers)
+    return _SegmentTable(rows, backpointers)
+
+
+def _choose_boundaries(lattice: Lattice, segment_length: int) -> list[int]:
+    '''
+    Returns the positions of the layers where one segment ends and the next begins,
+    including the first and last layers. The last layer in each window
+    with a single candidate is preferred, because then the segments
+    are independent, and the next only needs a single row of scores;
+    Failing that, the last layer in the second half of the window
+    that starts a measure; Failing that, the end of the window.
+    '''
+    layers = lattice.layers
+    last = len(layers) - 1
+    boundaries = [0]
+    while last - boundaries[-1] > segment_length:
+        start = boundaries[-1]
+        window = range(start + segment_length, start + segment_length // 2, -1)
+        singletons = [
+            p for p in range(start + segment_length, start, -1) if len(layers[p]) == 1]
+        measure_starts = [
+            p for p in window
+            if layers[p][0].annotation.measure != layers[p - 1][0].annotation.measure
+        ]
+        boundaries.append((singletons or measure_starts or [window[0]])[0])
+    boundaries.append(last)
+    return boundaries
+
+
+class SegmentedSolver(Solver):
+    '''
+    Splits long lattices into segments of up to `segment_length` layers,
+    and solves the segments concurrently: For each segment,
+    a worker finds the cheapest path between every pair of candidates
+    in its first and last layers, in one pass over its layers,
+    which is cheapest when its first layer has a single candidate.
+    These tables are then stitched together with one more min-plus pass,
+    so the result is still globally optimal.
+
+    By default the segments are solved in a `ProcessPoolExecutor`,
+    so the penalty functions must be picklable, as the built-in ones are;
+    Pass a different `executor_factory`, like `ThreadPoolExecutor`, if they are not.
+    If `max_workers` is 1, the segments are solved in this process instead.
+    '''
+    def __init__(
+            self,
+            segment_length: int = 2000,
+            max_workers: int | None = None,
+            executor_factory: Callable[..., Executor] = ProcessPoolExecutor):
+        if segment_length < 2:
+            raise ValueError('segment_length must be at least 2')
+        self.segment_length = segment_length
+        self.max_workers = max_workers
+        self.executor_factory = executor_factory
+
+    def _collect(
+            self, boundaries: Sequence[int], segments: Sequence[Lattice],
+            results: Iterable[_SegmentTable],
+            monitor: SolveMonitor | None) -> list[_SegmentTable]:
+        tables = []
+        # The monitor can not be sent to the workers:
+        # Progress is counted, and cancellation checked, as each segment is done.
+        for stop, segment, table in zip(boundaries[1:], segments, results):
+            if monitor is not None:
+                monitor.reach(stop + 1, _count_expanded(segment) - 1)
+            tables.append(table)
+        return tables
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if len(lattice.layers) <= self.segment_length:
+            return MinPlusSolver().solve(lattice, monitor)
+        boundaries = _choose_boundaries(lattice, self.segment_length)
+        segments = [
+            lattice.slice(start, stop + 1)
+            for start, stop in zip(boundaries, boundaries[1:])
+        ]
+        is_first = [i == 0 for i in range(len(segments))]
+        if self.max_workers == 1:
+            # One worker would only add the cost of sending it the segments.
+            tables = self._collect(
+                boundaries, segments, map(_solve_segment, segments, is_first), monitor)
+        else:
+            with self.executor_factory(max_workers=self.max_workers) as executor:
+                tables = self._collect(
+                    boundaries, segments,
+                    executor.map(_solve_segment, segments, is_first), monitor)
+
+        # The first table has a single row, from a virtual start node.
+        scores: Sequence[float] = array('d', [0.0])
+        backpointers = []
+        for table in tables:
+            new_scores = array('d')
+            table_backpointers = array('I')
+            for b in range(len(table.costs[0])):
+                a = _argmin([
+                    score + costs[b] for score, costs in zip(scores, table.costs)])
+                new_scores.append(scores[a] + table.costs[a][b])
+                table_backpointers.append(a)
+            scores = new_scores
+            backpointers.append(table_backpointers)
+
+        last_index = _argmin(scores)
+        ends = _trace_back(backpointers, last_index)
+        indexes = tables[0].path(0, ends[1])
+        for table, a, b in zip(tables[1:], ends[1:], ends[2:]):
+            indexes.extend(table.path(a, b)[1:])
+        return Solution(
+            tuple(indexes), scores[last_index],
+            nodes_expanded=_count_expanded(lattice))
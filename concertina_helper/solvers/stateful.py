@@ -0,0 +1,107 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Hashable, Iterable, Sequence
+
+from .base_classes import Solver, Solution
+from .dynamic_programming import _trace_back, _argmin
+from .lattice import Lattice, STEP_COST
+from .progress import SolveMonitor
+from ..stateful_penalties import StatefulPenalty
+
+
+_Key = tuple[int, tuple[Hashable, ...]]
+'''
+A candidate index, and the state of each stateful penalty.
+'''
+
+
+class StatefulSolver(Solver):
+    '''
+    Dynamic programming over pairs of candidate and penalty state:
+    Only states that are actually reached are expanded,
+    and a state is dropped as soon as it is costlier than the best state
+    for the same candidate by more than the penalties could ever make up.
+    With no stateful penalties, this is the same as
+    `concertina_helper.solvers.dynamic_programming.DynamicProgrammingSolver`.
+
+    >>> from concertina_helper.layouts.layout_loader import (
+    ...     load_bisonoric_layout_by_name)
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.stateful_penalties import penalize_long_bellows_run
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'B4']), layout)
+    >>> lattice = Lattice.from_fingerings(
+    ...     [f_set for _, f_set in n_l.get_all_fingerings()], [])
+    >>> solver = StatefulSolver([penalize_long_bellows_run(10, 2)])
+    >>> solution = solver.solve(lattice)
+    >>> solution.cost
+    3.0
+    >>> [f.fingering.direction.name for f in lattice.fingerings(solution.indexes)]
+    ['PULL', 'PUSH', 'PUSH']
+    '''
+    def __init__(self, stateful_penalties: Iterable[StatefulPenalty]):
+        self.stateful_penalties = tuple(stateful_penalties)
+        self.slack = sum(p.horizon * p.max_cost for p in self.stateful_penalties)
+
+    def _prune(self, keys: Sequence[_Key], scores: array) -> list[int]:
+        '''
+        Returns the positions of the keys worth expanding.
+        '''
+        best: dict[int, float] = {}
+        for (index, _), score in zip(keys, scores):
+            if score < best.get(index, float('inf')):
+                best[index] = score
+        return [
+            i for i, (index, _) in enumerate(keys)
+            if scores[i] <= best[index] + self.slack
+        ]
+
+    def solve(self, lattice: Lattice, monitor: SolveMonitor | None = None) -> Solution:
+        if not lattice.layers:
+            return Solution((), 0.0)
+        keys: list[_Key] = [
+            (i, tuple(p.start(f) for p in self.stateful_penalties))
+            for i, f in enumerate(lattice.layers[0])
+        ]
+        scores = array('d', [STEP_COST]) * len(keys)
+        # Each layer's nodes are numbered in the order they are reached:
+        # These record the candidate for each node, and its best predecessor.
+        candidates = [array('I', range(len(keys)))]
+        backpointers = []
+        expanded = 1
+        for position in range(1, len(lattice.layers)):
+            layer = lattice.layers[position]
+            new_keys: dict[_Key, int] = {}
+            new_scores = array('d')
+            layer_backpointers = array('I')
+            survivors = self._prune(keys, scores)
+            expanded += len(survivors)
+            if monitor is not None:
+                monitor.advance(1, len(survivors))
+            for k in survivors:
+                a, states = keys[k]
+                for b, f in enumerate(layer):
+                    total = scores[k] + lattice.edge_cost(position, a, b)
+                    new_states = []
+                    for p, state in zip(self.stateful_penalties, states):
+                        new_state, cost = p.step(state, f)
+                        new_states.append(new_state)
+                        total += cost
+                    key = (b, tuple(new_states))
+                    j = new_keys.setdefault(key, len(new_scores))
+                    if j == len(new_scores):
+                        new_scores.append(total)
+                        layer_backpointers.append(k)
+                    elif total < new_scores[j]:
+                        new_scores[j] = total
+                        layer_backpointers[j] = k
+            keys = list(new_keys)
+            scores = new_scores
+            candidates.append(array('I', (index for index, _ in keys)))
+            backpointers.append(layer_backpointers)
+        last = _argmin(scores)
+        nodes = _trace_back(backpointers, last)
+        return Solution(
+            tuple(layer[node] for layer, node in zip(candidates, nodes)),
+            scores[last], nodes_expanded=expanded)
@@ -0,0 +1,160 @@
+'''
+Penalties that look further back than the previous note.
+
+A `concertina_helper.penalties.PenaltyFunction` only sees two consecutive
+fingerings. A `StatefulPenalty` instead carries a small state along the tune,
+and each note updates the state and may add a cost. The state might be
+the last few fingerings, as in `window_penalty`, or a count,
+as in `penalize_long_bellows_run`.
+
+Stateful penalties can be mixed with plain penalty functions in
+`concertina_helper.notes_on_layout.NotesOnLayout.get_best_fingerings`:
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> notes = list(notes_from_pitches(['G4', 'A4', 'B4', 'C5', 'D5']))
+>>> n_l = NotesOnLayout(notes, layout)
+>>> def directions(penalties):
+...     return ' '.join(
+...         f.fingering.direction.name for f in n_l.get_best_fingerings(penalties))
+>>> directions([penalize_bellows_change(1)])
+'PUSH PUSH PUSH PUSH PUSH'
+>>> directions([penalize_bellows_change(1), penalize_long_bellows_run(10, 2)])
+'PUSH PUSH PULL PUSH PUSH'
+'''
+from __future__ import annotations
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from functools import partial
+
+from .layouts.bisonoric import AnnotatedBisonoricFingering
+from .penalties import _find_columns_used
+
+
+@dataclass(frozen=True)
+class StatefulPenalty:
+    '''
+    `start` gives the state after the first note, and `step`,
+    given the state and the next fingering, returns the new state and a cost.
+    States must be hashable, and there should be few of them:
+    The solver tracks each reachable combination of candidate and state.
+
+    Costs must be between 0 and `max_cost`, and the state must only depend on
+    the last `horizon` fingerings, or be capped so that it converges within
+    `horizon` notes. The solver relies on this to discard states
+    that can not catch up with the best state for the same candidate.
+    '''
+    start: Callable[[AnnotatedBisonoricFingering], Hashable]
+    step: Callable[[Hashable, AnnotatedBisonoricFingering], tuple[Hashable, float]]
+    horizon: int
+    max_cost: float
+
+
+WindowFunction = Callable[[tuple[AnnotatedBisonoricFingering, ...]], float]
+'''
+Given `order + 1` consecutive fingerings, returns the cost of the last.
+'''
+
+
+def window_penalty(
+        function: WindowFunction, order: int, max_cost: float) -> StatefulPenalty:
+    '''
+    Wraps a function of the last `order + 1` fingerings as a stateful penalty:
+    The state is the last `order` fingerings.
+    An order of 1 is the same as a plain penalty function.
+    '''
+    if order < 1:
+        raise ValueError('order must be at least 1')
+    return StatefulPenalty(
+        start=_start_window,
+        step=partial(_step_window, function, order),
+        horizon=order, max_cost=max_cost)
+
+
+def _start_window(f: AnnotatedBisonoricFingering) -> Hashable:
+    return (f,)
+
+
+def _step_window(
+        function: WindowFunction, order: int,
+        state: Hashable, f: AnnotatedBisonoricFingering) -> tuple[Hashable, float]:
+    assert isinstance(state, tuple)
+    window = state + (f,)
+    cost = function(window) if len(window) > order else 0.0
+    return window[-order:], cost
+
+
+def penalize_finger_reuse_after_one(cost: float) -> StatefulPenalty:
+    '''
+    Penalize fingerings where a finger plays a different button
+    two notes after it was last used.
+    '''
+    return window_penalty(
+        partial(_calculate_finger_reuse_after_one, cost), order=2, max_cost=cost)
+
+
+def _calculate_finger_reuse_after_one(
+        cost: float, window: tuple[AnnotatedBisonoricFingering, ...]) -> float:
+    first, _, last = window
+    return (
+        cost if first.fingering != last.fingering
+        and _find_columns_used(first.fingering) & _find_columns_used(last.fingering)
+        else 0)
+
+
+def penalize_repeated_bellows_changes(cost: float, count: int = 3) -> StatefulPenalty:
+    '''
+    Penalize each bellows change that makes `count` or more changes in a row.
+    '''
+    return StatefulPenalty(
+        start=_start_bellows_changes,
+        step=partial(_step_bellows_changes, cost, count),
+        horizon=count, max_cost=cost)
+
+
+def _start_bellows_changes(f: AnnotatedBisonoricFingering) -> Hashable:
+    return (f.fingering.direction, 0)
+
+
+def _step_bellows_changes(
+        cost: float, count: int,
+        state: Hashable, f: AnnotatedBisonoricFingering) -> tuple[Hashable, float]:
+    assert isinstance(state, tuple)
+    direction, changes = state
+    if f.fingering.direction == direction:
+        return (direction, 0), 0
+    changes += 1
+    return (
+        (f.fingering.direction, min(changes, count - 1)),
+        cost if changes >= count else 0)
+
+
+def penalize_long_bellows_run(cost: float, max_notes: int) -> StatefulPenalty:
+    '''
+    Penalize each note after the first `max_notes` in one bellows direction,
+    when the bellows is likely to run out of air.
+    '''
+    return StatefulPenalty(
+        start=_start_bellows_run,
+        step=partial(_step_bellows_run, cost, max_notes),
+        horizon=max_notes, max_cost=cost)
+
+
+def _start_bellows_run(f: AnnotatedBisonoricFingering) -> Hashable:
+    return (f.fingering.direction, 1)
+
+
+def _step_bellows_run(
+        cost: float, max_notes: int,
+        state: Hashable, f: AnnotatedBisonoricFingering) -> tuple[Hashable, float]:
+    assert isinstance(state, tuple)
+    direction, notes = state
+    if f.fingering.direction != direction:
+        return (f.fingering.direction, 1), 0
+    notes += 1
+    return (
+        (direction, min(notes, max_notes)),
+        cost if notes > max_notes else 0)
@@ -0,0 +1,371 @@
+'''
+Aggregates the fingerings chosen for many tunes on one layout:
+how often each button is used, the balance of push and pull,
+how often the bellows reverses in each measure, and the most common moves
+from one button to the next. Fingerings are consumed as a stream,
+one note at a time, and only counters are kept, in arrays of a fixed size,
+keyed by fingering id, numbered as in `concertina_helper.layout_tables`:
+Push before pull, left before right, row by row.
+Statistics gathered in different worker processes can be merged.
+
+>>> from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+>>> from concertina_helper.notes_on_layout import NotesOnLayout
+>>> from concertina_helper.note_generators import notes_from_pitches
+>>> from concertina_helper.penalties import penalize_bellows_change
+>>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+>>> stats = RepertoireStatistics(layout)
+>>> for pitches in [['C4', 'F#4', 'C4'], ['G4', 'F#4']]:
+...     n_l = NotesOnLayout(notes_from_pitches(pitches), layout)
+...     stats.add_tune(n_l.get_best_fingerings([penalize_bellows_change(1)]))
+>>> stats.notes, stats.push_notes, stats.reversals
+(5, 2, 2)
+>>> print(stats.format_heatmap(Direction.PULL))
+.   .   .   1   .      .   .   .   .   .
+.   .   .   .   .      .   .   .   .   .
+.   2   .   .   .      .   .   .   .   .
+'''
+from __future__ import annotations
+import argparse
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from heapq import nlargest
+from itertools import accumulate
+from pathlib import Path
+import json
+import sys
+
+from .layouts.bisonoric import AnnotatedBisonoricFingering, BisonoricLayout
+from .layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_path, load_bisonoric_layout_by_name)
+from .notes_on_layout import NotesOnLayout
+from .note_generators import notes_from_path
+from .penalties import PenaltyFunction, get_penalty_factories
+from .solvers.registry import list_solver_names
+from .type_defs import Direction
+
+
+MAX_REVERSALS = 16
+'''
+Measures with more bellows reversals than this are counted with this many.
+'''
+
+
+@dataclass
+class RepertoireStatistics:
+    '''
+    Counters for tunes on `layout`. Each counter is an array of fixed size:
+    - `button_counts[i]`: Notes which use fingering `i`;
+      For chords, each button is counted.
+    - `transition_counts[a * n + b]`: Moves from fingering `a` to fingering `b`,
+      where `n` is the number of fingerings; For chords, every pair is counted.
+    - `reversal_counts[k]`: Measures with `k` bellows reversals.
+      A reversal belongs to the measure of the note after it.
+    '''
+    layout: BisonoricLayout
+    tunes: int = 0
+    notes: int = 0
+    push_notes: int = 0
+    reversals: int = 0
+    button_counts: array = field(init=False, repr=False)
+    transition_counts: array = field(init=False, repr=False)
+    reversal_counts: array = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        left, right = self.layout.shape
+        self._left_count = sum(left)
+        self._side_count = self._left_count + sum(right)
+        count = 2 * self._side_count
+        self.button_counts = array('Q', [0]) * count
+        self.transition_counts = array('Q', [0]) * (count * count)
+        self.reversal_counts = array('Q', [0]) * (MAX_REVERSALS + 1)
+
+    @property
+    def fingering_count(self) -> int:
+        return 2 * self._side_count
+
+    @property
+    def measures(self) -> int:
+        return sum(self.reversal_counts)
+
+    @property
+    def pull_notes(self) -> int:
+        return self.notes - self.push_notes
+
+    def _ids(self, f: AnnotatedBisonoricFingering) -> list[int]:
+        offset = 0 if f.fingering.direction == Direction.PUSH else self._side_count
+        return [
+            offset + i for i in f.fingering.left_mask.buttons()
+        ] + [
+            offset + self._left_count + i for i in f.fingering.right_mask.buttons()
+        ]
+
+    def add_tune(self, fingerings: Iterable[AnnotatedBisonoricFingering]) -> None:
+        '''
+        Counts the fingerings for one tune, as they are produced:
+        Only the previous fingering is kept.
+        '''
+        count = self.fingering_count
+        previous: AnnotatedBisonoricFingering | None = None
+        previous_ids: list[int] = []
+        measure_reversals = 0
+        for f in fingerings:
+            ids = self._ids(f)
+            self.notes += 1
+            if f.fingering.direction == Direction.PUSH:
+                self.push_notes += 1
+            for i in ids:
+                self.button_counts[i] += 1
+            if previous is not None:
+                if f.annotation.measure != previous.annotation.measure:
+                    self.reversal_counts[min(measure_reversals, MAX_REVERSALS)] += 1
+                    measure_reversals = 0
+                if f.fingering.direction != previous.fingering.direction:
+                    self.reversals += 1
+                    measure_reversals += 1
+                for a in previous_ids:
+                    for b in ids:
+                        self.transition_counts[a * count + b] += 1
+            previous, previous_ids = f, ids
+        if previous is not None:
+            self.reversal_counts[min(measure_reversals, MAX_REVERSALS)] += 1
+        self.tunes += 1
+
+    def merge(self, other: RepertoireStatistics) -> None:
+        '''
+        Adds the counts from `other`, which must be for the same layout.
+        '''
+        if other.layout.fingerprint != self.layout.fingerprint:
+            raise ValueError('Statistics are for different layouts')
+        self.tunes += other.tunes
+        self.notes += other.notes
+        self.push_notes += other.push_notes
+        self.reversals += other.reversals
+        for mine, theirs in [
+                (self.button_counts, other.button_counts),
+                (self.transition_counts, other.transition_counts),
+                (self.reversal_counts, other.reversal_counts)]:
+            for i, value in enumerate(theirs):
+                if value:
+                    mine[i] += value
+
+    def describe_fingering(self, i: int) -> str:
+        '''
+        Describes fingering `i` as its direction, pitch, and button,
+        in the format of `concertina_helper.tuning`.
+
+        >>> from concertina_helper.layouts.layout_loader import (
+        ...     load_bisonoric_layout_by_name)
+        >>> stats = RepertoireStatistics(
+        ...     load_bisonoric_layout_by_name('30_wheatstone_cg'))
+        >>> stats.describe_fingering(3), stats.describe_fingering(30)
+        ('PUSH A4 L1.4', 'PULL F3 L1.1')
+        '''
+        direction, button = divmod(i, self._side_count)
+        layout = self.layout.pull_layout if direction else self.layout.push_layout
+        left, right = self.layout.shape
+        side, matrix, lengths = ('L', layout.left, left) \
+            if button < self._left_count else ('R', layout.right, right)
+        if side == 'R':
+            button -= self._left_count
+        starts = list(accumulate(lengths, initial=0))
+        row = bisect_right(starts, button) - 1
+        column = button - starts[row]
+        name = 'PULL' if direction else 'PUSH'
+        return f'{name} {matrix[row][column]} {side}{row + 1}.{column + 1}'
+
+    def top_transitions(self, n: int = 10) -> list[tuple[int, int, int]]:
+        '''
+        Returns the `n` most common moves, as the ids of the fingerings
+        before and after, and the count. Ties go to the lowest ids.
+        '''
+        count = self.fingering_count
+        top = nlargest(
+            n, (
+                (value, -i) for i, value in enumerate(self.transition_counts)
+                if value
+            ))
+        return [(-i // count, -i % count, value) for value, i in top]
+
+    def format_heatmap(self, direction: Direction) -> str:
+        '''
+        Returns a grid of the number of notes using each button,
+        laid out like the layout, with `.` for buttons never used.
+        '''
+        offset = 0 if direction == Direction.PUSH else self._side_count
+        left, right = self.layout.shape
+        lines = []
+        left_offset = offset
+        right_offset = offset + self._left_count
+        for left_length, right_length in zip(left, right):
+            cells = []
+            for start, length in [
+                    (left_offset, left_length), (right_offset, right_length)]:
+                cells.append(' '.join(
+                    f'{self.button_counts[i] or ".":<3}'
+                    for i in range(start, start + length)))
+            lines.append('    '.join(cells).rstrip())
+            left_offset += left_length
+            right_offset += right_length
+        return '\n'.join(lines)
+
+    def summary(self, top: int = 10) -> dict:
+        '''
+        Returns the statistics as plain values, which can be written as JSON.
+        '''
+        return {
+            'tunes': self.tunes,
+            'notes': self.notes,
+            'push_notes': self.push_notes,
+            'pull_notes': self.pull_notes,
+            'push_ratio': self.push_notes / self.notes if self.notes else 0.0,
+            'measures': self.measures,
+            'reversals': self.reversals,
+            'reversals_per_measure':
+                self.reversals / self.measures if self.measures else 0.0,
+            'measures_by_reversals': list(self.reversal_counts),
+            'buttons': {
+                self.describe_fingering(i): value
+                for i, value in enumerate(self.button_counts) if value
+            },
+            'transitions': [
+                {
+                    'from': self.describe_fingering(a),
+                    'to': self.describe_fingering(b),
+                    'count': value
+                }
+                for a, b, value in self.top_transitions(top)
+            ],
+        }
+
+    def format_summary(self, top: int = 10) -> str:
+        '''
+        Returns the statistics as text, with a heatmap for each direction.
+        '''
+        summary = self.summary(top)
+        lines = [
+            f'Tunes: {self.tunes}',
+            f'Notes: {self.notes}',
+            f'Push: {self.push_notes}, pull: {self.pull_notes}, '
+            f'push ratio: {summary["push_ratio"]:.3f}',
+            f'Bellows reversals: {self.reversals} in {self.measures} measures, '
+            f'{summary["reversals_per_measure"]:.3f} per measure',
+        ]
+        for direction in Direction:
+            lines += [f'{direction.name}:', self.format_heatmap(direction)]
+        lines.append('Most common transitions:')
+        lines += [
+            f'{t["count"]:>6}  {t["from"]} -> {t["to"]}'
+            for t in summary['transitions']
+        ]
+        return '\n'.join(lines)
+
+
+def _gather(
+        layout: BisonoricLayout, penalties: list[PenaltyFunction], solver_name: str,
+        paths: list[Path]) -> tuple[RepertoireStatistics, list[str]]:
+    '''
+    Solves each tune, and returns the statistics for all of them,
+    and an error for each tune which could not be solved.
+    '''
+    stats = RepertoireStatistics(layout)
+    errors = []
+    for path in paths:
+        n_l = NotesOnLayout(notes_from_path(path), layout)
+        try:
+            best = n_l.get_best_fingerings(penalties, solver_name)
+        except ValueError as e:
+            errors.append(f'{path}: {e}')
+            continue
+        stats.add_tune(best)
+    return stats, errors
+
+
+def gather_statistics(
+        paths: Iterable[Path], layout: BisonoricLayout,
+        penalties: Iterable[PenaltyFunction], solver_name: str = 'minplus',
+        max_workers: int | None = None, chunk_size: int = 8,
+        executor_factory: Callable[..., Executor] = ProcessPoolExecutor
+) -> tuple[RepertoireStatistics, list[str]]:
+    '''
+    Solves the tunes at `paths` in worker processes, `chunk_size` at a time,
+    and merges the statistics from each chunk: The layout and penalties
+    are sent with each chunk, and only the counters are sent back,
+    never the fingerings. Returns the statistics,
+    and an error for each tune which could not be solved.
+    '''
+    paths = list(paths)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    stats = RepertoireStatistics(layout)
+    errors = []
+    gather = partial(_gather, layout, list(penalties), solver_name)
+    with executor_factory(max_workers=max_workers) as executor:
+        for chunk_stats, chunk_errors in executor.map(gather, chunks):
+            stats.merge(chunk_stats)
+            errors += chunk_errors
+    return stats, errors
+
+
+def _parse_and_summarize() -> None:
+    '''
+    Parses command line arguments, finds fingerings for every tune,
+    and prints or exports the statistics.
+    '''
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='''
+Given many tunes, and a concertina type, finds the best fingerings for each,
+and summarizes them: button usage, push and pull, bellows reversals,
+and the most common transitions.
+''')
+    parser.add_argument(
+        'inputs', type=Path, nargs='+',
+        help='Input files, in any format accepted by concertina-helper')
+    layout_source_group = parser.add_mutually_exclusive_group(required=True)
+    layout_source_group.add_argument(
+        '--layout_path', type=Path, metavar='PATH',
+        help='Path of YAML file with concertina layout')
+    layout_source_group.add_argument(
+        '--layout_name', choices=list_layout_names(),
+        help='Name of concertina layout')
+    parser.add_argument(
+        '--layout_transpose', default=0, type=int, metavar='SEMITONES',
+        help='Semitones to transpose the layout; Negative transposes down')
+    for name in get_penalty_factories():
+        parser.add_argument(
+            f'--{name}_cost', type=float, metavar='N', default=1,
+            help=f'Weight of the {name} penalty')
+    parser.add_argument(
+        '--solver', choices=list_solver_names(), metavar='NAME', default='minplus',
+        help='Backend used to search for the best fingerings')
+    parser.add_argument(
+        '--top', type=int, metavar='N', default=10,
+        help='Number of transitions to list')
+    parser.add_argument(
+        '--json', type=Path, metavar='PATH',
+        help='Write the statistics to this file as JSON, instead of printing them')
+    parser.add_argument(
+        '--workers', type=int, metavar='N',
+        help='Number of worker processes; Defaults to the number of processors')
+    args = parser.parse_args()
+
+    layout = (
+        load_bisonoric_layout_by_path(args.layout_path)
+        if args.layout_path else
+        load_bisonoric_layout_by_name(args.layout_name)
+    ).transpose(args.layout_transpose)
+    penalties = [
+        factory(getattr(args, f'{name}_cost'))
+        for name, factory in get_penalty_factories().items()
+    ]
+    stats, errors = gather_statistics(
+        args.inputs, layout, penalties, args.solver, args.workers)
+    for error in errors:
+        print(error, file=sys.stderr)
+    if args.json:
+        args.json.write_text(json.dumps(stats.summary(args.top), indent=2))
+    else:
+        print(stats.format_summary(args.top))
@@ -0,0 +1,139 @@
+'''
+Generates layouts and tunes of any size, to measure how solve time and memory
+grow with the number of buttons, the number of alternate buttons for a pitch,
+and the length of a tune. Everything is seeded, so runs can be compared.
+
+>>> layout = synthetic_bisonoric_layout(rows=4, buttons_per_row=6)
+>>> layout.shape
+([6, 6, 6, 6], [6, 6, 6, 6])
+>>> print(layout.push_layout)
+A3  C#4 E4  A4  C#5 E5      A5  C#6 E6  A6  C#7 E7
+D3  F#3 A3  D4  F#4 A4      D5  F#5 A5  D6  F#6 A6
+G3  B3  D4  G4  B4  D5      G5  B5  D6  G6  B6  D7
+C3  E3  G3  C4  E4  G4      C5  E5  G5  C6  E6  G6
+>>> tune = scale_tune(16, tonic=60)
+>>> [note.pitch.name for note in tune][:9]
+['C4', 'D4', 'E4', 'F4', 'G4', 'A4', 'B4', 'C5', 'D5']
+'''
+from __future__ import annotations
+from array import array
+from random import Random
+
+from .layouts.base_classes import Layout
+from .layouts.bisonoric import BisonoricLayout
+from .layouts.layout_loader import _names_to_pitches
+from .layouts.unisonoric import UnisonoricLayout
+from .note_sequence import NoteSequence
+from .type_defs import Pitch
+
+
+_PUSH_ARPEGGIO = (0, 4, 7)
+_PULL_ARPEGGIO = (2, 5, 9)
+'''
+Like the rows of an Anglo, each row plays the notes of a major chord on the push,
+and the scale steps between them on the pull.
+'''
+_MAJOR_SCALE = (0, 2, 4, 5, 7, 9, 11)
+
+
+def _row_midi_numbers(
+        key: int, length: int, arpeggio: tuple[int, ...]) -> list[int]:
+    return [
+        key + arpeggio[i % len(arpeggio)] + 12 * (i // len(arpeggio))
+        for i in range(length)
+    ]
+
+
+def _unisonoric_layout(
+        rows: list[list[int]], buttons_per_row: int) -> UnisonoricLayout:
+    def names(side: slice) -> list[list[str]]:
+        return [
+            [Pitch.from_midi_number(m).name for m in row[side]]
+            for row in rows
+        ]
+    return UnisonoricLayout(
+        _names_to_pitches(names(slice(None, buttons_per_row))),
+        _names_to_pitches(names(slice(buttons_per_row, None))))
+
+
+def synthetic_bisonoric_layout(
+        rows: int = 3, buttons_per_row: int = 5, duplicates: int = 0,
+        lowest: int = 48, seed: int = 0) -> BisonoricLayout:
+    '''
+    Returns a layout with `rows` rows of `buttons_per_row` buttons on each side.
+    The bottom row starts from MIDI number `lowest`, and each row above it
+    is in the key a fifth higher, within the octave. Each row continues
+    from the left to the right side. On the push, each row plays
+    a major arpeggio, and on the pull, the scale step above each push note.
+
+    `duplicates` buttons, chosen at random, are then given the push and pull
+    pitches of another button, so pitches have more alternate fingerings.
+
+    >>> layout = synthetic_bisonoric_layout(rows=1, buttons_per_row=2, duplicates=1)
+    >>> print(layout)
+    PUSH:
+    C3  E3      G3  E3
+    PULL:
+    D3  F3      A3  F3
+    '''
+    if rows < 1 or buttons_per_row < 1:
+        raise ValueError('rows and buttons_per_row must be at least 1')
+    keys = [lowest + 7 * row % 12 for row in reversed(range(rows))]
+    push = [_row_midi_numbers(key, 2 * buttons_per_row, _PUSH_ARPEGGIO) for key in keys]
+    pull = [_row_midi_numbers(key, 2 * buttons_per_row, _PULL_ARPEGGIO) for key in keys]
+    rng = Random(seed)
+    buttons = [(row, i) for row in range(rows) for i in range(2 * buttons_per_row)]
+    for _ in range(duplicates):
+        (to_row, to_i), (from_row, from_i) = rng.sample(buttons, 2)
+        push[to_row][to_i] = push[from_row][from_i]
+        pull[to_row][to_i] = pull[from_row][from_i]
+    return BisonoricLayout(
+        push_layout=_unisonoric_layout(push, buttons_per_row),
+        pull_layout=_unisonoric_layout(pull, buttons_per_row))
+
+
+def _measures(length: int, notes_per_measure: int) -> array:
+    if notes_per_measure < 1:
+        raise ValueError('notes_per_measure must be at least 1')
+    return array('i', (i // notes_per_measure + 1 for i in range(length)))
+
+
+def random_tune(
+        layout: Layout, length: int,
+        notes_per_measure: int = 8, seed: int = 0) -> NoteSequence:
+    '''
+    Returns `length` notes chosen at random from those playable on the layout.
+
+    >>> layout = synthetic_bisonoric_layout()
+    >>> tune = random_tune(layout, 10000)
+    >>> len(tune), tune.measures[-1]
+    (10000, 1250)
+    '''
+    midi_numbers = [
+        m for m in range(layout.playable_bits.bit_length())
+        if layout.playable_bits >> m & 1
+    ]
+    rng = Random(seed)
+    return NoteSequence(
+        array('h', (rng.choice(midi_numbers) for _ in range(length))),
+        _measures(length, notes_per_measure))
+
+
+def scale_tune(
+        length: int, tonic: int = 60, octaves: int = 2,
+        notes_per_measure: int = 8) -> NoteSequence:
+    '''
+    Returns `length` notes running up and down the major scale of `tonic`,
+    over `octaves` octaves. Check the range is playable on the layout
+    with `concertina_helper.playability.find_unplayable_notes`.
+    '''
+    if octaves < 1:
+        raise ValueError('octaves must be at least 1')
+    up = [
+        tonic + 12 * octave + step
+        for octave in range(octaves) for step in _MAJOR_SCALE
+    ]
+    cycle = up + [tonic + 12 * octaves] + up[:0:-1]
+    return NoteSequence(
+        array('h', (cycle[i % len(cycle)] for i in range(length))),
+        _measures(length, notes_per_measure))
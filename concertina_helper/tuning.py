@@ -0,0 +1,394 @@
+'''
+Fits the weights of the penalty functions to tunes fingered by expert players.
+
+Reference fingerings are text files, with one note per line:
+the measure, the pitch, the bellows direction, and the button,
+as `L` or `R`, then the row and column, counting from 1 at the top left of each side.
+Blank lines, and comments starting with `#` after whitespace, are ignored:
+```
+# Measure 1
+1 G4 PULL L1.4
+1 A4 PULL L3.3
+```
+
+Each reference tune is turned into a
+`concertina_helper.solvers.parametric.ParametricLattice` once,
+and then weight vectors are evaluated in parallel by re-solving those lattices,
+and counting the notes where the result agrees with the reference.
+'''
+from __future__ import annotations
+import argparse
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from random import Random
+from types import TracebackType
+import re
+
+from .layouts.bisonoric import (
+    BisonoricLayout, AnnotatedBisonoricFingering, BisonoricFingering)
+from .layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_path, load_bisonoric_layout_by_name)
+from .penalties import PenaltyFactory, get_penalty_factories
+from .solvers.parametric import ParametricLattice, raw_features
+from .type_defs import Annotation, Direction, Pitch
+
+
+Weights = dict[str, float]
+
+
+def _find_fingering(
+        layout: BisonoricLayout, pitch: Pitch, direction: Direction,
+        side: str, row: int, column: int) -> BisonoricFingering:
+    for fingering in layout.get_fingerings(pitch):
+        mask = fingering.left_mask if side == 'L' else fingering.right_mask
+        if (
+            fingering.direction == direction
+            and row < len(mask.bool_matrix)
+            and column < len(mask[row])
+            and mask[row][column]
+        ):
+            return fingering
+    raise ValueError(
+        f'{pitch} is not on the {direction.name} '
+        f'at {side}{row + 1}.{column + 1}')
+
+
+def parse_reference_fingerings(
+        lines: Iterable[str],
+        layout: BisonoricLayout) -> list[AnnotatedBisonoricFingering]:
+    '''
+    Parses reference fingerings in the format described above.
+
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> [f] = parse_reference_fingerings(['1 G4 PULL L1.4  # comment'], layout)
+    >>> print(f)
+    Measure 1 - G4
+    PULL:
+    --- --- --- G4  ---    --- --- --- --- ---
+    --- --- --- --- ---    --- --- --- --- ---
+    --- --- --- --- ---    --- --- --- --- ---
+    '''
+    fingerings = []
+    for line_number, line in enumerate(lines, start=1):
+        line = re.sub(r'(^|\s)#.*', '', line).strip()
+        if not line:
+            continue
+        match = re.fullmatch(
+            r'(\d+)\s+(\S+)\s+(PUSH|PULL)\s+([LR])(\d+)\.(\d+)', line)
+        if not match:
+            raise ValueError(f'Invalid reference fingering on line {line_number}')
+        measure, name, direction, side, row, column = match.groups()
+        pitch = Pitch(name)
+        fingerings.append(AnnotatedBisonoricFingering(
+            fingering=_find_fingering(
+                layout, pitch, Direction[direction],
+                side, int(row) - 1, int(column) - 1),
+            annotation=Annotation(pitch=pitch, measure=int(measure))))
+    return fingerings
+
+
+def format_reference_fingerings(
+        fingerings: Iterable[AnnotatedBisonoricFingering]) -> list[str]:
+    '''
+    The inverse of `parse_reference_fingerings`, for single-button fingerings:
+    Useful for starting a reference file from the output of the solver.
+
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> format_reference_fingerings(
+    ...     parse_reference_fingerings(['1 G4 PULL L1.4'], layout))
+    ['1 G4 PULL L1.4']
+    '''
+    lines = []
+    for f in fingerings:
+        [(side, row, column)] = [
+            (side, row, column)
+            for side, mask in [
+                ('L', f.fingering.left_mask), ('R', f.fingering.right_mask)]
+            for row, mask_row in enumerate(mask)
+            for column, button in enumerate(mask_row)
+            if button
+        ]
+        a = f.annotation
+        lines.append(
+            f'{a.measure} {a.pitch} {f.fingering.direction.name} '
+            f'{side}{row + 1}.{column + 1}')
+    return lines
+
+
+@dataclass(frozen=True)
+class _ReferenceTune:
+    lattice: ParametricLattice
+    reference_indexes: tuple[int, ...]
+
+
+def _prepare_reference_tune(
+        fingerings: Sequence[AnnotatedBisonoricFingering],
+        layout: BisonoricLayout,
+        factories: Mapping[str, PenaltyFactory]) -> _ReferenceTune:
+    lattice = ParametricLattice.from_fingerings(
+        [
+            {
+                AnnotatedBisonoricFingering(fingering=f, annotation=a.annotation)
+                for f in layout.get_fingerings(a.annotation.pitch)
+            }
+            for a in fingerings
+        ],
+        raw_features(factories))
+    reference_indexes = tuple(
+        [f.fingering for f in layer].index(a.fingering)
+        for layer, a in zip(lattice.layers, fingerings)
+    )
+    return _ReferenceTune(lattice, reference_indexes)
+
+
+@dataclass(frozen=True)
+class _Agreement:
+    '''
+    Scores weight vectors against one tuner's reference tunes.
+    It is bound to each task, so tuners sharing a process do not interfere.
+    '''
+    tunes: Sequence[_ReferenceTune]
+    solver_name: str
+
+    def __call__(self, weights: Weights) -> float:
+        agreed = 0
+        total = 0
+        for tune in self.tunes:
+            solution = tune.lattice.solve(weights, self.solver_name)
+            agreed += sum(
+                actual == expected
+                for actual, expected
+                in zip(solution.indexes, tune.reference_indexes))
+            total += len(tune.reference_indexes)
+        return agreed / total if total else 0.0
+
+
+_worker_agreement: _Agreement | None = None
+
+
+def _init_worker(agreement: _Agreement) -> None:
+    '''
+    Runs once in each worker process, so the lattices are only sent once,
+    rather than with every weight vector. A process pool belongs to one tuner,
+    so the global is never shared.
+    '''
+    global _worker_agreement
+    _worker_agreement = agreement
+
+
+def _agreement_in_worker(weights: Weights) -> float:
+    assert _worker_agreement is not None
+    return _worker_agreement(weights)
+
+
+@dataclass(frozen=True)
+class TuningResult:
+    '''
+    The fraction of reference notes where the best fingering
+    for these weights agrees with the reference.
+    '''
+    weights: Weights
+    agreement: float
+
+
+class WeightTuner:
+    '''
+    Evaluates penalty weights against reference tunes, in a pool of workers.
+    In a `concurrent.futures.ProcessPoolExecutor`, the reference lattices
+    are sent to each worker once; Other executors share them with each task.
+    Use it as a context manager, so the pool is shut down:
+
+    Here, the reference is itself the output of the solver, for known weights:
+
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> from concertina_helper.notes_on_layout import NotesOnLayout
+    >>> from concertina_helper.note_generators import notes_from_pitches
+    >>> from concertina_helper.penalties import (
+    ...     penalize_bellows_change, penalize_outer_fingers)
+    >>> layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    >>> n_l = NotesOnLayout(notes_from_pitches(
+    ...     ['G4', 'A4', 'B4', 'C5', 'D5', 'E5', 'F#5', 'G5']), layout)
+    >>> reference = n_l.get_best_fingerings(
+    ...     [penalize_bellows_change(5), penalize_outer_fingers(1)], 'minplus')
+    >>> with WeightTuner(
+    ...         [reference], layout, executor_factory=ThreadPoolExecutor) as tuner:
+    ...     results = tuner.grid_search(
+    ...         {'bellows_change': [0, 5], 'outer_fingers': [0, 1]})
+    >>> for result in results:
+    ...     print(result)
+    TuningResult(weights={'bellows_change': 0, 'outer_fingers': 0}, agreement=0.125)
+    TuningResult(weights={'bellows_change': 0, 'outer_fingers': 1}, agreement=0.5)
+    TuningResult(weights={'bellows_change': 5, 'outer_fingers': 0}, agreement=1.0)
+    TuningResult(weights={'bellows_change': 5, 'outer_fingers': 1}, agreement=1.0)
+    >>> best(results)
+    TuningResult(weights={'bellows_change': 5, 'outer_fingers': 0}, agreement=1.0)
+    '''
+    def __init__(
+            self,
+            references: Iterable[Sequence[AnnotatedBisonoricFingering]],
+            layout: BisonoricLayout,
+            factories: Mapping[str, PenaltyFactory] | None = None,
+            max_workers: int | None = None,
+            executor_factory: Callable[..., Executor] = ProcessPoolExecutor,
+            solver_name: str = 'minplus'):
+        self.factories = dict(
+            get_penalty_factories() if factories is None else factories)
+        tunes = [
+            _prepare_reference_tune(fingerings, layout, self.factories)
+            for fingerings in references
+        ]
+        agreement = _Agreement(tunes, solver_name)
+        self._agreement: Callable[[Weights], float]
+        in_processes = isinstance(executor_factory, type) \
+            and issubclass(executor_factory, ProcessPoolExecutor)
+        if in_processes:
+            self.executor = executor_factory(
+                max_workers=max_workers,
+                initializer=_init_worker, initargs=(agreement,))
+            self._agreement = _agreement_in_worker
+        else:
+            self.executor = executor_factory(max_workers=max_workers)
+            self._agreement = agreement
+
+    def __enter__(self) -> WeightTuner:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None) -> None:
+        self.executor.shutdown()
+
+    def evaluate(self, weight_vectors: Iterable[Weights]) -> list[TuningResult]:
+        '''
+        Returns the agreement for each weight vector, in order.
+        '''
+        weight_vectors = list(weight_vectors)
+        return [
+            TuningResult(weights, agreement)
+            for weights, agreement
+            in zip(weight_vectors, self.executor.map(self._agreement, weight_vectors))
+        ]
+
+    def grid_search(self, values: Mapping[str, Sequence[float]]) -> list[TuningResult]:
+        '''
+        Evaluates every combination of the given values for each penalty.
+        '''
+        names = list(values)
+        return self.evaluate(
+            dict(zip(names, combination))
+            for combination in product(*(values[name] for name in names)))
+
+    def random_search(
+            self,
+            ranges: Mapping[str, tuple[float, float]],
+            samples: int,
+            seed: int | None = None) -> list[TuningResult]:
+        '''
+        Evaluates `samples` weight vectors, drawn uniformly from the given ranges.
+        '''
+        rng = Random(seed)
+        return self.evaluate(
+            {name: rng.uniform(low, high) for name, (low, high) in ranges.items()}
+            for _ in range(samples))
+
+    def coordinate_descent(
+            self,
+            initial: Weights,
+            values: Sequence[float],
+            rounds: int = 3) -> list[TuningResult]:
+        '''
+        Starting from `initial`, tries each of the `values` for one penalty at a time,
+        keeping the best, until a round makes no improvement.
+        Returns every result evaluated along the way.
+        '''
+        current = best(self.evaluate([initial]))
+        results = [current]
+        for _ in range(rounds):
+            improved = False
+            for name in self.factories:
+                candidates = self.evaluate(
+                    {**current.weights, name: value} for value in values)
+                results.extend(candidates)
+                candidate = best(candidates)
+                if candidate.agreement > current.agreement:
+                    current = candidate
+                    improved = True
+            if not improved:
+                break
+        return results
+
+
+def best(results: Iterable[TuningResult]) -> TuningResult:
+    '''
+    Returns the result with the highest agreement; Ties go to the earliest.
+    '''
+    return max(results, key=lambda result: result.agreement)
+
+
+def _parse_and_tune() -> None:
+    '''
+    Parses command line arguments, runs a search, and prints the results.
+    '''
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='''
+Given tunes fingered by expert players, and a concertina type,
+searches for the penalty weights that best reproduce those fingerings.
+''')
+    parser.add_argument(
+        'references', type=Path, nargs='+',
+        help='Reference fingering files: See concertina_helper.tuning for the format.')
+    layout_source_group = parser.add_mutually_exclusive_group(required=True)
+    layout_source_group.add_argument(
+        '--layout_path', type=Path, metavar='PATH',
+        help='Path of YAML file with concertina layout')
+    layout_source_group.add_argument(
+        '--layout_name', choices=list_layout_names(),
+        help='Name of concertina layout')
+    parser.add_argument(
+        '--search', choices=['grid', 'random', 'coordinate'], default='coordinate',
+        help='Search strategy')
+    parser.add_argument(
+        '--values', type=float, nargs='+', metavar='N', default=[0, 0.5, 1, 2, 5, 10],
+        help='Values to try for each weight, for grid and coordinate searches')
+    parser.add_argument(
+        '--samples', type=int, metavar='N', default=100,
+        help='Number of weight vectors to try, for random search')
+    parser.add_argument(
+        '--workers', type=int, metavar='N',
+        help='Number of worker processes; Defaults to the number of processors')
+    args = parser.parse_args()
+
+    layout = (
+        load_bisonoric_layout_by_path(args.layout_path)
+        if args.layout_path else
+        load_bisonoric_layout_by_name(args.layout_name)
+    )
+    references = [
+        parse_reference_fingerings(path.read_text().split('\n'), layout)
+        for path in args.references
+    ]
+    names = list(get_penalty_factories())
+    with WeightTuner(references, layout, max_workers=args.workers) as tuner:
+        if args.search == 'grid':
+            results = tuner.grid_search({name: args.values for name in names})
+        elif args.search == 'random':
+            results = tuner.random_search(
+                {name: (min(args.values), max(args.values)) for name in names},
+                args.samples)
+        else:
+            results = tuner.coordinate_descent(
+                {name: 1.0 for name in names}, args.values)
+    for result in results:
+        weights = ' '.join(
+            f'--{name}_cost {weight:g}' for name, weight in result.weights.items())
+        print(f'{result.agreement:.3f}  {weights}')
+    result = best(results)
+    print(f'Best agreement: {result.agreement:.3f}')
+    print('Best weights: ' + ' '.join(
+        f'--{name}_cost {weight:g}' for name, weight in result.weights.items()))
@@ -1,29 +1,54 @@
 from __future__ import annotations
 from collections.abc import Callable, Iterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum, auto
+from functools import cached_property
 from typing import Any, Iterable
 
 from pyabc2 import Pitch as AbcPitch
 
 
+_MIDI_OFFSET = 12
+'''
+pyabc2 counts semitones from C0, but MIDI numbers count from the C an octave lower.
+'''
+
+
 @dataclass(frozen=True)
 class Pitch:
     '''
     Immutable class representing a musical pitch.
+    The name is parsed when it is first needed, and the result is cached.
+    Pitches can be shared between threads: If two parse it at once,
+    they cache equal values.
     '''
     name: str
 
-    # TODO: post_init validation: fail if name != normalized name
-
-    @property
+    @cached_property
     def _pitch(self) -> AbcPitch:
+        # Parsing the name is slow, and pitches are compared often.
         return AbcPitch.from_name(self.name)
 
     @property
     def class_name(self) -> str:
         return self._pitch.class_name
 
+    @property
+    def midi_number(self) -> int:
+        '''
+        >>> Pitch('C4').midi_number
+        60
+        '''
+        return self._pitch.value + _MIDI_OFFSET
+
+    @staticmethod
+    def from_midi_number(midi_number: int) -> Pitch:
+        '''
+        >>> Pitch.from_midi_number(61)
+        Pitch(name='C#4')
+        '''
+        return Pitch(AbcPitch(midi_number - _MIDI_OFFSET).name)
+
     def transpose(self, semitones: int) -> Pitch:
         return Pitch(AbcPitch(self._pitch.value + semitones).name)
 
@@ -67,15 +92,42 @@ class Mask:
     '''
     A boolean matix. `True` represents a key held down.
 
-    >>> Mask(((True, False),)) | Mask(((False, True),))
+    >>> mask = Mask(((True, False),)) | Mask(((False, True),))
+    >>> mask
     Mask(bool_matrix=((True, True),))
+
+    The buttons are also packed into an integer, row by row, lowest bit first,
+    which is a cheaper key than the nested tuples:
+    >>> bin(Mask(((True, False), (False, True))).bits)
+    '0b1001'
     '''
     bool_matrix: tuple[tuple[bool, ...], ...]
+    bits: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        bits = 0
+        for i, button in enumerate(
+                button for row in self.bool_matrix for button in row):
+            if button:
+                bits |= 1 << i
+        object.__setattr__(self, 'bits', bits)
 
     @property
     def shape(self) -> Iterable[int]:
         return [len(row) for row in self.bool_matrix]
 
+    def buttons(self) -> Iterator[int]:
+        '''
+        Yields the index of each button held down, in the order of `bits`:
+        >>> list(Mask(((True, False), (False, True))).buttons())
+        [0, 3]
+        '''
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
     def __getitem__(self, i: int) -> tuple[bool, ...]:
         return self.bool_matrix[i]
 
@@ -0,0 +1,56 @@
+from dataclasses import FrozenInstanceError
+from pathlib import Path
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.batch import BatchSolver
+from concertina_helper.layout_tables import compile_layout_tables
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune, notes_from_pitches
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.synthetic import random_tune
+
+
+tests_dir = Path(__file__).parent
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+# Compiled tables only hold penalties which depend on the fingerings alone.
+penalties = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1)]
+tables = compile_layout_tables(layout, penalties)
+
+
+@pytest.mark.parametrize('solver_name', ['astar', 'minplus', 'lowmem'])
+def test_matches_serial(solver_name):
+    tunes = [
+        list(notes_from_tune(Tune((tests_dir / name).read_text())))
+        for name in ['amelia-no-chords.abc', 'g-major.abc']
+    ] + [list(random_tune(layout, 100, seed=seed)) for seed in range(8)]
+    with BatchSolver(tables, solver_name, max_workers=4) as batch:
+        results = list(batch.solve(tunes))
+    assert results == [
+        list(NotesOnLayout(notes, layout).get_best_fingerings(penalties, solver_name))
+        for notes in tunes
+    ]
+
+
+def test_unplayable():
+    tunes = [notes_from_pitches(['G4']), notes_from_pitches(['C#3'])]
+    with BatchSolver(tables) as batch:
+        results = batch.solve(tunes)
+        assert len(next(results)) == 1
+        with pytest.raises(ValueError, match=r'No fingerings for C#3 in measure 1'):
+            next(results)
+
+
+def test_shared_objects_are_immutable():
+    with pytest.raises(TypeError):
+        tables.costs[0] = 0.0  # type: ignore
+    with pytest.raises(FrozenInstanceError):
+        tables.layout.push_layout = layout.pull_layout  # type: ignore
+    fingering = tables.fingerings[0]
+    with pytest.raises(FrozenInstanceError):
+        fingering.direction = fingering.direction  # type: ignore
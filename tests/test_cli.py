@@ -1,3 +1,4 @@
+from functools import partial
 from pathlib import Path
 from unittest.mock import patch
 
@@ -5,8 +6,12 @@ import pytest
 
 from concertina_helper.cli import (_parse_and_print_fingerings, print_fingerings)
 from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
-from concertina_helper.penalties import penalize_bellows_change
-from concertina_helper.note_generators import notes_from_pitches
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column)
+from concertina_helper.solvers.anytime import AnytimeSolver
+from concertina_helper.solvers.registry import _solver_factories
+from concertina_helper.note_generators import (
+    notes_from_pitches, convert_pitches_to_binary)
 
 
 def test_cli_help(capsys):  # pragma: no cover
@@ -73,15 +78,15 @@ def test_cli_compact_render(capsys):
     assert '➃ ➅ ➇ . .' in captured
 
 
-def test_cli_compact_render_too_long_error():
+def test_cli_compact_render_long(capsys):
     with patch('argparse._sys.argv',
                ['concertina-helper', str(Path(__file__).parent / 'amelia-chords.abc'),
                 '--layout_name', '30_wheatstone_cg',
                 '--output_format', 'COMPACT']):
-        with pytest.raises(
-                ValueError,
-                match=r'Length of fingerings \(393\) greater than allowed \(20\)'):
-            _parse_and_print_fingerings()
+        _parse_and_print_fingerings()
+    captured = capsys.readouterr().out
+    assert captured.startswith('Measures 1-')
+    assert 'Measures 45-' in captured
 
 
 def test_cli_compact_render_show_all_error():
@@ -120,6 +125,19 @@ def test_render_with_penalty(capsys):
     assert 'No fingerings' not in captured
 
 
+def test_render_not_proven_optimal(capsys):
+    with patch.dict(_solver_factories, greedy=partial(AnytimeSolver, node_budget=0)):
+        print_fingerings(
+            notes_from_pitches(['A4', 'B4', 'C5']),
+            load_bisonoric_layout_by_name('30_wheatstone_cg'),
+            penalty_functions=[
+                penalize_bellows_change(10), penalize_finger_in_same_column(3)],
+            solver_name='greedy')
+    captured = capsys.readouterr()
+    assert 'Measure 1 - A4\n' in captured.out
+    assert 'Their cost may be up to 3 more than the best.' in captured.err
+
+
 def test_render_with_penalty_out_of_range():
     with pytest.raises(ValueError, match=r'No fingerings for G4 in measure 1'):
         print_fingerings(
@@ -146,3 +164,15 @@ def test_render_without_penalty_out_of_range(capsys):
     assert 'Measure 1 - G4\n' in captured
     assert '.....' in captured
     assert 'No fingerings' in captured
+
+
+def test_cli_binary_input(capsys, tmp_path):
+    binary_path = tmp_path / 'g-major.bin'
+    convert_pitches_to_binary(Path(__file__).parent / 'g-major.txt', binary_path)
+    with patch('argparse._sys.argv',
+               ['concertina-helper', str(binary_path),
+                '--layout_name', '30_wheatstone_cg']):
+        _parse_and_print_fingerings()
+    captured = capsys.readouterr().out
+    assert 'Measure 1 - G4' in captured
+    assert 'Measure 1 - F#5' in captured
@@ -0,0 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pyabc2 import Tune
+
+from concertina_helper.cli import _parse_and_print_fingerings
+from concertina_helper.constraints import (
+    Constraint, apply_constraints, parse_constraints, load_constraints_by_path)
+from concertina_helper.finger_finder import find_best_fingerings
+from concertina_helper.layouts.layout_loader import (
+    load_bisonoric_layout_by_name, load_unisonoric_layout_by_path)
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches, notes_from_tune
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.result_cache import FingeringCache, make_cache_key
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.stateful_penalties import penalize_long_bellows_run
+from concertina_helper.type_defs import Direction
+
+
+tests_dir = Path(__file__).parent
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+notes = list(notes_from_tune(Tune((tests_dir / 'amelia-no-chords.abc').read_text())))
+penalties = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1)]
+
+
+def f_sets(constraints=()):
+    return [
+        f_set for _, f_set in NotesOnLayout(notes, layout, constraints)
+        .get_all_fingerings()]
+
+
+def cost(fingerings):
+    fingerings = list(fingerings)
+    return Lattice.from_fingerings([{f} for f in fingerings], penalties).path_cost(
+        [0] * len(fingerings))
+
+
+def test_allows():
+    [g4_pull] = [
+        f for f in f_sets()[0] if f.fingering.direction == Direction.PULL]
+    # G4 on the pull is on the left, in the first row and fourth column.
+    assert Constraint(0, 1).allows(g4_pull)
+    assert Constraint(0, 1, Direction.PULL, 'L', 0, 3).allows(g4_pull)
+    assert Constraint(0, 1, row=0).allows(g4_pull)
+    assert not Constraint(0, 1, Direction.PUSH).allows(g4_pull)
+    assert not Constraint(0, 1, side='R').allows(g4_pull)
+    assert not Constraint(0, 1, side='L', column=2).allows(g4_pull)
+
+    english = load_unisonoric_layout_by_path(tests_dir / 'english-24.yaml')
+    [c4] = NotesOnLayout(notes_from_pitches(['C4']), english).get_all_fingerings()[0][1]
+    assert Constraint(0, 1, side='L').allows(c4)
+    assert not Constraint(0, 1, Direction.PUSH).allows(c4)
+
+
+def test_invalid_constraint():
+    with pytest.raises(ValueError, match='start must be at least 0'):
+        Constraint(1, 1)
+
+
+def test_parse_constraints(tmp_path):
+    path = tmp_path / 'constraints.txt'
+    path.write_text('\n# comment\nm2-3 PUSH\n5 R\n7-8 L2.3\n')
+    constraints = load_constraints_by_path(path, notes)
+    measure_2 = [i for i, note in enumerate(notes) if note.measure in (2, 3)]
+    assert constraints == [
+        Constraint(measure_2[0], measure_2[-1] + 1, Direction.PUSH),
+        Constraint(4, 5, side='R'),
+        Constraint(6, 8, side='L', row=1, column=2),
+    ]
+
+
+@pytest.mark.parametrize('line, message', [
+    ('1', 'Invalid constraint on line 1'),
+    ('1 L2 PUSH', 'Invalid constraint on line 1'),
+    ('m1000 PUSH', 'No notes in measures on line 1'),
+])
+def test_parse_constraints_invalid(line, message):
+    with pytest.raises(ValueError, match=message):
+        parse_constraints([line], notes)
+
+
+def test_apply_constraints():
+    constraints = [Constraint(12, 22, side='L')]
+    constrained = apply_constraints(f_sets(), constraints)
+    assert all(
+        f.fingering.left_mask.bits
+        for f_set in constrained[12:22] for f in f_set)
+    assert constrained[12] < f_sets()[12]
+    assert constrained[22:] == f_sets()[22:]
+    assert f_sets(constraints) == constrained
+
+
+def test_apply_constraints_invalid():
+    with pytest.raises(ValueError, match='past the end of the tune'):
+        apply_constraints(f_sets(), [Constraint(0, len(notes) + 1)])
+    # G4 is not on the right of this layout.
+    g4 = NotesOnLayout(
+        list(notes_from_pitches(['G4'])), layout, [Constraint(0, 1, side='R')])
+    with pytest.raises(ValueError, match='No fingerings for G4 in measure 1 match'):
+        g4.get_best_fingerings(penalties)
+
+
+@pytest.mark.parametrize('solver_name', ['astar', 'dp', 'minplus'])
+def test_pinned_to_best_is_unchanged(solver_name):
+    best = list(find_best_fingerings(f_sets(), penalties, solver_name))
+    # Pin every third note to the best button:
+    pinned = [
+        Constraint(
+            i, i + 1, f.fingering.direction, side, row, column)
+        for i, f in enumerate(best) if i % 3 == 0
+        for side, mask in [('L', f.fingering.left_mask), ('R', f.fingering.right_mask)]
+        for row, mask_row in enumerate(mask)
+        for column, button in enumerate(mask_row) if button
+    ]
+    constrained = list(find_best_fingerings(
+        f_sets(), penalties, solver_name, pinned))
+    assert len(constrained) == len(best)
+    assert cost(constrained) == pytest.approx(cost(best))
+
+
+@pytest.mark.parametrize(
+    'executor_factory', [None, ThreadPoolExecutor, ProcessPoolExecutor])
+def test_split_matches_whole(executor_factory):
+    constraints = [
+        Constraint(12, 13, Direction.PULL), Constraint(16, 22, side='L'),
+        Constraint(49, 51, Direction.PUSH), Constraint(55, 59, Direction.PULL)]
+    constrained = apply_constraints(f_sets(), constraints)
+    assert sum(len(f_set) == 1 for f_set in constrained) > 3
+    whole = list(find_best_fingerings(constrained, penalties, 'minplus'))
+    if executor_factory is None:
+        split = find_best_fingerings(f_sets(), penalties, 'minplus', constraints)
+    else:
+        with executor_factory(max_workers=2) as executor:
+            split = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+                penalties, 'minplus', executor=executor)
+    split = list(split)
+    assert [f.annotation for f in split] == [f.annotation for f in whole]
+    assert cost(split) == pytest.approx(cost(whole))
+    for f_set, f in zip(constrained, split):
+        assert f in f_set
+
+
+def test_short_tunes():
+    assert find_best_fingerings([], penalties, constraints=[]) == []
+    one = f_sets()[:1]
+    [best] = find_best_fingerings(one, penalties, constraints=[Constraint(0, 1)])
+    assert best in one[0]
+
+
+def test_stateful():
+    constraints = [Constraint(55, 59, Direction.PUSH)]
+    best = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+        [*penalties, penalize_long_bellows_run(5, 6)])
+    assert [f.fingering.direction for f in best][55:59] == [Direction.PUSH] * 4
+
+
+def test_cache():
+    constraints = [Constraint(55, 59, Direction.PUSH)]
+    assert make_cache_key(layout, notes, penalties) != \
+        make_cache_key(layout, notes, penalties, constraints=constraints)
+    cache = FingeringCache()
+    unconstrained = NotesOnLayout(notes, layout).get_best_fingerings(
+        penalties, cache=cache)
+    constrained = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+        penalties, cache=cache)
+    assert cache.stats.misses == 2
+    assert [f.fingering.direction for f in constrained][55:59] == [Direction.PUSH] * 4
+    assert unconstrained != constrained
+
+
+def test_cache_passes_executor():
+    constraints = [Constraint(12, 13, Direction.PULL), Constraint(49, 51)]
+    with ThreadPoolExecutor(max_workers=2) as executor, \
+            patch.object(executor, 'map', wraps=executor.map) as map_:
+        cached = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+            penalties, 'minplus', cache=FingeringCache(), executor=executor)
+    map_.assert_called_once()
+    assert cached == NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+        penalties, 'minplus')
+
+
+def test_cli(capsys, tmp_path):
+    path = tmp_path / 'constraints.txt'
+    path.write_text('1 PUSH  # G4 is on the pull by default\n')
+    with patch('argparse._sys.argv',
+               ['concertina-helper', str(tests_dir / 'g-major.txt'),
+                '--layout_name', '30_wheatstone_cg',
+                '--constraints_path', str(path)]):
+        _parse_and_print_fingerings()
+    captured = capsys.readouterr().out
+    assert captured.split('Measure 1 - ')[1].startswith('G4\nPUSH')
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import pytest
+
+from concertina_helper.geometry import (
+    ButtonGeometry, load_geometry_by_path, parse_geometry,
+    penalize_finger_travel, penalize_row_jump, penalize_chord_stretch)
+from concertina_helper.layouts.layout_loader import (
+    load_bisonoric_layout_by_name, load_bisonoric_layout_by_path,
+    load_unisonoric_layout_by_path)
+from concertina_helper.layouts.bisonoric import AnnotatedBisonoricFingering
+from concertina_helper.layouts.unisonoric import AnnotatedUnisonoricFingering
+from concertina_helper.penalties import describe_penalty
+from concertina_helper.type_defs import Annotation, Pitch
+
+
+tests_dir = Path(__file__).parent
+staggered_path = tests_dir / '20-cg-staggered.yaml'
+layout = load_bisonoric_layout_by_path(staggered_path)
+staggered = load_geometry_by_path(staggered_path)
+
+
+def annotated(*names):
+    fingering = None
+    for name in names:
+        push = sorted(
+            (f for f in layout.get_fingerings(Pitch(name))
+             if f.direction.name == 'PUSH'), key=str)[0]
+        fingering = push if fingering is None else fingering | push
+    return AnnotatedBisonoricFingering(
+        fingering=fingering, annotation=Annotation(pitch=Pitch(names[0]), measure=1))
+
+
+def test_load_geometry():
+    assert staggered.left[1][0] == (0.5, 1.0)
+    inferred = load_geometry_by_path(
+        Path('concertina_helper/layouts/30_wheatstone_cg.yaml'))
+    assert inferred == ButtonGeometry.infer(
+        load_bisonoric_layout_by_name('30_wheatstone_cg').shape)
+    english = load_geometry_by_path(tests_dir / 'english-24.yaml')
+    assert english.shape == ([6, 6], [6, 6])
+
+
+def test_load_geometry_mismatch(tmp_path):
+    path = tmp_path / 'layout.yaml'
+    row = '    - 0.5,1 1.5,1 2.5,1 3.5,1 4.5,1\n'
+    path.write_text(staggered_path.read_text().replace(row, '', 1))
+    with pytest.raises(ValueError, match='Geometry shape does not match layout'):
+        load_geometry_by_path(path)
+
+
+def test_finger_travel():
+    # C4 is left row 0 column 2; B4 is left row 1 column 3.
+    c4, b4, c5 = annotated('C4'), annotated('B4'), annotated('C5')
+    assert penalize_finger_travel(2)(c4, b4) == pytest.approx(2 * 2 ** 0.5)
+    assert penalize_finger_travel(2, staggered)(c4, b4) == \
+        pytest.approx(2 * (1.5 ** 2 + 1) ** 0.5)
+    # Different hands:
+    assert penalize_finger_travel(2)(c4, c5) == 0
+
+
+def test_row_jump():
+    c4, b4, e4 = annotated('C4'), annotated('B4'), annotated('E4')
+    assert penalize_row_jump(3)(c4, b4) == 3
+    assert penalize_row_jump(3, staggered)(c4, e4) == 0
+
+
+def test_chord_stretch():
+    chord = annotated('C3', 'G4')
+    assert len(chord.fingering.get_pitches()) == 2
+    # C3 is left row 0 column 0; G4 is left row 1 column 2.
+    assert penalize_chord_stretch(1)(chord, chord) == pytest.approx(5 ** 0.5)
+    assert penalize_chord_stretch(1, staggered)(chord, chord) == \
+        pytest.approx((2.5 ** 2 + 1) ** 0.5)
+    assert penalize_chord_stretch(1)(chord, annotated('C4')) == 0
+    # Travel is from the nearest button of the chord:
+    assert penalize_finger_travel(1)(chord, annotated('E4')) == \
+        pytest.approx(2 ** 0.5)
+
+
+def test_unisonoric():
+    english = load_unisonoric_layout_by_path(tests_dir / 'english-24.yaml')
+
+    def u_annotated(name):
+        f = sorted(english.get_fingerings(Pitch(name)), key=str)[0]
+        return AnnotatedUnisonoricFingering(
+            fingering=f, annotation=Annotation(pitch=Pitch(name), measure=1))
+    assert penalize_finger_travel(1)(u_annotated('C4'), u_annotated('G4')) == 2
+
+
+def test_describable():
+    geometry = parse_geometry({'left': ['0,0 1,0'], 'right': ['0,0']})
+    same = parse_geometry({'left': ['0,0 1.0,0'], 'right': ['0,0']})
+    assert describe_penalty(penalize_finger_travel(1, geometry)) == \
+        describe_penalty(penalize_finger_travel(1.0, same))
+    assert describe_penalty(penalize_row_jump(1)) is not None
@@ -0,0 +1,140 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.layout_tables import (
+    LayoutTables, compile_layout_tables, publish_layout_tables, attach_layout_tables)
+from concertina_helper.layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_name)
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune, notes_from_pitches
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers,
+    penalize_pull_at_start_of_measure)
+from concertina_helper.solvers.dynamic_programming import DynamicProgrammingSolver
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.type_defs import Pitch
+
+
+tests_dir = Path(__file__).parent
+notes = list(notes_from_tune(Tune((tests_dir / 'amelia-no-chords.abc').read_text())))
+penalties = [
+    penalize_bellows_change(2), penalize_finger_in_same_column(3),
+    penalize_outer_fingers(1), penalize_pull_at_start_of_measure(1)]
+
+
+@pytest.mark.parametrize('layout_name', list_layout_names())
+def test_lattice_matches_fingerings(layout_name):
+    layout = load_bisonoric_layout_by_name(layout_name).transpose(-3)
+    tables = compile_layout_tables(layout, penalties)
+    notes = list(notes_from_midi_numbers(tables.semitones[i] for i in range(0, 40, 3)))
+    lattice = tables.lattice(notes)
+    expected = Lattice.from_fingerings(
+        [f_set for _, f_set in NotesOnLayout(notes, layout).get_all_fingerings()],
+        penalties)
+    assert lattice.layers == expected.layers
+    for position in range(1, len(notes)):
+        assert lattice.transition_costs(position) == \
+            expected.transition_costs(position)
+
+
+def test_attached_matches_compiled():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    tables = compile_layout_tables(layout, penalties)
+    with publish_layout_tables(tables) as shared:
+        attached = attach_layout_tables(shared.name)
+        assert attached.layout == layout
+        assert str(attached.layout) == str(layout)
+        assert list(attached.costs) == list(tables.costs)
+        with pytest.raises(TypeError):
+            attached.costs[0] = 0  # type: ignore
+        solver = DynamicProgrammingSolver()
+        assert solver.solve(attached.lattice(notes)) == \
+            solver.solve(tables.lattice(notes))
+        attached.close()
+    tables.close()
+
+
+def notes_from_midi_numbers(midi_numbers):
+    return notes_from_pitches(Pitch.from_midi_number(m).name for m in midi_numbers)
+
+
+_worker_tables: LayoutTables | None = None
+
+
+def _attach(name):
+    global _worker_tables
+    _worker_tables = attach_layout_tables(name)
+
+
+def _solve(pitches):
+    assert _worker_tables is not None
+    lattice = _worker_tables.lattice(notes_from_pitches(pitches))
+    return DynamicProgrammingSolver().solve(lattice).cost
+
+
+def test_process_pool():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    tables = compile_layout_tables(layout, penalties)
+    tunes = [['G4', 'A4', 'B4'], ['C5', 'E5', 'G5', 'C6']]
+    expected = [
+        DynamicProgrammingSolver().solve(tables.lattice(notes_from_pitches(p))).cost
+        for p in tunes]
+    with publish_layout_tables(tables) as shared:
+        with ProcessPoolExecutor(
+                max_workers=2, initializer=_attach, initargs=(shared.name,)) as pool:
+            assert list(pool.map(_solve, tunes)) == expected
+        _attach(shared.name)
+        assert _solve(tunes[0]) == expected[0]
+        assert _worker_tables is not None
+        _worker_tables.close()
+
+
+def test_unplayable():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    tables = compile_layout_tables(layout, [])
+    assert tables.candidate_ids(200) == ()
+    with pytest.raises(
+            ValueError,
+            match=r'No fingerings for C#3 in measure 1, C#3 in measure 1$'):
+        tables.lattice(notes_from_pitches(['C#3', 'G4', 'C#3']))
+
+
+def test_beyond_midi_range():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg').transpose(60)
+    tables = compile_layout_tables(layout, penalties)
+    assert max(tables.semitones) > 127
+    high = list(notes_from_midi_numbers(sorted(tables.semitones)[-3:]))
+    expected = NotesOnLayout(high, layout).get_best_fingerings(penalties, 'dp')
+    solver = DynamicProgrammingSolver()
+    with publish_layout_tables(tables) as shared:
+        attached = attach_layout_tables(shared.name)
+        for t in [tables, attached]:
+            lattice = t.lattice(high)
+            assert lattice.fingerings(solver.solve(lattice).indexes) == expected
+        attached.close()
+    too_high = Pitch.from_midi_number(max(tables.semitones) + 1)
+    with pytest.raises(ValueError, match=rf'No fingerings for {too_high} in measure 1'):
+        tables.lattice(notes_from_pitches([too_high.name]))
+
+
+def test_mismatched_tables():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    tables = compile_layout_tables(layout, [])
+    with pytest.raises(ValueError, match='shape'):
+        LayoutTables(
+            layout, tables.semitones, tables.offsets, tables.ids, array('d'))
+
+
+def test_bad_shared_memory():
+    shared_memory = SharedMemory(create=True, size=16)
+    try:
+        with pytest.raises(ValueError, match='does not start with'):
+            attach_layout_tables(shared_memory.name)
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
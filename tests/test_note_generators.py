@@ -0,0 +1,61 @@
+import pytest
+
+from concertina_helper.note_generators import (
+    notes_from_binary, write_binary_notes, is_binary_notes,
+    note_sequence_from_binary)
+from concertina_helper.type_defs import Annotation, Pitch
+
+
+def test_binary_round_trip_with_large_measure_gaps(tmp_path):
+    path = tmp_path / 'notes.bin'
+    notes = [
+        Annotation(pitch=Pitch('A0'), measure=1),
+        Annotation(pitch=Pitch('C8'), measure=200),
+        Annotation(pitch=Pitch('Bb3'), measure=100_000),
+        Annotation(pitch=Pitch('Bb3'), measure=100_000),
+    ]
+    write_binary_notes(notes, path)
+    assert list(notes_from_binary(path)) == notes
+    sequence = note_sequence_from_binary(path)
+    assert list(sequence) == notes
+    write_binary_notes(sequence, path)
+    assert list(notes_from_binary(path)) == notes
+
+
+def test_binary_empty(tmp_path):
+    path = tmp_path / 'notes.bin'
+    write_binary_notes([], path)
+    assert is_binary_notes(path)
+    assert list(notes_from_binary(path)) == []
+
+
+def test_binary_not_binary(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('C4\n')
+    assert not is_binary_notes(path)
+    with pytest.raises(ValueError, match=r'does not start with'):
+        list(notes_from_binary(path))
+    with pytest.raises(ValueError, match=r'does not start with'):
+        note_sequence_from_binary(path)
+
+
+def test_binary_truncated(tmp_path):
+    path = tmp_path / 'notes.bin'
+    write_binary_notes([Annotation(pitch=Pitch('C4'), measure=300)], path)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError, match=r'Truncated note at byte 6'):
+        list(notes_from_binary(path))
+
+
+def test_binary_decreasing_measure(tmp_path):
+    with pytest.raises(ValueError, match=r'Measure numbers must not decrease'):
+        write_binary_notes([
+            Annotation(pitch=Pitch('C4'), measure=2),
+            Annotation(pitch=Pitch('C4'), measure=1),
+        ], tmp_path / 'notes.bin')
+
+
+def test_binary_midi_out_of_range(tmp_path):
+    with pytest.raises(ValueError, match=r'MIDI number out of range: 132'):
+        write_binary_notes(
+            [Annotation(pitch=Pitch('C10'), measure=1)], tmp_path / 'notes.bin')
@@ -0,0 +1,81 @@
+from array import array
+from pathlib import Path
+import pickle
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.note_generators import notes_from_tune, note_sequence_from_tune
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.penalties import penalize_bellows_change
+from concertina_helper.type_defs import Annotation, Pitch
+
+
+tune = Tune((Path(__file__).parent / 'amelia-no-chords.abc').read_text())
+
+
+def test_matches_annotations():
+    sequence = note_sequence_from_tune(tune)
+    assert list(sequence) == list(notes_from_tune(tune))
+    assert NoteSequence.from_annotations(notes_from_tune(tune)) == \
+        NoteSequence(sequence.semitones, sequence.measures)
+    assert NoteSequence.from_annotations(sequence) is sequence
+
+
+def test_slice_keeps_all_columns():
+    sequence = note_sequence_from_tune(tune)
+    part = sequence[3:6]
+    assert list(part) == list(sequence)[3:6]
+    assert part.durations == sequence.durations[3:6]
+    assert part.beats == sequence.beats[3:6]
+    assert sequence[-1] == list(sequence)[-1]
+
+
+def test_serialization():
+    sequence = note_sequence_from_tune(tune)
+    assert NoteSequence.from_bytes(sequence.to_bytes()) == sequence
+    assert pickle.loads(pickle.dumps(sequence)) == sequence
+    without_durations = NoteSequence(sequence.semitones, sequence.measures)
+    assert NoteSequence.from_bytes(without_durations.to_bytes()) == without_durations
+
+
+def test_from_bytes_errors():
+    data = note_sequence_from_tune(tune).to_bytes()
+    with pytest.raises(ValueError, match=r'does not start with'):
+        NoteSequence.from_bytes(b'nope' + data)
+    with pytest.raises(ValueError, match=r'Truncated note sequence'):
+        NoteSequence.from_bytes(data[:-1])
+
+
+def test_hash_and_eq():
+    sequence = note_sequence_from_tune(tune)
+    same = NoteSequence.from_bytes(sequence.to_bytes())
+    assert hash(sequence) == hash(same)
+    assert len({sequence, same, sequence[1:]}) == 2
+    assert sequence != list(sequence)
+
+
+def test_invalid_columns():
+    with pytest.raises(ValueError, match=r"semitones must be array\('h'\)"):
+        NoteSequence(array('i', [60]), array('i', [1]))
+    with pytest.raises(ValueError, match=r'beats must be the same length'):
+        NoteSequence(array('h', [60]), array('i', [1]), array('d', [1]), array('d'))
+
+
+def test_notes_on_layout_accepts_sequence():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    penalties = [penalize_bellows_change(1)]
+    expected = NotesOnLayout(notes_from_tune(tune), layout) \
+        .get_best_fingerings(penalties)
+    actual = NotesOnLayout(note_sequence_from_tune(tune), layout) \
+        .get_best_fingerings(penalties)
+    assert actual == expected
+
+
+def test_iteration_shares_pitches():
+    sequence = NoteSequence.from_annotations(
+        [Annotation(pitch=Pitch('C4'), measure=1)] * 2)
+    first, second = sequence
+    assert first.pitch is second.pitch
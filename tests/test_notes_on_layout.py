@@ -6,6 +6,8 @@ from pyabc2 import Tune
 
 from concertina_helper.notes_on_layout import NotesOnLayout
 from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.penalties import penalize_bellows_change
 from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
 
 paths = list(Path(__file__).parent.glob('*.abc'))
@@ -35,3 +37,14 @@ def test_get_best_fingerings(path):
     assert len(best_fingerings) >= 8
     # TODO: Add a stronger assertion when we can get pitches from fingering.
     # https://github.com/mccalluc/concertina-helper/issues/44
+
+
+@pytest.mark.parametrize("path", paths)
+def test_note_sequence_matches_annotations(path):
+    sequence = NoteSequence.from_annotations(notes_from_tune(Tune(path.read_text())))
+    from_arrays = NotesOnLayout(sequence, layout)
+    from_annotations = NotesOnLayout(list(sequence), layout)
+    assert from_arrays.get_all_fingerings() == from_annotations.get_all_fingerings()
+    penalties = [penalize_bellows_change(1)]
+    assert from_arrays.get_best_fingerings(penalties) == \
+        from_annotations.get_best_fingerings(penalties)
@@ -0,0 +1,68 @@
+import pytest
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.output_utils import condense, condense_by_measure, write_blocks
+from concertina_helper.type_defs import Annotation, Pitch
+
+
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+
+
+def fingerings_for(measures):
+    notes = [
+        Annotation(pitch=Pitch('G4'), measure=measure)
+        for measure in measures
+    ]
+    return NotesOnLayout(notes, layout).get_best_fingerings([], 'minplus')
+
+
+def test_condense_too_long():
+    with pytest.raises(
+            ValueError,
+            match=r'Length of fingerings \(21\) greater than allowed \(20\)'):
+        condense(fingerings_for([1] * 21))
+
+
+def test_condense_by_measure_max_length_too_long():
+    with pytest.raises(
+            ValueError, match=r'max_length \(21\) greater than allowed \(20\)'):
+        list(condense_by_measure([], max_length=21))
+
+
+def test_condense_by_measure_empty():
+    assert list(condense_by_measure([])) == []
+
+
+def test_condense_by_measure_splits_long_measures():
+    chunks = list(condense_by_measure(fingerings_for([1, 2, 2, 2, 2, 2, 3]), 2))
+    assert [chunk.split('\n')[0] for chunk in chunks] == [
+        'Measure 1', 'Measure 2', 'Measure 2', 'Measures 2-3']
+    assert '➀➁' in chunks[1]
+    assert '➀➁' in chunks[3]
+
+
+def test_condense_by_measure_matches_condense():
+    fingerings = fingerings_for([1, 1, 2, 2])
+    [chunk] = condense_by_measure(fingerings)
+    assert chunk == f'Measures 1-2\n{condense(fingerings)}'
+
+
+def test_condense_by_measure_splits_long_first_measure():
+    chunks = list(condense_by_measure(fingerings_for([1, 1, 1]), 2))
+    assert [chunk.split('\n')[0] for chunk in chunks] == ['Measure 1', 'Measure 1']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 256])
+def test_write_blocks_like_print(capsys, chunk_size):
+    blocks = ['a\nb', 'c', '', 'd']
+    write_blocks(iter(blocks), chunk_size=chunk_size)
+    written = capsys.readouterr().out
+    for block in blocks:
+        print(block)
+    assert written == capsys.readouterr().out
+
+
+def test_write_blocks_empty(capsys):
+    write_blocks([])
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,67 @@
+from pathlib import Path
+from random import Random
+
+import pytest
+
+from pyabc2 import Tune
+
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.penalties import get_penalty_factories
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.parametric import ParametricLattice, raw_features
+from concertina_helper.solvers.registry import get_solver_by_name
+from concertina_helper.solvers.segmented import SegmentedSolver
+
+
+path = Path(__file__).parent / 'amelia-no-chords.abc'
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+f_sets = [
+    f_set for _, f_set
+    in NotesOnLayout(notes_from_tune(Tune(path.read_text())), layout)
+    .get_all_fingerings()
+]
+parametric_lattice = ParametricLattice.from_fingerings(
+    f_sets, raw_features(get_penalty_factories()))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_weighted_matches_penalties(seed):
+    rng = Random(seed)
+    weights = {name: rng.uniform(0, 10) for name in get_penalty_factories()}
+    penalty_lattice = Lattice.from_fingerings(f_sets, [
+        factory(weights[name]) for name, factory in get_penalty_factories().items()
+    ])
+    expected = get_solver_by_name('minplus').solve(penalty_lattice)
+    actual = parametric_lattice.solve(weights, 'minplus')
+    assert actual.cost == pytest.approx(expected.cost)
+    assert penalty_lattice.path_cost(actual.indexes) == pytest.approx(actual.cost)
+
+
+def test_weighted_tables():
+    weights = {'bellows_change': 2.0}
+    penalty_lattice = Lattice.from_fingerings(
+        f_sets, [get_penalty_factories()['bellows_change'](2.0)])
+    weighted_lattice = parametric_lattice.weighted(weights)
+    for position in [1, 2, len(f_sets) - 1]:
+        assert list(weighted_lattice.transition_costs(position)) == \
+            list(penalty_lattice.transition_costs(position))
+
+
+def test_weighted_slices_keep_tables():
+    weights = {'bellows_change': 5.0, 'outer_fingers': 1.0}
+    expected = parametric_lattice.solve(weights, 'minplus')
+    actual = SegmentedSolver(segment_length=20).solve(
+        parametric_lattice.weighted(weights))
+    assert actual.cost == pytest.approx(expected.cost)
+
+
+def test_weighted_unknown_feature():
+    with pytest.raises(ValueError, match=r"unknown features: \['no_such'\]"):
+        parametric_lattice.weighted({'no_such': 1})
+
+
+def test_empty():
+    empty = ParametricLattice.from_fingerings([], raw_features(get_penalty_factories()))
+    assert empty.solve({'bellows_change': 1}).cost == 0
@@ -0,0 +1,102 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import (
+    list_layout_names, load_bisonoric_layout_by_name)
+from concertina_helper.note_generators import (
+    notes_from_tune, notes_from_pitches, note_sequence_from_tune)
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.penalties import penalize_bellows_change
+from concertina_helper.playability import (
+    find_unplayable_notes, filter_playable, needed_bits, PlayableMatch,
+    _parse_and_filter)
+from concertina_helper.type_defs import Pitch
+
+
+tests_dir = Path(__file__).parent
+tune = Tune((tests_dir / 'amelia-no-chords.abc').read_text())
+
+
+@pytest.mark.parametrize('layout_name', list_layout_names())
+def test_bits_match_fingerings(layout_name):
+    layout = load_bisonoric_layout_by_name(layout_name).transpose(-3)
+    for midi_number in range(12, 120):
+        pitch = Pitch.from_midi_number(midi_number)
+        assert bool(layout.playable_bits >> midi_number & 1) == \
+            bool(layout.get_fingerings(pitch))
+
+
+def test_unplayable_notes_with_measures():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    notes = list(notes_from_tune(tune))
+    unplayable = find_unplayable_notes(notes, layout, transpose=12)
+    expected = [
+        note for note in notes
+        if not layout.transpose(12).get_fingerings(note.pitch)]
+    assert unplayable == expected
+    assert len({note.measure for note in unplayable}) > 1
+    assert find_unplayable_notes(notes, layout) == []
+
+
+def test_unplayable_notes_sequence():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    sequence = note_sequence_from_tune(tune)
+    assert find_unplayable_notes(sequence, layout, transpose=12) == \
+        find_unplayable_notes(list(sequence), layout, transpose=12)
+    # If every note can be played, no annotations are made.
+    with patch.object(NoteSequence, '__iter__', side_effect=AssertionError):
+        assert find_unplayable_notes(sequence, layout) == []
+
+
+def test_get_best_fingerings_reports_all():
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg').transpose(24)
+    n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'G4']), layout)
+    with pytest.raises(
+            ValueError,
+            match=r'No fingerings for G4 in measure 1, A4 in measure 1, G4 in'):
+        n_l.get_best_fingerings([penalize_bellows_change(1)])
+
+
+def test_needed_bits_sequence_matches_annotations():
+    assert needed_bits(note_sequence_from_tune(tune)) == \
+        needed_bits(notes_from_tune(tune))
+
+
+def test_filter_playable():
+    layouts = {
+        name: load_bisonoric_layout_by_name(name) for name in list_layout_names()}
+    tunes = [
+        ('amelia', note_sequence_from_tune(tune)),
+        ('low', notes_from_pitches(['C1'])),
+    ]
+    matches = list(filter_playable(tunes, layouts, [-12, 0]))
+    assert PlayableMatch('amelia', '30_wheatstone_cg', 0) in matches
+    assert all(match.tune_name == 'amelia' for match in matches)
+    for match in matches:
+        assert find_unplayable_notes(
+            notes_from_tune(tune), layouts[match.layout_name], match.transpose) == []
+
+
+def test_cli(capsys):
+    path = tests_dir / 'amelia-no-chords.abc'
+    with patch('argparse._sys.argv',
+               ['concertina-helper-playable', str(path),
+                '--layout_names', '20_cg', '30_wheatstone_cg',
+                '--layout_transpose', '0', '12']):
+        _parse_and_filter()
+    assert capsys.readouterr().out == f'{path}\t30_wheatstone_cg\t0\n'
+
+
+def test_cli_unplayable(capsys):
+    path = tests_dir / 'amelia-no-chords.abc'
+    with patch('argparse._sys.argv',
+               ['concertina-helper-playable', str(path),
+                '--layout_names', '20_cg', '30_wheatstone_cg', '--unplayable']):
+        _parse_and_filter()
+    lines = capsys.readouterr().out.split('\n')
+    assert lines[0] == f'{path}\t20_cg\tA#4 in measure 8'
+    assert not any('30_wheatstone_cg' in line for line in lines)
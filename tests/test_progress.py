@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event
+from unittest.mock import patch
+import asyncio
+import sys
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.cli import _parse_and_print_fingerings
+from concertina_helper.constraints import parse_constraints
+from concertina_helper.finger_finder import (
+    find_best_fingerings, find_best_fingerings_async)
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.penalties import penalize_bellows_change
+from concertina_helper.result_cache import FingeringCache
+from concertina_helper.solvers.a_star import AStarSolver
+from concertina_helper.solvers.anytime import AnytimeSolver
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.low_memory import LowMemorySolver
+from concertina_helper.solvers.progress import (
+    CancellationToken, Progress, SolveCancelled, SolveMonitor)
+from concertina_helper.solvers.registry import list_solver_names, get_solver_by_name
+from concertina_helper.solvers.segmented import SegmentedSolver
+from concertina_helper.solvers.stateful import StatefulSolver
+from concertina_helper.stateful_penalties import penalize_long_bellows_run
+
+
+tests_dir = Path(__file__).parent
+tune_path = tests_dir / 'amelia-no-chords.abc'
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+notes = list(notes_from_tune(Tune(tune_path.read_text())))
+n_l = NotesOnLayout(notes, layout)
+f_sets = [f_set for _, f_set in n_l.get_all_fingerings()]
+lattice = Lattice.from_fingerings(f_sets, [penalize_bellows_change(1)])
+
+solvers = [get_solver_by_name(name) for name in list_solver_names()] + [
+    LowMemorySolver(checkpointed=False),
+    SegmentedSolver(segment_length=20, executor_factory=ThreadPoolExecutor),
+    StatefulSolver([penalize_long_bellows_run(1, 4)]),
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('solver', solvers, ids=lambda solver: type(solver).__name__)
+def test_progress_reaches_end(solver):
+    reports = []
+    monitor = SolveMonitor(len(lattice.layers), reports.append, interval=0)
+    solution = solver.solve(lattice, monitor)
+    assert solution == solver.solve(lattice)
+    positions = [report.positions for report in reports]
+    assert positions == sorted(positions)
+    assert 0 < positions[-1] <= len(lattice.layers)
+    assert reports[-1].nodes_expanded > 0
+    monitor.finish()
+    assert reports[-1].positions == len(lattice.layers)
+    assert reports[-1].fraction == 1
+
+
+@pytest.mark.parametrize('solver', solvers, ids=lambda solver: type(solver).__name__)
+def test_cancel_during_solve(solver):
+    token = CancellationToken()
+    reports = []
+
+    def progress(report):
+        reports.append(report)
+        token.cancel()
+    monitor = SolveMonitor(len(lattice.layers), progress, token, interval=0)
+    with pytest.raises(SolveCancelled):
+        solver.solve(lattice, monitor)
+    assert len(reports) == 1
+
+
+def test_astar_cancel_during_bounds():
+    token = CancellationToken()
+    reports = []
+
+    def progress(report):
+        reports.append(report)
+        token.cancel()
+    monitor = SolveMonitor(len(lattice.layers), progress, token, interval=0)
+    with pytest.raises(SolveCancelled):
+        AStarSolver().solve(lattice, monitor)
+    # Stopped by the backward pass, before the search reached any note.
+    assert len(reports) == 1
+    assert reports[0].positions == 0
+    assert reports[0].nodes_expanded > 0
+
+
+def test_anytime_reports_every_pass():
+    reports = []
+    monitor = SolveMonitor(len(lattice.layers), reports.append, interval=0)
+    AnytimeSolver(time_budget=None).solve(lattice, monitor)
+    # The greedy pass, and the backward pass.
+    assert len(reports) == 2 * (len(lattice.layers) - 1)
+
+
+def test_monitor_interval():
+    clock = FakeClock()
+    reports = []
+    monitor = SolveMonitor(10, reports.append, interval=1, clock=clock)
+    monitor.advance(1, 5)
+    assert reports == []
+    clock.now = 1.5
+    monitor.advance(1, 5)
+    assert reports == [Progress(2, 10, 10, 1.5)]
+    monitor.reach(1)
+    monitor.reach(20)
+    assert monitor.positions == 10
+
+
+def test_fraction_of_nothing():
+    assert Progress(0, 0, 0, 0.0).fraction == 1
+
+
+def test_find_best_fingerings_progress():
+    reports = []
+    best = list(find_best_fingerings(
+        f_sets, [penalize_bellows_change(1)], 'minplus', progress=reports.append))
+    assert reports[-1].positions == len(best)
+
+
+@pytest.mark.parametrize('executor', [None, ThreadPoolExecutor()])
+def test_find_best_fingerings_parts_progress(executor):
+    constraints = parse_constraints(['4 PULL', '13 PUSH'], notes)
+    reports = []
+    best = list(find_best_fingerings(
+        f_sets, [penalize_bellows_change(1)], 'minplus', constraints,
+        executor, reports.append))
+    assert reports[-1].positions == len(best)
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(SolveCancelled):
+        find_best_fingerings(
+            f_sets, [penalize_bellows_change(1)], 'minplus', constraints,
+            executor, cancel=token)
+
+
+def test_stateful_cancel():
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(SolveCancelled):
+        find_best_fingerings(f_sets, [penalize_long_bellows_run(1, 4)], cancel=token)
+
+
+def test_cache_passes_progress():
+    reports = []
+    n_l.get_best_fingerings(
+        [penalize_bellows_change(1)], cache=FingeringCache(), progress=reports.append)
+    assert reports[-1].positions == len(notes)
+
+
+def test_async():
+    reports = []
+    best = asyncio.run(find_best_fingerings_async(
+        f_sets, [penalize_bellows_change(1)], progress=reports.append))
+    assert list(best) == list(find_best_fingerings(
+        f_sets, [penalize_bellows_change(1)]))
+    assert reports[-1].positions == len(notes)
+
+
+def test_async_cancel():
+    started = Event()
+    release = Event()
+
+    def blocking_penalty(f1, f2):
+        started.set()
+        release.wait(10)
+        return 0
+
+    token = CancellationToken()
+
+    async def main():
+        task = asyncio.create_task(find_best_fingerings_async(
+            f_sets, [blocking_penalty], 'dp', cancel=token))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert token.cancelled
+        # Let the solve reach the check, so the loop can shut down.
+        release.set()
+    asyncio.run(main())
+
+
+def test_cli_progress_bar(capsys):
+    with patch('argparse._sys.argv',
+               ['concertina-helper', str(tune_path),
+                '--layout_name', '30_wheatstone_cg']), \
+            patch('concertina_helper.cli.PROGRESS_BAR_MIN_NOTES', 1), \
+            patch.object(sys.stderr, 'isatty', return_value=True):
+        _parse_and_print_fingerings()
+    captured = capsys.readouterr()
+    # The bar is cleared at the end.
+    assert captured.err.startswith('\r')
+    assert captured.err.endswith('\r')
+    assert captured.out.startswith('Measure 1')
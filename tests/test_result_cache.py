@@ -0,0 +1,157 @@
+from functools import partial
+from unittest.mock import patch
+import pickle
+
+import pytest
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches
+from concertina_helper.note_sequence import NoteSequence
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers,
+    describe_penalty)
+from concertina_helper.stateful_penalties import penalize_long_bellows_run
+from concertina_helper.result_cache import (
+    FingeringCache, MemoryCache, DiskCache, CacheStats, make_cache_key)
+from concertina_helper.solvers.anytime import AnytimeSolver
+from concertina_helper.solvers.registry import _solver_factories
+
+
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+pitches = ['G4', 'A4', 'B4', 'C5']
+penalties = [penalize_bellows_change(1), penalize_outer_fingers(1)]
+
+
+def solve(cache, pitches=pitches, penalties=penalties, solver_name='astar'):
+    n_l = NotesOnLayout(notes_from_pitches(pitches), layout)
+    return n_l.get_best_fingerings(penalties, solver_name, cache=cache)
+
+
+def test_hit_matches_uncached():
+    cache = FingeringCache()
+    expected = solve(None)
+    assert solve(cache) == expected
+    assert solve(cache) == expected
+    assert cache.stats == CacheStats(hits=1, misses=1, uncacheable=0)
+
+
+def test_spelling_kept():
+    spelled = ['A#4', 'Gb4', 'D#5']
+    best = solve(FingeringCache(), pitches=spelled)
+    assert [f.annotation.pitch.name for f in best] == spelled
+    assert best == solve(None, pitches=spelled)
+
+
+def test_hit_keeps_own_spelling():
+    cache = FingeringCache()
+    sharps = solve(cache, pitches=['A#4', 'G#4', 'D#5'])
+    flats = solve(cache, pitches=['Bb4', 'Ab4', 'Eb5'])
+    assert cache.stats.hits == 1
+    assert [f.annotation.pitch.name for f in flats] == ['Bb4', 'Ab4', 'Eb5']
+    assert [f.fingering for f in flats] == [f.fingering for f in sharps]
+    assert flats == solve(None, pitches=['Bb4', 'Ab4', 'Eb5'])
+
+
+def test_note_sequence_shares_results():
+    cache = FingeringCache()
+    expected = solve(cache)
+    sequence = NoteSequence.from_annotations(notes_from_pitches(pitches))
+    n_l = NotesOnLayout(sequence, layout)
+    assert n_l.get_best_fingerings(penalties, 'astar', cache=cache) == expected
+    assert cache.stats == CacheStats(hits=1, misses=1, uncacheable=0)
+    uncached = NotesOnLayout(sequence, layout).get_best_fingerings(
+        penalties, 'dp', cache=cache)
+    assert uncached == NotesOnLayout(list(sequence), layout).get_best_fingerings(
+        penalties, 'dp')
+
+
+def test_key_depends_on_everything():
+    cache = FingeringCache()
+    solve(cache)
+    solve(cache, pitches=pitches[:-1])
+    solve(cache, penalties=[penalize_bellows_change(2)])
+    solve(cache, solver_name='dp')
+    assert cache.stats == CacheStats(hits=0, misses=4, uncacheable=0)
+
+
+def test_measures_in_key():
+    notes = list(notes_from_pitches(pitches))
+    moved = [notes[0]] + [
+        note.__class__(pitch=note.pitch, measure=note.measure + 1)
+        for note in notes[1:]]
+    assert make_cache_key(layout, notes, penalties) != \
+        make_cache_key(layout, moved, penalties)
+
+
+def test_not_proven_optimal_not_stored():
+    cache = FingeringCache()
+    greedy_penalties = [penalize_bellows_change(10), penalize_finger_in_same_column(3)]
+    with patch.dict(_solver_factories, greedy=partial(AnytimeSolver, node_budget=0)):
+        for _ in range(2):
+            best = solve(cache, ['A4', 'B4', 'C5'], greedy_penalties, 'greedy')
+            assert not best.proven_optimal
+    assert cache.stats == CacheStats(hits=0, misses=2, uncacheable=0)
+
+
+def test_uncacheable():
+    cache = FingeringCache()
+    solve(cache, penalties=[lambda f1, f2: 0])
+    solve(cache, penalties=[lambda f1, f2: 0])
+    assert cache.stats == CacheStats(hits=0, misses=0, uncacheable=2)
+
+
+def test_stateful_penalties_cached():
+    cache = FingeringCache()
+    stateful = penalties + [penalize_long_bellows_run(10, 2)]
+    assert solve(cache, penalties=stateful) == solve(cache, penalties=stateful)
+    assert cache.stats.hits == 1
+
+
+def test_result_copied():
+    cache = FingeringCache()
+    solve(cache).clear()
+    assert len(solve(cache)) == len(pitches)
+
+
+def test_memory_cache_evicts_least_recent():
+    cache = MemoryCache(max_size=2)
+    cache.put('a', [])
+    cache.put('b', [])
+    cache.get('a')
+    cache.put('c', [])
+    assert cache.get('a') == []
+    assert cache.get('b') is None
+    assert cache.get('c') == []
+
+
+def test_memory_cache_invalid_size():
+    with pytest.raises(ValueError, match=r'max_size must be at least 1'):
+        MemoryCache(max_size=0)
+
+
+def test_disk_cache(tmp_path):
+    directory = tmp_path / 'cache'
+    expected = solve(None)
+    first = FingeringCache(DiskCache(directory))
+    assert solve(first) == expected
+    # A fresh cache, as if from another process, reads the same file.
+    second = FingeringCache(DiskCache(directory))
+    assert solve(second) == expected
+    assert second.stats == CacheStats(hits=1, misses=0, uncacheable=0)
+    assert [p.suffix for p in directory.iterdir()] == ['.pickle']
+
+
+def test_describe_penalty_survives_pickle():
+    penalty = penalize_outer_fingers(0.5)
+    assert describe_penalty(pickle.loads(pickle.dumps(penalty))) == \
+        describe_penalty(penalty)
+
+
+def test_describe_penalty_keywords_and_tuples():
+    from functools import partial
+    assert describe_penalty(partial(describe_penalty, penalty=(1, 'a'))) == \
+        "concertina_helper.penalties.describe_penalty(penalty=(1.0, 'a',))"
+    assert describe_penalty(partial(describe_penalty, (lambda: 0,))) is None
+    assert describe_penalty(partial(lambda: 0)) is None
+    assert describe_penalty(object()) is None
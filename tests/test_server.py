@@ -0,0 +1,245 @@
+import json
+from functools import partial
+from io import StringIO
+from pathlib import Path
+from threading import Event
+from unittest.mock import patch
+
+import pytest
+
+from concertina_helper.cli import _parse_and_print_fingerings
+from concertina_helper.server import (
+    FingeringServer, PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND,
+    INVALID_PARAMS, INTERNAL_ERROR, REQUEST_CANCELLED)
+from concertina_helper.solvers.anytime import AnytimeSolver
+from concertina_helper.solvers.progress import SolveCancelled
+from concertina_helper.solvers.registry import _solver_factories
+
+
+layouts_dir = Path(__file__).parent.parent / 'concertina_helper' / 'layouts'
+
+
+def request(request_id, method, **params):
+    return json.dumps(
+        {'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params})
+
+
+def serve(lines, server=None):
+    output = StringIO()
+    (server or FingeringServer()).serve(lines, output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    return {response['id']: response for response in responses}
+
+
+def fingerings(response):
+    return [
+        (f['pitch'], f['direction'], tuple(f['buttons']))
+        for f in response['result']['fingerings']]
+
+
+def test_fingerings():
+    abc = (Path(__file__).parent / 'g-major.abc').read_text()
+    responses = serve([
+        request(1, 'fingerings', pitches=['G4', 'A4'], layout_name='30_wheatstone_cg'),
+        request(2, 'fingerings', abc=abc, layout_name='30_wheatstone_cg'),
+        request(
+            3, 'fingerings', pitches=['A4', 'B4'], layout_name='30_wheatstone_cg',
+            layout_transpose=2, costs={'bellows_change': 5}, solver='dp'),
+        request(
+            4, 'fingerings', pitches=['G4', 'A4'],
+            layout_path=str(layouts_dir / '30_wheatstone_cg.yaml')),
+        request(
+            5, 'fingerings', pitches=['G4', 'A4'], layout_name='30_wheatstone_cg',
+            constraints=['1-2 PULL']),
+    ])
+    assert fingerings(responses[1]) == [
+        ('G4', 'PUSH', ('L3.3',)), ('A4', 'PUSH', ('L1.4',))]
+    assert len(fingerings(responses[2])) == 8
+    assert responses[2]['result']['fingerings'][-1]['measure'] == 2
+    assert [f[1] for f in fingerings(responses[3])] == ['PUSH', 'PUSH']
+    assert fingerings(responses[4]) == fingerings(responses[1])
+    assert [f[1] for f in fingerings(responses[5])] == ['PULL', 'PULL']
+
+
+def test_warm_between_requests():
+    server = FingeringServer()
+    params = {'pitches': ['G4', 'A4'], 'layout_name': '30_wheatstone_cg'}
+    first = server.find_fingerings(params)
+    tables = next(iter(server._tables.values()))
+    assert server.find_fingerings(params) == first
+    assert server.find_fingerings({**params, 'pitches': ['B4']})
+    assert len(server._layouts) == 1
+    assert next(iter(server._tables.values())) is tables
+    server.find_fingerings({**params, 'costs': {'outer_fingers': 2}})
+    assert len(server._tables) == 2
+
+
+def test_cached_result_keeps_own_spelling():
+    server = FingeringServer()
+    params = {'layout_name': '30_wheatstone_cg'}
+    sharps = server.find_fingerings({**params, 'pitches': ['A#4', 'D#5']})
+    flats = server.find_fingerings({**params, 'pitches': ['Bb4', 'Eb5']})
+    assert len(server._results._results) == 1
+    assert [f['pitch'] for f in flats['fingerings']] == ['Bb4', 'Eb5']
+    assert [f['buttons'] for f in flats['fingerings']] == \
+        [f['buttons'] for f in sharps['fingerings']]
+
+
+@pytest.mark.parametrize('constraints', [[], ['1 PUSH']])
+def test_not_proven_optimal_not_kept(constraints):
+    server = FingeringServer()
+    params = {
+        'pitches': ['A4', 'B4', 'C5'], 'layout_name': '30_wheatstone_cg',
+        'costs': {'bellows_change': 10, 'finger_in_same_column': 3},
+        'solver': 'greedy', 'constraints': constraints}
+    with patch.dict(_solver_factories, greedy=partial(AnytimeSolver, node_budget=0)):
+        result = server.find_fingerings(params)
+    assert result['proven_optimal'] is False
+    assert result['gap'] > 0
+    assert len(server._results._results) == 0
+    result = server.find_fingerings({**params, 'solver': 'dp'})
+    assert (result['proven_optimal'], result['gap']) == (True, 0)
+    assert len(server._results._results) == 1
+
+
+def test_caches_bounded():
+    server = FingeringServer(cache_size=2)
+    for transpose in range(4):
+        server.find_fingerings({
+            'pitches': ['G4'], 'layout_name': '30_wheatstone_cg',
+            'layout_transpose': transpose})
+    assert list(server._layouts) == [
+        ('name', '30_wheatstone_cg', 2), ('name', '30_wheatstone_cg', 3)]
+    assert len(server._tables) == 2
+
+
+@pytest.mark.parametrize('params, code, message', [
+    ({'layout_name': '30_wheatstone_cg'}, INVALID_PARAMS, 'Either abc or pitches'),
+    ({'pitches': ['G4']}, INVALID_PARAMS, 'Either layout_name or layout_path'),
+    ({'pitches': ['G4'], 'layout_name': 'nope'}, INVALID_PARAMS, 'Unknown layout'),
+    ({'pitches': ['G4'], 'layout_path': '/nope.yaml'}, INVALID_PARAMS, 'nope.yaml'),
+    ({'pitches': ['G4'], 'layout_name': '20_cg', 'layout_transpose': 'up'},
+     INVALID_PARAMS, 'layout_transpose must be an integer'),
+    ({'pitches': ['G4'], 'layout_name': '20_cg', 'costs': {'nope': 1}},
+     INVALID_PARAMS, 'Unknown penalties: nope'),
+    ({'pitches': ['C1'], 'layout_name': '20_cg'},
+     INVALID_PARAMS, 'No fingerings for C1 in measure 1'),
+    ({'pitches': ['G4'], 'layout_name': '20_cg', 'solver': 'nope'},
+     INVALID_PARAMS, 'unknown solver: nope'),
+    ({'pitches': 1, 'layout_name': '20_cg'}, INTERNAL_ERROR, 'TypeError'),
+])
+def test_fingerings_errors(params, code, message):
+    responses = serve([request(1, 'fingerings', **params)])
+    error = responses[1]['error']
+    assert error['code'] == code
+    assert message in error['message']
+
+
+def test_protocol():
+    responses = serve([
+        '{"not json',
+        '',
+        '[]',
+        json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'layouts', 'params': []}),
+        request(3, 'nope'),
+        json.dumps({'jsonrpc': '2.0', 'method': 'nope'}),
+        json.dumps({'jsonrpc': '2.0', 'method': 'layouts'}),
+        json.dumps({
+            'jsonrpc': '2.0', 'method': 'fingerings',
+            'params': {'pitches': ['G4'], 'layout_name': '20_cg'}}),
+        request(4, 'layouts'),
+        request(5, 'cancel', id=1),
+        request(6, 'shutdown'),
+        request(7, 'layouts'),
+    ])
+    assert responses[None]['error']['code'] in (PARSE_ERROR, INVALID_REQUEST)
+    assert responses[2]['error']['code'] == INVALID_REQUEST
+    assert responses[3]['error'] == {
+        'code': METHOD_NOT_FOUND, 'message': 'Unknown method: nope'}
+    assert '30_wheatstone_cg' in responses[4]['result']
+    assert responses[5]['result'] is False
+    assert responses[6]['result'] is None
+    # Notifications are not answered, and nothing is read after shutdown:
+    assert set(responses) == {None, 2, 3, 4, 5, 6}
+
+
+def test_unhashable_ids():
+    responses = serve([
+        json.dumps({'jsonrpc': '2.0', 'id': [1], 'method': 'layouts'}),
+        json.dumps({
+            'jsonrpc': '2.0', 'id': {}, 'method': 'fingerings',
+            'params': {'pitches': ['G4'], 'layout_name': '20_cg'}}),
+        request(1, 'cancel', id=[1]),
+        json.dumps({'jsonrpc': '2.0', 'method': 'cancel', 'params': {'id': {}}}),
+        request(2, 'layouts'),
+    ])
+    assert responses[None]['error']['code'] == INVALID_REQUEST
+    assert responses[1]['error'] == {
+        'code': INVALID_PARAMS, 'message': 'id must be a string or an integer'}
+    # The server carries on:
+    assert '20_cg' in responses[2]['result']
+
+
+def test_unexpected_error_does_not_stop_server():
+    with patch.object(
+            FingeringServer, '_cancel', side_effect=RuntimeError('boom')):
+        responses = serve([request(1, 'cancel', id=2), request(2, 'layouts')])
+    assert responses[None]['error'] == {
+        'code': INTERNAL_ERROR, 'message': "RuntimeError('boom')"}
+    assert '20_cg' in responses[2]['result']
+
+
+class SlowServer(FingeringServer):
+    def __init__(self):
+        super().__init__()
+        self.started = Event()
+        self.release = Event()
+        self.stopped = Event()
+
+    def find_fingerings(self, params, cancel=None):
+        self.started.set()
+        self.release.wait(10)
+        try:
+            return super().find_fingerings(params, cancel)
+        except SolveCancelled:
+            self.stopped.set()
+            raise
+
+
+def test_cancel():
+    server = SlowServer()
+    params = {'pitches': ['G4', 'A4'], 'layout_name': '30_wheatstone_cg'}
+
+    def lines():
+        yield request(1, 'fingerings', **params)
+        yield request(2, 'fingerings', **params)
+        server.started.wait(10)
+        yield request('cancel-2', 'cancel', id=2)
+        yield request('cancel-1', 'cancel', id=1)
+        yield request(3, 'fingerings', **params)
+        server.release.set()
+    responses = serve(lines(), server)
+    assert responses['cancel-1']['result'] is True
+    assert responses['cancel-2']['result'] is True
+    assert responses[1]['error'] == {
+        'code': REQUEST_CANCELLED, 'message': 'Request cancelled'}
+    assert responses[2]['error']['code'] == REQUEST_CANCELLED
+    assert 'result' in responses[3]
+    # The request which had started was stopped by its token.
+    assert server.stopped.is_set()
+
+
+def test_cli_serve_stdio(capsys):
+    stdin = StringIO(request(1, 'layouts') + '\n')
+    with patch('argparse._sys.argv', ['concertina-helper', '--serve_stdio']), \
+            patch('sys.stdin', stdin):
+        _parse_and_print_fingerings()
+    response = json.loads(capsys.readouterr().out)
+    assert '20_cg' in response['result']
+
+
+def test_cli_missing_input(capsys):
+    with patch('argparse._sys.argv', ['concertina-helper']):
+        with pytest.raises(SystemExit):
+            _parse_and_print_fingerings()
+    assert 'the following arguments are required: input' in capsys.readouterr().err
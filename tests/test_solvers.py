@@ -0,0 +1,315 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+
+from pyabc2 import Tune
+
+from concertina_helper.constraints import parse_constraints
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_tune
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column,
+    penalize_pull_at_start_of_measure, penalize_outer_fingers)
+from concertina_helper.solvers.base_classes import Solution
+from concertina_helper.solvers.lattice import Lattice, STEP_COST
+from concertina_helper.solvers.registry import (
+    list_solver_names, get_solver_by_name, register_solver, _solver_factories)
+from concertina_helper.solvers.dynamic_programming import DynamicProgrammingSolver
+from concertina_helper.solvers.a_star import AStarSolver
+from concertina_helper.solvers.anytime import AnytimeSolver
+from concertina_helper.solvers.low_memory import LowMemorySolver, _typecode
+from concertina_helper.solvers.min_plus import MinPlusSolver
+from concertina_helper.solvers.segmented import SegmentedSolver, _choose_boundaries
+from concertina_helper.synthetic import synthetic_bisonoric_layout, random_tune
+
+
+paths = sorted(Path(__file__).parent.glob('*.abc'))
+# The 20 button layout can not play every tune.
+layout_names = ['30_jefferies_cg', '30_wheatstone_cg']
+penalty_functions = [
+    penalize_bellows_change(1),
+    penalize_finger_in_same_column(1),
+    penalize_pull_at_start_of_measure(1),
+    penalize_outer_fingers(1)
+]
+
+
+def make_lattice(path, layout_name, penalty_functions):
+    tune = Tune(path.read_text())
+    n_l = NotesOnLayout(
+        notes_from_tune(tune), load_bisonoric_layout_by_name(layout_name))
+    return Lattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()], penalty_functions)
+
+
+def scrambled_penalty(f1, f2):
+    # Arbitrary but consistent costs, so no structure is shared with real penalties.
+    return hash((f1, f2)) % 7
+
+
+@pytest.mark.parametrize('solver_name', list_solver_names())
+@pytest.mark.parametrize('layout_name', layout_names)
+@pytest.mark.parametrize('path', paths, ids=lambda path: path.name)
+def test_solver_matches_astar(solver_name, layout_name, path):
+    lattice = make_lattice(path, layout_name, penalty_functions)
+    expected = get_solver_by_name('astar').solve(lattice)
+    actual = get_solver_by_name(solver_name).solve(lattice)
+    assert len(actual.indexes) == len(lattice.layers)
+    assert actual.cost == pytest.approx(expected.cost)
+    assert actual.proven_optimal
+    assert lattice.path_cost(actual.indexes) == pytest.approx(actual.cost)
+
+
+@pytest.mark.parametrize('solver_name', list_solver_names())
+def test_solver_matches_astar_scrambled(solver_name):
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', [scrambled_penalty])
+    expected = get_solver_by_name('astar').solve(lattice)
+    actual = get_solver_by_name(solver_name).solve(lattice)
+    assert actual.cost == pytest.approx(expected.cost)
+    assert lattice.path_cost(actual.indexes) == pytest.approx(actual.cost)
+
+
+@pytest.mark.parametrize('solver_name', list_solver_names())
+def test_solver_empty_lattice(solver_name):
+    assert get_solver_by_name(solver_name).solve(Lattice(())) == Solution((), 0.0)
+
+
+def test_lattice_missing_fingerings():
+    with pytest.raises(ValueError, match=r'No fingerings at position 1'):
+        Lattice.from_fingerings(
+            [make_lattice(paths[0], '30_wheatstone_cg', []).layers[0], set()], [])
+
+
+def test_lattice_transition_costs_reused():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', penalty_functions)
+    assert lattice.transition_costs(1) is lattice.transition_costs(1)
+    assert lattice.path_cost([]) == 0.0
+
+
+def test_get_solver_by_name_unknown():
+    with pytest.raises(ValueError, match=r'unknown solver: no_such'):
+        get_solver_by_name('no_such')
+
+
+def test_register_solver():
+    register_solver('test_dp', DynamicProgrammingSolver)
+    assert 'test_dp' in list_solver_names()
+    with pytest.raises(ValueError, match=r'solver already registered: test_dp'):
+        register_solver('test_dp', DynamicProgrammingSolver)
+
+
+@pytest.mark.parametrize('path', paths, ids=lambda path: path.name)
+def test_astar_informed_heuristic(path):
+    uninformed = AStarSolver(informed=False).solve(
+        make_lattice(path, '30_wheatstone_cg', penalty_functions))
+    informed = AStarSolver(informed=True).solve(
+        make_lattice(path, '30_wheatstone_cg', penalty_functions))
+    assert informed.cost == pytest.approx(uninformed.cost)
+    assert informed.nodes_expanded < uninformed.nodes_expanded
+
+
+def test_remaining_cost_bounds():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', penalty_functions)
+    bounds = lattice.remaining_cost_bounds()
+    assert bounds[-1] == 0
+    assert all(a >= b for a, b in zip(bounds, bounds[1:]))
+    best = get_solver_by_name('dp').solve(lattice)
+    assert STEP_COST + bounds[0] <= best.cost
+
+
+@pytest.mark.parametrize(
+    'executor_factory', [ThreadPoolExecutor, ProcessPoolExecutor])
+@pytest.mark.parametrize('segment_length', [2, 7, 50])
+def test_segmented_solver(executor_factory, segment_length):
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', penalty_functions)
+    expected = get_solver_by_name('dp').solve(lattice)
+    actual = SegmentedSolver(
+        segment_length=segment_length, max_workers=2,
+        executor_factory=executor_factory).solve(lattice)
+    assert len(actual.indexes) == len(lattice.layers)
+    assert actual.cost == pytest.approx(expected.cost)
+    assert actual.proven_optimal
+    assert lattice.path_cost(actual.indexes) == pytest.approx(actual.cost)
+
+
+def test_segmented_solver_one_worker():
+    # Solved in this process, so the penalty does not need to be picklable.
+    lattice = make_lattice(
+        paths[0], '30_wheatstone_cg', [lambda f1, f2: scrambled_penalty(f1, f2)])
+    expected = get_solver_by_name('dp').solve(lattice)
+    actual = SegmentedSolver(segment_length=7, max_workers=1).solve(lattice)
+    assert actual.cost == pytest.approx(expected.cost)
+    assert lattice.path_cost(actual.indexes) == pytest.approx(actual.cost)
+
+
+def test_segmented_solver_boundaries():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', [])
+    boundaries = _choose_boundaries(lattice, 20)
+    assert boundaries[0] == 0
+    assert boundaries[-1] == len(lattice.layers) - 1
+    for start, stop in zip(boundaries, boundaries[1:]):
+        assert 0 < stop - start <= 20
+    assert any(len(lattice.layers[b]) == 1 for b in boundaries[1:-1])
+
+
+def test_segmented_solver_invalid_length():
+    with pytest.raises(ValueError, match=r'segment_length must be at least 2'):
+        SegmentedSolver(segment_length=1)
+
+
+def test_anytime_node_budget():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', penalty_functions)
+    optimum = get_solver_by_name('astar').solve(lattice).cost
+    greedy = AnytimeSolver(node_budget=0).solve(lattice)
+    assert not greedy.proven_optimal
+    assert greedy.cost - greedy.gap <= optimum <= greedy.cost
+    assert lattice.path_cost(greedy.indexes) == pytest.approx(greedy.cost)
+    # After the greedy pass, enough for the backward pass to get about half way.
+    half = len(lattice.layers) + sum(len(layer) for layer in lattice.layers) // 2
+    bounded = AnytimeSolver(node_budget=half).solve(lattice)
+    assert not bounded.proven_optimal
+    assert bounded.cost <= greedy.cost
+    assert bounded.gap < greedy.gap
+    assert bounded.cost - bounded.gap <= optimum <= bounded.cost
+    assert lattice.path_cost(bounded.indexes) == pytest.approx(bounded.cost)
+    complete = AnytimeSolver(node_budget=4 * half).solve(lattice)
+    assert complete.proven_optimal
+    assert complete.cost == pytest.approx(optimum)
+
+
+def test_anytime_time_budget():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', penalty_functions)
+    ticks = iter(range(1000))
+    solution = AnytimeSolver(
+        time_budget=5, clock=lambda: next(ticks)).solve(lattice)
+    assert not solution.proven_optimal
+    assert solution.nodes_expanded < 10 * len(lattice.layers)
+
+
+def test_anytime_unlimited():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', [scrambled_penalty])
+    solution = AnytimeSolver(time_budget=None).solve(lattice)
+    assert solution.proven_optimal
+    assert solution.gap == 0
+    assert solution.cost == pytest.approx(
+        get_solver_by_name('astar').solve(lattice).cost)
+
+
+def test_best_fingerings_proven_optimal():
+    tune_path = Path(__file__).parent / 'amelia-no-chords.abc'
+    notes = list(notes_from_tune(Tune(tune_path.read_text())))
+    layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+    constraints = parse_constraints(['4 PULL', '13 PUSH'], notes)
+    optimal = NotesOnLayout(notes, layout).get_best_fingerings(penalty_functions)
+    assert optimal.proven_optimal
+    assert optimal.gap == 0
+    with patch.dict(_solver_factories, greedy=partial(AnytimeSolver, node_budget=0)):
+        greedy = NotesOnLayout(notes, layout).get_best_fingerings(
+            penalty_functions, 'greedy')
+        # Split at the constraints, the gaps of the parts add up.
+        parts = NotesOnLayout(notes, layout, constraints).get_best_fingerings(
+            penalty_functions, 'greedy')
+    assert not greedy.proven_optimal
+    assert greedy.gap > 0
+    assert not parts.proven_optimal
+    assert parts.gap > 0
+
+
+def test_anytime_single_candidates():
+    f = make_lattice(paths[0], '30_wheatstone_cg', []).layers[0][0]
+    lattice = Lattice(((f,), (f,)), ())
+    solution = AnytimeSolver(node_budget=0).solve(lattice)
+    assert solution == Solution((0, 0), 2 * STEP_COST, 1)
+
+
+@pytest.mark.parametrize('checkpointed', [True, False])
+@pytest.mark.parametrize('interval', [None, 1, 2, 5, 1000])
+def test_low_memory_same_path(checkpointed, interval):
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', [scrambled_penalty])
+    expected = MinPlusSolver().solve(lattice)
+    fresh = make_lattice(paths[0], '30_wheatstone_cg', [scrambled_penalty])
+    actual = LowMemorySolver(checkpointed, interval).solve(fresh)
+    assert actual == expected
+    assert not fresh._transition_costs
+
+
+direction_penalty_functions = [
+    penalize_bellows_change(1), penalize_pull_at_start_of_measure(1)]
+
+
+@pytest.mark.parametrize(
+    'penalties', [penalty_functions, direction_penalty_functions])
+@pytest.mark.parametrize('layout_name', layout_names)
+@pytest.mark.parametrize('path', paths, ids=lambda path: path.name)
+def test_grouped_same_path(penalties, layout_name, path):
+    lattice = make_lattice(path, layout_name, penalties)
+    expected = MinPlusSolver(grouped=False).solve(lattice)
+    fresh = make_lattice(path, layout_name, penalties)
+    # These layers are too small to be grouped by default.
+    with patch('concertina_helper.solvers.lattice.MIN_GROUPED_PAIRS', 0):
+        assert MinPlusSolver().solve(fresh) == expected
+        assert LowMemorySolver().solve(fresh) == expected
+
+
+def test_feature_groups():
+    lattice = make_lattice(paths[0], '30_wheatstone_cg', direction_penalty_functions)
+    for position in range(len(lattice.layers)):
+        groups, firsts = lattice.feature_groups(position)
+        directions = [f.fingering.direction for f in lattice.layers[position]]
+        assert len(firsts) == len(set(directions))
+        for i, group in enumerate(groups):
+            assert directions[i] == directions[firsts[group]]
+    with patch('concertina_helper.solvers.lattice.MIN_GROUPED_PAIRS', 0):
+        grouped = [
+            position for position in range(1, len(lattice.layers))
+            if lattice.group_transition_costs(position) is not None]
+    assert 0 < len(grouped) < len(lattice.layers) - 1
+    assert all(
+        lattice.group_transition_costs(position) is None
+        for position in range(1, len(lattice.layers)))
+    scrambled = make_lattice(
+        paths[0], '30_wheatstone_cg', [penalize_bellows_change(1), scrambled_penalty])
+    assert scrambled.feature_groups(0) is None
+    assert scrambled.group_transition_costs(1) is None
+
+
+def test_grouped_only_when_worth_it():
+    layout = synthetic_bisonoric_layout(4, 6, 512)
+    notes = list(random_tune(layout, 50, seed=0))
+    f_sets = [f_set for _, f_set in NotesOnLayout(notes, layout).get_all_fingerings()]
+    few_groups = Lattice.from_fingerings(f_sets, [penalize_bellows_change(1)])
+    assert all(
+        few_groups.group_transition_costs(position) is not None
+        for position in range(1, len(notes))
+        if len(f_sets[position - 1]) * len(f_sets[position]) >= 16)
+    # Most candidates are in a column of their own.
+    many_groups = Lattice.from_fingerings(
+        f_sets, [penalize_bellows_change(1), penalize_finger_in_same_column(1)])
+    assert any(
+        many_groups.group_transition_costs(position) is None
+        and len(f_sets[position - 1]) * len(f_sets[position]) >= 16
+        for position in range(1, len(notes)))
+    undeclared = Lattice.from_fingerings(f_sets, [lambda f, g: 0])
+    assert all(
+        undeclared.group_transition_costs(position) is None
+        for position in range(1, len(notes)))
+
+
+def test_low_memory_single_layer():
+    f = make_lattice(paths[0], '30_wheatstone_cg', []).layers[0][0]
+    assert LowMemorySolver().solve(Lattice(((f,),))) == Solution((0,), STEP_COST, 1)
+
+
+def test_low_memory_invalid_interval():
+    with pytest.raises(ValueError, match=r'interval must be at least 1'):
+        LowMemorySolver(interval=0)
+
+
+def test_typecode():
+    f = make_lattice(paths[0], '30_wheatstone_cg', []).layers[0][0]
+    for width, typecode in [(256, 'B'), (257, 'H'), (65537, 'I')]:
+        assert _typecode(Lattice(((f,), (f,) * width))) == typecode
@@ -0,0 +1,114 @@
+from itertools import product
+from pathlib import Path
+import pickle
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches, notes_from_tune
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.solvers.lattice import Lattice
+from concertina_helper.solvers.registry import get_solver_by_name
+from concertina_helper.solvers.stateful import StatefulSolver
+from concertina_helper.stateful_penalties import (
+    window_penalty, penalize_finger_reuse_after_one,
+    penalize_repeated_bellows_changes, penalize_long_bellows_run)
+
+
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+pitches = ['G4', 'A4', 'B4', 'C5', 'B4', 'A4', 'G4']
+pairwise = [penalize_finger_in_same_column(1), penalize_outer_fingers(0.5)]
+
+
+def make_lattice(pitches, penalty_functions):
+    n_l = NotesOnLayout(notes_from_pitches(pitches), layout)
+    return Lattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()], penalty_functions)
+
+
+def brute_force_cost(lattice, stateful_penalties):
+    best = float('inf')
+    for indexes in product(*(range(len(layer)) for layer in lattice.layers)):
+        fingerings = lattice.fingerings(indexes)
+        cost = lattice.path_cost(indexes)
+        for p in stateful_penalties:
+            state = p.start(fingerings[0])
+            for f in fingerings[1:]:
+                state, step_cost = p.step(state, f)
+                cost += step_cost
+        best = min(best, cost)
+    return best
+
+
+@pytest.mark.parametrize('stateful_penalties', [
+    [penalize_finger_reuse_after_one(2)],
+    [penalize_repeated_bellows_changes(3)],
+    [penalize_repeated_bellows_changes(3, count=1)],
+    [penalize_long_bellows_run(2, 2)],
+    [penalize_long_bellows_run(2, 3), penalize_finger_reuse_after_one(1)],
+], ids=['reuse', 'changes', 'changes_1', 'run', 'run_reuse'])
+def test_matches_brute_force(stateful_penalties):
+    lattice = make_lattice(pitches, pairwise)
+    solution = StatefulSolver(stateful_penalties).solve(lattice)
+    expected = brute_force_cost(lattice, stateful_penalties)
+    assert solution.cost == pytest.approx(expected)
+
+
+def test_no_stateful_penalties_matches_dp():
+    lattice = make_lattice(pitches, pairwise)
+    assert StatefulSolver([]).solve(lattice) == \
+        get_solver_by_name('dp').solve(lattice)
+
+
+def test_window_order_1_matches_pairwise():
+    def bellows_change(window):
+        first, second = window
+        return 1 if first.fingering.direction != second.fingering.direction else 0
+    expected = get_solver_by_name('dp').solve(
+        make_lattice(pitches, pairwise + [penalize_bellows_change(1)]))
+    actual = StatefulSolver([window_penalty(bellows_change, 1, 1)]).solve(
+        make_lattice(pitches, pairwise))
+    assert actual.cost == pytest.approx(expected.cost)
+
+
+def test_window_order_invalid():
+    with pytest.raises(ValueError, match=r'order must be at least 1'):
+        window_penalty(lambda window: 0, 0, 0)
+
+
+def test_empty_lattice():
+    assert StatefulSolver([penalize_long_bellows_run(1, 2)]).solve(
+        Lattice(())).indexes == ()
+
+
+def test_penalties_pickle():
+    penalty = penalize_repeated_bellows_changes(3)
+    f = make_lattice(['G4'], []).layers[0][0]
+    assert pickle.loads(pickle.dumps(penalty)).start(f) == penalty.start(f)
+
+
+def test_states_pruned_on_long_tune():
+    tune = Tune((Path(__file__).parent / 'amelia-no-chords.abc').read_text())
+    n_l = NotesOnLayout(list(notes_from_tune(tune)), layout)
+    lattice = Lattice.from_fingerings(
+        [f_set for _, f_set in n_l.get_all_fingerings()],
+        [penalize_bellows_change(5), penalize_finger_in_same_column(5)])
+    stateful_penalties = [
+        penalize_long_bellows_run(0.5, 8), penalize_finger_reuse_after_one(0.5)]
+    solution = StatefulSolver(stateful_penalties).solve(lattice)
+    exhaustive_solver = StatefulSolver(stateful_penalties)
+    exhaustive_solver.slack = float('inf')
+    exhaustive = exhaustive_solver.solve(lattice)
+    assert solution.cost == pytest.approx(exhaustive.cost)
+    assert solution.nodes_expanded < exhaustive.nodes_expanded
+
+
+def test_get_best_fingerings_mixed():
+    n_l = NotesOnLayout(notes_from_pitches(['G4', 'A4', 'B4', 'C5', 'D5']), layout)
+    best = n_l.get_best_fingerings(
+        [penalize_bellows_change(1), penalize_long_bellows_run(10, 2)])
+    assert [f.fingering.direction.name for f in best] == \
+        ['PUSH', 'PUSH', 'PULL', 'PUSH', 'PUSH']
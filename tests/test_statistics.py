@@ -0,0 +1,174 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+import json
+
+import pytest
+from pyabc2 import Tune
+
+from concertina_helper.layouts.bisonoric import AnnotatedBisonoricFingering
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches, notes_from_tune
+from concertina_helper.penalties import get_penalty_factories
+from concertina_helper.statistics import (
+    RepertoireStatistics, gather_statistics, MAX_REVERSALS, _parse_and_summarize)
+from concertina_helper.type_defs import Annotation, Direction, Pitch
+
+
+tests_dir = Path(__file__).parent
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+penalties = [factory(1) for factory in get_penalty_factories().values()]
+
+
+def best_fingerings(file_name):
+    notes = list(notes_from_tune(Tune((tests_dir / file_name).read_text())))
+    return NotesOnLayout(notes, layout).get_best_fingerings(penalties)
+
+
+def test_add_tune():
+    best = best_fingerings('amelia-no-chords.abc')
+    stats = RepertoireStatistics(layout)
+    stats.add_tune(iter(best))
+    assert stats.tunes == 1
+    assert stats.notes == len(best)
+    assert stats.push_notes == sum(
+        f.fingering.direction == Direction.PUSH for f in best)
+    assert sum(stats.button_counts) == len(best)
+    assert sum(stats.transition_counts) == len(best) - 1
+    assert stats.measures == len({f.annotation.measure for f in best})
+    assert stats.reversals == sum(
+        a.fingering.direction != b.fingering.direction
+        for a, b in zip(best, best[1:]))
+    assert sum(k * n for k, n in enumerate(stats.reversal_counts)) == stats.reversals
+
+
+def push_fingering(name):
+    return sorted(
+        (f for f in layout.get_fingerings(Pitch(name))
+         if f.direction == Direction.PUSH), key=str)[0]
+
+
+def test_chords_count_every_button():
+    annotation = Annotation(pitch=Pitch('C4'), measure=1)
+    chord = AnnotatedBisonoricFingering(
+        fingering=push_fingering('C4') | push_fingering('G4'), annotation=annotation)
+    note = AnnotatedBisonoricFingering(
+        fingering=push_fingering('E4'), annotation=annotation)
+    stats = RepertoireStatistics(layout)
+    stats.add_tune([chord, note])
+    assert stats.notes == 2
+    assert sum(stats.button_counts) == 3
+    assert [
+        (stats.describe_fingering(a), stats.describe_fingering(b), n)
+        for a, b, n in stats.top_transitions()
+    ] == [('PUSH C4 L2.3', 'PUSH E4 L2.4', 1), ('PUSH G4 L3.3', 'PUSH E4 L2.4', 1)]
+
+
+def test_reversals_are_capped():
+    stats = RepertoireStatistics(layout)
+    n_l = NotesOnLayout(notes_from_pitches(['C4', 'F#4'] * 20), layout)
+    stats.add_tune(n_l.get_best_fingerings(penalties))
+    assert stats.reversals == 39
+    assert stats.reversal_counts[MAX_REVERSALS] == 1
+
+
+def test_empty():
+    stats = RepertoireStatistics(layout)
+    stats.add_tune([])
+    summary = stats.summary()
+    assert summary['tunes'] == 1
+    assert summary['push_ratio'] == 0
+    assert summary['reversals_per_measure'] == 0
+    assert summary['transitions'] == []
+
+
+def test_merge_matches_single_pass():
+    tunes = [best_fingerings('amelia-no-chords.abc'), best_fingerings('g-major.abc')]
+    together = RepertoireStatistics(layout)
+    for best in tunes:
+        together.add_tune(best)
+    merged = RepertoireStatistics(layout)
+    for best in tunes:
+        part = RepertoireStatistics(layout)
+        part.add_tune(best)
+        merged.merge(part)
+    assert merged.summary() == together.summary()
+    assert merged.transition_counts == together.transition_counts
+
+
+def test_merge_different_layouts():
+    stats = RepertoireStatistics(layout)
+    with pytest.raises(ValueError, match=r'different layouts'):
+        stats.merge(RepertoireStatistics(layout.transpose(1)))
+
+
+def test_summary():
+    stats = RepertoireStatistics(layout)
+    stats.add_tune(best_fingerings('amelia-no-chords.abc'))
+    summary = json.loads(json.dumps(stats.summary(top=3)))
+    assert len(summary['transitions']) == 3
+    counts = [t['count'] for t in summary['transitions']]
+    assert counts == sorted(counts, reverse=True)
+    assert sum(summary['buttons'].values()) == stats.notes
+    assert summary['push_notes'] + summary['pull_notes'] == stats.notes
+
+
+def test_gather_skips_unplayable():
+    stats, errors = gather_statistics(
+        [tests_dir / 'amelia-no-chords.abc', tests_dir / 'g-major.abc'],
+        load_bisonoric_layout_by_name('20_cg'), penalties, chunk_size=1,
+        executor_factory=ThreadPoolExecutor)
+    assert stats.tunes == 1
+    assert len(errors) == 1
+    assert errors[0].startswith(str(tests_dir / 'amelia-no-chords.abc'))
+
+
+def test_gathers_share_a_process():
+    paths = [tests_dir / 'amelia-no-chords.abc', tests_dir / 'g-major.abc']
+    with ThreadPoolExecutor() as outer:
+        futures = [
+            outer.submit(
+                gather_statistics, paths, load_bisonoric_layout_by_name(name),
+                penalties, chunk_size=1, executor_factory=ThreadPoolExecutor)
+            for name in ['20_cg', '30_wheatstone_cg']]
+        (small, small_errors), (large, large_errors) = [f.result() for f in futures]
+    assert (small.tunes, len(small_errors)) == (1, 1)
+    assert (large.tunes, large_errors) == (2, [])
+
+
+def test_process_pool():
+    paths = [tests_dir / 'amelia-no-chords.abc', tests_dir / 'g-major.abc'] * 2
+    stats, errors = gather_statistics(
+        paths, layout, penalties, max_workers=2, chunk_size=1)
+    assert errors == []
+    assert stats.tunes == 4
+    single = RepertoireStatistics(layout)
+    single.add_tune(best_fingerings('amelia-no-chords.abc'))
+    assert stats.notes == 2 * single.notes + 2 * len(best_fingerings('g-major.abc'))
+
+
+def test_cli(capsys):
+    with patch('argparse._sys.argv',
+               ['concertina-helper-stats', str(tests_dir / 'g-major.abc'),
+                '--layout_name', '30_wheatstone_cg', '--top', '2',
+                '--workers', '1']):
+        _parse_and_summarize()
+    lines = capsys.readouterr().out.rstrip('\n').split('\n')
+    assert lines[:2] == ['Tunes: 1', 'Notes: 8']
+    assert len(lines) == lines.index('Most common transitions:') + 3
+
+
+def test_cli_json(capsys, tmp_path):
+    layout_path = tests_dir.parent / 'concertina_helper' / 'layouts' / '20_cg.yaml'
+    json_path = tmp_path / 'stats.json'
+    with patch('argparse._sys.argv',
+               ['concertina-helper-stats', str(tests_dir / 'g-major.abc'),
+                str(tests_dir / 'amelia-no-chords.abc'),
+                '--layout_path', str(layout_path), '--workers', '1',
+                '--json', str(json_path)]):
+        _parse_and_summarize()
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert 'amelia-no-chords.abc' in captured.err
+    assert json.loads(json_path.read_text())['tunes'] == 1
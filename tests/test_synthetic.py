@@ -0,0 +1,59 @@
+import pytest
+
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.penalties import (
+    penalize_bellows_change, penalize_finger_in_same_column)
+from concertina_helper.playability import find_unplayable_notes
+from concertina_helper.synthetic import (
+    synthetic_bisonoric_layout, random_tune, scale_tune)
+from concertina_helper.type_defs import Pitch
+
+
+def max_alternates(layout):
+    return max(
+        len(layout.get_fingerings(Pitch.from_midi_number(m)))
+        for m in range(128) if layout.playable_bits >> m & 1)
+
+
+@pytest.mark.parametrize('rows,buttons_per_row', [(4, 5), (4, 6)])
+def test_large_layouts(rows, buttons_per_row):
+    layout = synthetic_bisonoric_layout(rows, buttons_per_row)
+    assert layout.shape == ([buttons_per_row] * rows, [buttons_per_row] * rows)
+    assert layout == synthetic_bisonoric_layout(rows, buttons_per_row)
+    tune = scale_tune(100, tonic=layout.push_layout.left[-1][0].midi_number)
+    assert not find_unplayable_notes(tune, layout)
+    best = list(NotesOnLayout(tune, layout).get_best_fingerings(
+        [penalize_bellows_change(1), penalize_finger_in_same_column(1)], 'dp'))
+    assert len(best) == 100
+
+
+def test_duplicates():
+    plain = synthetic_bisonoric_layout(4, 6)
+    crowded = synthetic_bisonoric_layout(4, 6, duplicates=20)
+    assert max_alternates(crowded) > max_alternates(plain)
+    assert synthetic_bisonoric_layout(4, 6, duplicates=20, seed=1) != crowded
+
+
+def test_random_tune():
+    layout = synthetic_bisonoric_layout(duplicates=5)
+    tune = random_tune(layout, 500, notes_per_measure=4, seed=3)
+    assert len(tune) == 500
+    assert tune.measures[-1] == 125
+    assert not find_unplayable_notes(tune, layout)
+    assert random_tune(layout, 500, notes_per_measure=4, seed=3) == tune
+
+
+def test_scale_tune():
+    tune = scale_tune(30, tonic=62, octaves=1)
+    assert [note.pitch.name for note in tune][:16] == [
+        'D4', 'E4', 'F#4', 'G4', 'A4', 'B4', 'C#5',
+        'D5', 'C#5', 'B4', 'A4', 'G4', 'F#4', 'E4', 'D4', 'E4']
+
+
+def test_invalid():
+    with pytest.raises(ValueError, match='at least 1'):
+        synthetic_bisonoric_layout(rows=0)
+    with pytest.raises(ValueError, match='at least 1'):
+        scale_tune(10, octaves=0)
+    with pytest.raises(ValueError, match='at least 1'):
+        scale_tune(10, notes_per_measure=0)
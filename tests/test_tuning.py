@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from concertina_helper.layouts.layout_loader import load_bisonoric_layout_by_name
+from concertina_helper.tuning import (
+    parse_reference_fingerings, format_reference_fingerings,
+    WeightTuner, _Agreement, _agreement_in_worker, _init_worker, _parse_and_tune)
+
+
+layout = load_bisonoric_layout_by_name('30_wheatstone_cg')
+reference_path = Path(__file__).parent / 'g-major-reference.txt'
+reference = parse_reference_fingerings(
+    reference_path.read_text().split('\n'), layout)
+
+
+def test_parse_invalid_line():
+    with pytest.raises(ValueError, match=r'Invalid reference fingering on line 2'):
+        parse_reference_fingerings(['', 'G4 PULL L1.4'], layout)
+
+
+def test_parse_wrong_button():
+    with pytest.raises(ValueError, match=r'G4 is not on the PUSH at L1.4'):
+        parse_reference_fingerings(['1 G4 PUSH L1.4'], layout)
+
+
+def test_parse_button_off_layout():
+    with pytest.raises(ValueError, match=r'G4 is not on the PULL at L9.9'):
+        parse_reference_fingerings(['1 G4 PULL L9.9'], layout)
+
+
+def test_format_round_trip():
+    lines = [
+        line for line in reference_path.read_text().split('\n')
+        if line and not line.startswith('#')
+    ]
+    assert format_reference_fingerings(reference) == lines
+
+
+def test_random_search():
+    with WeightTuner(
+            [reference], layout, executor_factory=ThreadPoolExecutor) as tuner:
+        results = tuner.random_search({'bellows_change': (0, 10)}, 5, seed=0)
+    assert len(results) == 5
+    assert all(0 <= r.weights['bellows_change'] <= 10 for r in results)
+    assert all(0 <= r.agreement <= 1 for r in results)
+
+
+def test_coordinate_descent_improves():
+    with WeightTuner(
+            [reference], layout, executor_factory=ThreadPoolExecutor) as tuner:
+        results = tuner.coordinate_descent(
+            {name: 0 for name in tuner.factories}, [0, 5])
+    assert results[0].agreement < 1
+    assert max(r.agreement for r in results) == 1
+
+
+def test_coordinate_descent_limited_rounds():
+    with WeightTuner(
+            [reference], layout, executor_factory=ThreadPoolExecutor) as tuner:
+        results = tuner.coordinate_descent(
+            {name: 0 for name in tuner.factories}, [0, 5], rounds=0)
+    assert len(results) == 1
+
+
+def test_no_references():
+    with WeightTuner([], layout, executor_factory=ThreadPoolExecutor) as tuner:
+        [result] = tuner.evaluate([{}])
+    assert result.agreement == 0
+
+
+def test_tuners_share_a_process():
+    with WeightTuner(
+            [reference], layout, executor_factory=ThreadPoolExecutor) as first, \
+            WeightTuner([], layout, executor_factory=ThreadPoolExecutor) as second:
+        [first_result] = first.evaluate([{'bellows_change': 5}])
+        [second_result] = second.evaluate([{'bellows_change': 5}])
+    assert first_result.agreement == 1
+    assert second_result.agreement == 0
+
+
+def test_process_pool():
+    with WeightTuner([reference], layout, max_workers=2) as tuner:
+        [result] = tuner.evaluate([{'bellows_change': 5}])
+    assert result.agreement == 1
+
+
+def test_process_pool_worker():
+    # What each worker process does, run here so it is measured.
+    with patch('concertina_helper.tuning._worker_agreement', None):
+        _init_worker(_Agreement([], 'minplus'))
+        assert _agreement_in_worker({}) == 0
+
+
+@pytest.mark.parametrize('search', ['grid', 'random', 'coordinate'])
+def test_cli(capsys, search):
+    with patch('argparse._sys.argv',
+               ['concertina-helper-tune', str(reference_path),
+                '--layout_name', '30_wheatstone_cg',
+                '--search', search, '--values', '0', '5',
+                '--samples', '3', '--workers', '1']):
+        _parse_and_tune()
+    captured = capsys.readouterr().out
+    assert 'Best agreement: 1.000' in captured or search == 'random'
+    assert 'Best weights: --bellows_change_cost' in captured
+
+
+def test_cli_layout_path(capsys):
+    layout_path = (
+        Path(__file__).parent.parent / 'concertina_helper'
+        / 'layouts' / '30_wheatstone_cg.yaml')
+    with patch('argparse._sys.argv',
+               ['concertina-helper-tune', str(reference_path),
+                '--layout_path', str(layout_path),
+                '--search', 'grid', '--values', '5', '--workers', '1']):
+        _parse_and_tune()
+    captured = capsys.readouterr().out
+    assert 'Best weights: --bellows_change_cost 5' in captured
@@ -1,9 +1,18 @@
+import pickle
+from pathlib import Path
+
 import pytest
 
 from concertina_helper.layouts.unisonoric import (
     UnisonoricLayout, UnisonoricFingering)
 from concertina_helper.layouts.layout_loader import (
-    _names_to_pitches, load_bisonoric_layout_by_name)
+    _names_to_pitches, load_bisonoric_layout_by_name, load_unisonoric_layout_by_path)
+from concertina_helper.notes_on_layout import NotesOnLayout
+from concertina_helper.note_generators import notes_from_pitches
+from concertina_helper.penalties import (
+    penalize_finger_in_same_column, penalize_outer_fingers)
+from concertina_helper.result_cache import FingeringCache, CacheStats
+from concertina_helper.solvers.registry import list_solver_names
 from concertina_helper.type_defs import Mask, Pitch
 
 
@@ -116,3 +125,68 @@ def test_fingering_format_custom():
 def test_fingering_invalid_union():
     with pytest.raises(TypeError):
         u_fingering | 'not a fingering!'
+
+
+def test_layout_equality_and_hash():
+    same_layout = UnisonoricLayout(u_layout.left, u_layout.right)
+    assert same_layout is not u_layout
+    assert same_layout == u_layout
+    assert hash(same_layout) == hash(u_layout)
+    assert u_layout != weird_layout
+    assert u_layout != 'not a layout!'
+
+
+def test_fingering_equality_and_hash():
+    same_fingering = UnisonoricFingering(
+        UnisonoricLayout(u_layout.left, u_layout.right),
+        u_fingering.left_mask, u_fingering.right_mask)
+    assert same_fingering == u_fingering
+    assert hash(same_fingering) == hash(u_fingering)
+    assert len({same_fingering, u_fingering}) == 1
+    assert u_fingering != UnisonoricFingering(
+        u_layout, Mask(((False,) * 3, (False,) * 3)), u_fingering.right_mask)
+    assert u_fingering != 'not a fingering!'
+
+
+def test_fingering_pickle():
+    assert pickle.loads(pickle.dumps(u_fingering)) == u_fingering
+
+
+english_layout = load_unisonoric_layout_by_path(
+    Path(__file__).parent / 'english-24.yaml')
+english_pitches = ['C4', 'D4', 'E4', 'F4', 'G4', 'C#5', 'D5', 'C#5', 'G4']
+english_penalties = [penalize_finger_in_same_column(3), penalize_outer_fingers(1)]
+
+
+def test_load_unisonoric_layout_by_path():
+    assert english_layout.shape == ([6, 6], [6, 6])
+    assert english_layout.left[1][0] == Pitch('C4')
+
+
+@pytest.mark.parametrize('solver_name', list_solver_names())
+def test_best_fingerings_on_unisonoric_layout(solver_name):
+    n_l = NotesOnLayout(notes_from_pitches(english_pitches), english_layout)
+    best = list(n_l.get_best_fingerings(english_penalties, solver_name))
+    assert [f.annotation.pitch for f in best] == \
+        [Pitch(name) for name in english_pitches]
+    assert all(isinstance(f.fingering, UnisonoricFingering) for f in best)
+    # C#5 is on both sides: penalize_outer_fingers prefers the right.
+    assert str(best[5]).splitlines() == [
+        'Measure 1 - C#5',
+        '--- --- --- --- --- ---    --- --- --- --- --- ---',
+        '--- --- --- --- --- ---    --- --- --- C#5 --- ---',
+    ]
+
+
+def test_cache_on_unisonoric_layout():
+    cache = FingeringCache()
+    for _ in range(2):
+        n_l = NotesOnLayout(notes_from_pitches(english_pitches), english_layout)
+        n_l.get_best_fingerings(english_penalties, cache=cache)
+    assert cache.stats == CacheStats(hits=1, misses=1, uncacheable=0)
+
+
+def test_unplayable_on_unisonoric_layout():
+    n_l = NotesOnLayout(notes_from_pitches(['C4', 'C7']), english_layout)
+    with pytest.raises(ValueError, match=r'No fingerings for C7 in measure 1$'):
+        n_l.get_best_fingerings(english_penalties)